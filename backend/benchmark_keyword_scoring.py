@@ -0,0 +1,93 @@
+"""
+Benchmark keyword resume matching: per-resume Python loop vs inverted index vs
+vectorized sparse-matrix scorer, on synthetic corpora.
+
+Usage:
+    python benchmark_keyword_scoring.py [--sizes 1000 10000 100000] [--top-k 20]
+"""
+import argparse
+import random
+import time
+import uuid
+
+from services.keyword_index import KeywordIndex, calculate_keyword_match_score
+from services.keyword_matrix import KeywordMatrix
+
+SKILLS = [
+    "Python", "Java", "JavaScript", "TypeScript", "React", "Node.js", "AWS", "Docker",
+    "Kubernetes", "SQL", "PostgreSQL", "MongoDB", "Machine Learning", "Deep Learning",
+    "Data Analysis", "Pandas", "TensorFlow", "PyTorch", "Go", "Rust", "C++", "Linux",
+    "Django", "Flask", "FastAPI", "Spring Boot", "GraphQL", "CI/CD", "Terraform", "Azure",
+]
+WORDS = [
+    "engineer", "developer", "experienced", "backend", "frontend", "cloud", "data",
+    "scientist", "built", "scalable", "services", "team", "lead", "designed", "pipelines",
+    "analytics", "platform", "microservices", "startup", "enterprise", "mentored", "web",
+]
+EDUCATION = ["Bachelor's", "Master's", "PhD", "High School", ""]
+QUERIES = [
+    "Senior Python developer with 5+ years experience in AWS and Docker",
+    "Machine learning engineer, PyTorch, Master's degree",
+    "React TypeScript frontend developer 3 years",
+]
+
+def synthetic_resume(rng: random.Random) -> dict:
+    summary_words = rng.sample(WORDS, 8) + rng.sample([s.lower() for s in SKILLS], 4)
+    return {
+        "id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "summary": " ".join(summary_words).capitalize() + ".",
+        "skills": rng.sample(SKILLS, rng.randint(3, 10)),
+        "experience": str(rng.randint(0, 15)),
+        "educationLevel": rng.choice(EDUCATION),
+    }
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--top-k", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    print(f"{'resumes':>8} {'build idx':>10} {'build mat':>10} {'loop':>10} {'index':>10} {'matrix':>10} {'top-k':>10}  speedup")
+    for size in args.sizes:
+        resumes = [synthetic_resume(rng) for _ in range(size)]
+
+        start = time.perf_counter()
+        index = KeywordIndex()
+        index.rebuild(resumes)
+        build_index = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matrix = KeywordMatrix(resumes)
+        build_matrix = time.perf_counter() - start
+
+        # Sanity check: every path produces the same scores
+        for query in QUERIES:
+            expected = [calculate_keyword_match_score(query, r)["score"] for r in resumes]
+            assert matrix.scores(query).tolist() == expected, "matrix scores differ from the loop"
+            index_scores = index.score(query)
+            assert [index_scores.get(r["id"])["score"] for r in resumes] == expected, "index scores differ from the loop"
+
+        loop = timed(lambda: [[calculate_keyword_match_score(q, r) for r in resumes] for q in QUERIES], repeat=1)
+        indexed = timed(lambda: [index.score(q).top(args.top_k) for q in QUERIES])
+        vectorized = timed(lambda: [matrix.scores(q) for q in QUERIES])
+        top_k = timed(lambda: [matrix.top_k(q, args.top_k) for q in QUERIES])
+
+        per_query = len(QUERIES)
+        print(
+            f"{size:>8} {build_index:>9.3f}s {build_matrix:>9.3f}s "
+            f"{loop / per_query * 1000:>8.1f}ms {indexed / per_query * 1000:>8.2f}ms "
+            f"{vectorized / per_query * 1000:>8.2f}ms {top_k / per_query * 1000:>8.2f}ms  "
+            f"{loop / top_k:>6.1f}x"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,8 @@
 import os
-from typing import List, Optional, Dict, Any, Literal
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, BackgroundTasks, Body
+from typing import List, Optional, Dict, Any, Literal, Tuple
+from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Depends, BackgroundTasks, Body, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import uvicorn
 from datetime import datetime
@@ -14,7 +14,7 @@ from pathlib import Path
 import tempfile
 import shutil
 import random
-import re
+import asyncio
 
 # Import services
 try:
@@ -27,11 +27,31 @@ except ImportError:
         return "This is mock text extracted from a PDF. pdfplumber is not installed."
 
 from services.llm_service import get_resume_summary
-from services.embedding_service import get_embedding, calculate_similarity
+from services.embedding_service import (
+    get_embedding, calculate_similarity, close_embedding_client, EmbeddingError, ACTIVE_EMBEDDING_MODEL
+)
 from services.storage_service import upload_to_storage, get_download_url, LOCAL_STORAGE_DIR
-from services.database_service import save_resume_to_db, get_resumes, search_resumes
+from services.database_service import (
+    save_resume_to_db, get_resumes, search_resumes, get_db_metrics, remove_resume_embedding,
+    embed_resume, stale_embedding_ids, embedding_backfill_lock
+)
 from services.claude_service import analyze_resume_with_regex
-from services.openrouter_service import get_relevance_score_with_openrouter
+from services.openrouter_service import get_relevance_score_with_openrouter, OPENROUTER_MODEL_NAME
+from services.scoring_service import score_concurrently, score_as_completed, ScoringDeadlineExceeded
+from services.text_cache_service import sha256_bytes, file_sha256, get_or_extract_text, invalidate_cached_text
+from services.score_cache_service import make_score_key, ScoreCacheBatch
+from services.keyword_index import KeywordIndex, calculate_keyword_match_score
+from services.bm25_service import BM25Index
+from services.filter_index import FilterIndex, normalize_filters
+from services.facet_index import FacetIndex
+from services.resume_store import ResumeStore
+
+# Vectorized keyword scoring needs numpy and scipy
+try:
+    from services.keyword_matrix import KeywordMatrix
+    KEYWORD_MATRIX_AVAILABLE = True
+except ImportError:
+    KEYWORD_MATRIX_AVAILABLE = False
 
 # Import OpenRouter service for Mistral 7B
 try:
@@ -77,6 +97,10 @@ load_dotenv()
 # Get the desired analyzer mode from environment
 ANALYZER_MODE = os.getenv("ANALYZER_MODE", "auto").lower()  # "auto", "api", "offline", "regex", "llama_cpp"
 
+# Hybrid search defaults (overridable per request)
+HYBRID_RERANK_TOP_K = int(os.getenv("HYBRID_RERANK_TOP_K", "10"))
+HYBRID_MIN_KEYWORD_SCORE = int(os.getenv("HYBRID_MIN_KEYWORD_SCORE", "0"))
+
 app = FastAPI(title="ResuMatch API", description="API for ResuMatch Resume Selection App")
 
 # Configure CORS
@@ -90,33 +114,78 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Score-Cache-Hits", "X-Score-Cache-Misses", "X-Next-Cursor", "ETag"],
 )
 
 # Create storage directory if it doesn't exist
 os.makedirs(LOCAL_STORAGE_DIR, exist_ok=True)
 
-# Resume storage file path
-RESUMES_FILE = Path("./storage/resumes.json")
+# Resume metadata: the resumes table in storage/resumes.db, shared by all uvicorn workers
+RESUME_STORE = ResumeStore()
 
-# Initialize resumes from file if it exists
+# Initialize resumes from the database
 def load_resumes():
-    if RESUMES_FILE.exists():
-        try:
-            with open(RESUMES_FILE, 'r') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"Error loading resumes: {str(e)}")
-    return []
-
-def save_resumes(resumes):
-    try:
-        with open(RESUMES_FILE, 'w') as f:
-            json.dump(resumes, f, indent=2)
-    except Exception as e:
-        print(f"Error saving resumes: {str(e)}")
+    return RESUME_STORE.load()
 
 # Load existing resumes
-USER_RESUMES = load_resumes()
+USER_RESUMES: Dict[str, Dict[str, Any]] = {r["id"]: r for r in load_resumes()}
+
+# Inverted index for keyword resume matching, kept in step with USER_RESUMES
+KEYWORD_INDEX = KeywordIndex()
+KEYWORD_INDEX.rebuild(USER_RESUMES.values())
+
+# Vectorized keyword scorer for top-k queries, updated row by row like the indexes below
+KEYWORD_MATRIX = KeywordMatrix(USER_RESUMES.values()) if KEYWORD_MATRIX_AVAILABLE else None
+
+# Category / education / skills / experience indexes for SearchQuery.filters
+FILTER_INDEX = FilterIndex()
+FILTER_INDEX.rebuild(USER_RESUMES.values())
+
+# Skill / category / education / experience facet counts for the search sidebar
+FACET_INDEX = FacetIndex()
+FACET_INDEX.rebuild(USER_RESUMES.values())
+
+# BM25 full-text index over extracted resume text (persisted in storage/bm25_index.db)
+BM25_INDEX = BM25Index()
+BM25_INDEX.retain(USER_RESUMES)
+
+def index_resume(resume: Dict[str, Any], resume_text: Optional[str] = None):
+    """Add a newly stored resume to the search indexes"""
+    KEYWORD_INDEX.add(resume)
+    if KEYWORD_MATRIX is not None:
+        KEYWORD_MATRIX.add(resume)
+    FILTER_INDEX.add(resume)
+    FACET_INDEX.add(resume)
+    if resume_text is not None:
+        BM25_INDEX.add(resume["id"], resume_text)
+
+def apply_resume_changes(changes: List[Tuple[str, str, Optional[Dict[str, Any]]]]):
+    """Apply resume changes made by other workers to USER_RESUMES and the search indexes"""
+    for op, resume_id, resume in changes:
+        if op == "put":
+            USER_RESUMES[resume_id] = resume
+            index_resume(resume)
+        elif USER_RESUMES.pop(resume_id, None) is not None:
+            unindex_resume(resume_id)
+
+async def sync_resumes():
+    """
+    Catch up with uploads and deletes from other workers (a single PRAGMA when there are none).
+    The store's SQL runs in a thread, another worker holding the write lock must not stall the event loop.
+    """
+    changes = await asyncio.to_thread(RESUME_STORE.refresh)
+    if changes:
+        print(f"Applied {len(changes)} resume change(s) from other workers")
+        apply_resume_changes(changes)
+
+def unindex_resume(resume_id: str):
+    """Remove a deleted resume from the search indexes"""
+    KEYWORD_INDEX.remove(resume_id)
+    if KEYWORD_MATRIX is not None:
+        KEYWORD_MATRIX.remove(resume_id)
+    FILTER_INDEX.remove(resume_id)
+    FACET_INDEX.remove(resume_id)
+    BM25_INDEX.remove(resume_id)
 
 class ResumeAnalysisResponse(BaseModel):
     skills: List[str]
@@ -135,7 +204,14 @@ class ResumeUploadRequest(BaseModel):
 class SearchQuery(BaseModel):
     query: str
     filters: Optional[dict] = None
-    search_type: Literal["ai_analysis", "resume_matching"] = "ai_analysis"
+    search_type: Literal["ai_analysis", "resume_matching", "hybrid", "bm25"] = "ai_analysis"
+    # Hybrid search: how many keyword-ranked candidates go to the LLM, and the minimum keyword score to qualify
+    rerank_top_k: Optional[int] = None
+    rerank_min_score: Optional[int] = None
+    # Keyword and BM25 search: return only the best top_k resumes
+    top_k: Optional[int] = None
+    # LLM search: resumes not scored within this budget fall back to keyword scores
+    time_budget_ms: Optional[int] = None
 
 class AnalysisResult(BaseModel):
     summary: str
@@ -160,6 +236,13 @@ async def root():
     """
     return {"status": "ok", "message": "ResuMatch API is running"}
 
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Runtime metrics: database pool wait, executor queue wait and query timings
+    """
+    return {"database": get_db_metrics()}
+
 @app.get("/api/model/status", response_model=ModelStatusResponse)
 async def model_status():
     """
@@ -508,6 +591,15 @@ async def upload_resume(file: UploadFile = File(...), metadata: str = Form(...))
         
         print(f"Saved resume file to {file_path}")
         
+        # Extract the text once now so searches can read it from the text cache
+        content_hash = sha256_bytes(contents)
+        resume_text = None
+        if file_path.suffix.lower() in (".pdf", ".txt"):
+            try:
+                resume_text = await asyncio.to_thread(get_or_extract_text, str(file_path), extract_resume_file_text, content_hash)
+            except Exception as e:
+                print(f"Warning: Could not cache extracted text for {file.filename}: {str(e)}")
+        
         # Create a resume object
         resume = {
             "id": resume_id,
@@ -521,17 +613,23 @@ async def upload_resume(file: UploadFile = File(...), metadata: str = Form(...))
             "experience": meta_dict.get("experience", ""),
             "educationLevel": meta_dict.get("educationLevel", ""),
             "category": meta_dict.get("category", ""),
-            "file_path": str(file_path)
+            "file_path": str(file_path),
+            "content_hash": content_hash
         }
         
-        # Add to our storage and save to file
-        USER_RESUMES.append(resume)
-        save_resumes(USER_RESUMES)
+        # Add to our storage and the resumes table
+        apply_resume_changes(await asyncio.to_thread(RESUME_STORE.put, resume))
+        USER_RESUMES[resume_id] = resume
+        index_resume(resume, resume_text)
+        
+        # Embed it so semantic search (search_resumes) finds it; if the API is down the startup backfill embeds it later
+        if resume_text and resume_text.strip():
+            try:
+                await embed_resume(resume_id, resume_text)
+            except EmbeddingError as e:
+                print(f"Warning: Could not embed {file.filename}: {str(e)}")
         
-        # Print the current resumes for debugging
         print(f"Current resumes in storage: {len(USER_RESUMES)}")
-        for r in USER_RESUMES:
-            print(f"  - {r['id']}: {r['filename']}")
         
         return resume
     except Exception as e:
@@ -539,19 +637,18 @@ async def upload_resume(file: UploadFile = File(...), metadata: str = Form(...))
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
 @app.get("/api/resumes/user")
-async def get_user_resumes():
+async def get_user_resumes(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
     """
-    Get resumes for the current user
+    Get resumes for the current user, served from the in-memory resume store.
+    With limit, returns one page; the X-Next-Cursor header holds the cursor for the next page.
     """
     try:
-        # Reload resumes from file to ensure we have the latest data
-        global USER_RESUMES
-        USER_RESUMES = load_resumes()
-        
-        # Print the current resumes for debugging
-        print(f"Returning {len(USER_RESUMES)} resumes from storage")
-        for r in USER_RESUMES:
-            print(f"  - {r['id']}: {r['filename']}")
+        # Pick up other workers' changes from the resumes table
+        await sync_resumes()
             
         # If we have no resumes, create some mock data
         if not USER_RESUMES:
@@ -585,10 +682,27 @@ async def get_user_resumes():
                     "category": ""
                 }
             ]
-            USER_RESUMES.extend(mock_resumes)
-            save_resumes(USER_RESUMES)
-            
-        return USER_RESUMES
+            for mock_resume in mock_resumes:
+                apply_resume_changes(await asyncio.to_thread(RESUME_STORE.put, mock_resume))
+                USER_RESUMES[mock_resume["id"]] = mock_resume
+                index_resume(mock_resume)
+
+        # Pollers send back the generation as If-None-Match and get a 304 while nothing changed
+        etag = f'"{RESUME_STORE.generation}"'
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        try:
+            resumes, next_cursor = RESUME_STORE.page(limit, cursor)
+        except KeyError:
+            raise HTTPException(status_code=400, detail=f"Unknown cursor {cursor}")
+
+        headers = {"ETag": etag}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return JSONResponse(content=resumes, headers=headers)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_user_resumes: {str(e)}")
         return JSONResponse(
@@ -596,101 +710,346 @@ async def get_user_resumes():
             content={"detail": f"Failed to get resumes: {str(e)}"}
         )
 
-def calculate_keyword_match_score(job_query: str, resume: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Calculates a match score for a resume based on a job query using keyword matching,
-    with weighted scores for summary, skills, experience, and education.
-    """
-    score = 0
-    match_reasons = []
-
-    # 1. Summary Match (Weight 0.4)
-    summary_keywords = [word.lower() for word in re.findall(r'\b\w+\b', job_query) if len(word) > 2]
-    summary_hits = 0
-    if resume.get("summary"):
-        resume_summary_lower = resume["summary"].lower()
-        for keyword in summary_keywords:
-            if keyword in resume_summary_lower:
-                summary_hits += 1
-        summary_score = min(summary_hits * 10, 100) # Cap at 100 for summary
-        score += summary_score * 0.4
-        if summary_score > 0:
-            match_reasons.append(f"Summary relevance: {summary_hits} keyword(s) matched.")
-
-    # 2. Skills Match (Weight 0.3)
-    query_skills = [skill.strip().lower() for skill in job_query.split(" ") if skill.strip()]
-    matched_skills_list = []
-    if resume.get("skills"):
-        for r_skill in resume["skills"]:
-            if any(q_skill in r_skill.lower() for q_skill in query_skills):
-                matched_skills_list.append(r_skill)
-        
-        skill_match_count = len(matched_skills_list)
-        # Linear scaling for skills, each skill contributes 20 points up to a max of 100 
-        skill_score = min(skill_match_count * 20, 100) 
-        score += skill_score * 0.3
-        if skill_match_count > 0:
-            match_reasons.append(f"Skills match: {skill_match_count} relevant skill(s) found: {', '.join(matched_skills_list)}.")
-
-    # 3. Experience Match (Weight 0.2)
-    resume_experience_str = str(resume.get("experience", "0")).replace("+", "").strip()
-    resume_experience = 0
+async def resolve_resume_file(resume: Dict[str, Any]) -> Optional[Path]:
+    """
+    Path of a resume's stored file from its record, or None if there is no file.
+    Records from before file_path was stored are resolved by ID prefix once and updated.
+    """
+    if resume.get("file_path"):
+        file_path = Path(resume["file_path"])
+        return file_path if file_path.is_file() else None
+
+    matches = await asyncio.to_thread(lambda: list(Path("./storage/resumes").glob(f"{resume['id']}_*")))
+    if not matches:
+        return None
+    resume["file_path"] = str(matches[0])
+    apply_resume_changes(await asyncio.to_thread(RESUME_STORE.put, resume))
+    return matches[0]
+
+def extract_resume_file_text(file_path: str) -> str:
+    """
+    Extracts text from a stored PDF or text resume, falling back to pdfplumber for weak PDF extractions.
+    """
+    file_extension = Path(file_path).suffix.lower()
+    if file_extension == ".pdf":
+        resume_content = extract_text_from_pdf(file_path)
+        if not resume_content or len(resume_content.strip()) < 100:
+            print(f"Warning: Primary PDF extraction failed for {file_path}. Trying pdfplumber fallback.")
+            resume_content = extract_with_pdfplumber(file_path)
+        return resume_content
+    if file_extension == ".txt":
+        with open(file_path, "r") as f:
+            return f.read()
+    return ""
+
+async def score_resume_with_llm(
+    job_query: str,
+    resume: Dict[str, Any],
+    cache_stats: Optional[Dict[str, int]] = None,
+    score_cache: Optional[ScoreCacheBatch] = None
+) -> Dict[str, Any]:
+    """
+    Extracts the text of a stored resume and scores it against a job query with the LLM.
+    Scores are served from the relevance-score cache when this query/resume/model was seen before.
+    A search passes its score_cache batch (see prefetch_cached_scores); new scores are queued in
+    it and written when the search flushes it.
+    """
+    if not resume.get("file_path"):
+        print(f"No file_path for {resume.get('filename', 'N/A')}. Using mock score.")
+        return {"score": random.randint(20, 50), "reason": "Resume file path missing.", "source": "no_file_path_fallback"}
+
+    file_extension = Path(resume["file_path"]).suffix.lower()
+    if file_extension not in (".pdf", ".txt"):
+        print(f"Warning: Unsupported file format for {resume.get('filename', 'N/A')}. Skipping LLM scoring.")
+        return {"score": 0, "reason": "Unsupported file format for LLM analysis.", "source": "unsupported_format_fallback"}
+
+    if not resume.get("content_hash"):
+        resume["content_hash"] = await asyncio.to_thread(file_sha256, resume["file_path"])
+
+    score_key = make_score_key(job_query, resume["content_hash"], OPENROUTER_MODEL_NAME)
+    flush = score_cache is None
+    if flush:
+        score_cache = ScoreCacheBatch(OPENROUTER_MODEL_NAME)
+        await score_cache.prefetch([score_key])
+    cached_score = score_cache.get(score_key)
+    if cached_score is not None:
+        if cache_stats is not None:
+            cache_stats["hits"] += 1
+        cached_score["source"] = "openrouter_llm"
+        return cached_score
+    if cache_stats is not None:
+        cache_stats["misses"] += 1
+
+    # Read extracted text from the content-addressed cache instead of re-parsing the file
+    resume_content = await asyncio.to_thread(
+        get_or_extract_text, resume["file_path"], extract_resume_file_text, resume["content_hash"]
+    )
+
+    if resume_content and len(resume_content.strip()) >= 50: # Minimum content length to attempt LLM scoring
+        print(f"Getting LLM relevance score for {resume.get('filename', 'N/A')} with query: {job_query[:50]}...")
+        score_result = await get_relevance_score_with_openrouter(
+            job_query=job_query,
+            resume_text=resume_content
+        )
+        score_result["source"] = score_result.get("source", "openrouter_llm")
+        if score_result["source"] == "openrouter_llm":
+            # Only real LLM answers are cached, mock fallbacks are retried next time
+            score_cache.put(score_key, score_result)
+            if flush:
+                await score_cache.flush()
+        return score_result
+
+    print(f"Warning: Not enough content extracted from {resume.get('filename', 'N/A')}. Using mock score.")
+    return {"score": random.randint(30, 60), "reason": "Insufficient resume content for LLM analysis.", "source": "mock_content_fallback"}
+
+async def prefetch_cached_scores(job_query: str, resumes: List[Dict[str, Any]]) -> ScoreCacheBatch:
+    """
+    Reads the cached scores of all resumes about to be LLM-scored with one lookup in a thread,
+    so the scoring fan-out does no SQLite work. Flush the returned batch once scoring is done.
+    """
+    score_cache = ScoreCacheBatch(OPENROUTER_MODEL_NAME)
+    await score_cache.prefetch(
+        make_score_key(job_query, resume["content_hash"], OPENROUTER_MODEL_NAME) for resume in resumes if resume.get("content_hash")
+    )
+    return score_cache
+
+async def ensure_content_hashes(resumes: List[Dict[str, Any]]):
+    """
+    Fills in content_hash for stored resumes that predate it (hashing is off the event loop).
+    """
+    for resume in resumes:
+        if not resume.get("content_hash") and resume.get("file_path") and Path(resume["file_path"]).is_file():
+            resume["content_hash"] = await asyncio.to_thread(file_sha256, resume["file_path"])
+
+async def backfill_embeddings():
+    """
+    Embeds stored resumes that have no embedding from the active embedding model: uploaded
+    while the embedding API failed, or embedded by another model or backend. One worker does
+    this at a time; an API failure stops it until the next start.
+    """
+    with embedding_backfill_lock() as acquired:
+        if not acquired:
+            return
+        embedded = 0
+        for resume_id in await stale_embedding_ids():
+            resume = USER_RESUMES.get(resume_id)
+            if not resume or not resume.get("file_path") or Path(resume["file_path"]).suffix.lower() not in (".pdf", ".txt"):
+                continue
+            try:
+                await ensure_content_hashes([resume])
+                if not resume.get("content_hash"):
+                    continue  # file missing
+                resume_text = await asyncio.to_thread(
+                    get_or_extract_text, resume["file_path"], extract_resume_file_text, resume["content_hash"]
+                )
+                if resume_text and resume_text.strip() and await embed_resume(resume_id, resume_text):
+                    embedded += 1
+            except EmbeddingError as e:
+                print(f"Embedding backfill stopped: {str(e)}")
+                break
+            except Exception as e:
+                print(f"Warning: Could not embed {resume.get('filename', 'N/A')}: {str(e)}")
+        if embedded:
+            print(f"Embedded {embedded} resume(s) with {ACTIVE_EMBEDDING_MODEL}")
+
+@app.on_event("startup")
+async def start_embedding_backfill():
+    """
+    Re-embeds resumes without an embedding of the active model in the background
+    """
+    app.state.embedding_backfill = asyncio.create_task(backfill_embeddings())
+
+@app.on_event("shutdown")
+async def stop_embedding_client():
+    """
+    Closes the embedding API client's connection pool
+    """
+    await close_embedding_client()
+
+def group_by_content(resumes: List[Dict[str, Any]]) -> List[List[int]]:
+    """
+    Groups resume positions by file content hash, so byte-identical uploads are scored once.
+    """
+    groups: Dict[str, List[int]] = {}
+    for position, resume in enumerate(resumes):
+        groups.setdefault(resume.get("content_hash") or resume["id"], []).append(position)
+    return list(groups.values())
+
+def search_deadline(search_query: SearchQuery) -> Optional[float]:
+    """
+    Event loop time by which LLM scoring must finish, from the query's time_budget_ms.
+    """
+    if search_query.time_budget_ms is None:
+        return None
+    return asyncio.get_running_loop().time() + max(0, search_query.time_budget_ms) / 1000
+
+async def score_resumes_with_llm(
+    job_query: str,
+    resumes: List[Dict[str, Any]],
+    cache_stats: Dict[str, int],
+    deadline: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    LLM-scores each unique document once and shares the result with every resume
+    that has the same content. Results are in the same order as resumes.
+    """
+    await ensure_content_hashes(resumes)
+    groups = group_by_content(resumes)
+    unique_resumes = [resumes[group[0]] for group in groups]
+    score_cache = await prefetch_cached_scores(job_query, unique_resumes)
     try:
-        resume_experience = int(float(resume_experience_str))
-    except ValueError:
-        pass # Default to 0 if not a valid number
-
-    # Extract experience years from query using regex (e.g., "2+ years", "3 years experience")
-    experience_match = re.search(r'(\d+)\s*\+?\s*year(?:s)?(?: experience)?', job_query, re.IGNORECASE)
-    required_experience = 0
-    if experience_match:
-        required_experience = int(experience_match.group(1))
-
-    if resume_experience >= required_experience:
-        experience_score = 100 # Full score if meets or exceeds required experience
-        match_reasons.append(f"Experience: Matches required {required_experience}+ years.")
-    elif resume_experience > 0 and required_experience > 0:
-        experience_score = (resume_experience / required_experience) * 100 # Partial score
-        match_reasons.append(f"Experience: {resume_experience} years, {required_experience} years required.")
+        unique_results = await score_concurrently(
+            unique_resumes,
+            lambda resume: score_resume_with_llm(job_query, resume, cache_stats, score_cache),
+            lambda resume, error: llm_score_fallback(job_query, resume, error),
+            deadline=deadline
+        )
+    finally:
+        # Shielded: scores already paid for are written even if the request is cancelled
+        await asyncio.shield(score_cache.flush())
+    print(f"Scored {len(groups)} unique document(s) for {len(resumes)} resume(s)")
+    score_results = [None] * len(resumes)
+    for group, score_result in zip(groups, unique_results):
+        for position in group:
+            score_results[position] = dict(score_result)
+    return score_results
+
+def llm_score_fallback(job_query: str, resume: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+    """
+    Score used when LLM scoring of a resume fails, exceeds its timeout, or misses the search deadline.
+    """
+    if isinstance(error, ScoringDeadlineExceeded):
+        score_result = calculate_keyword_match_score(job_query, resume)
+        score_result["source"] = "keyword_deadline_fallback"
+        return score_result
+    if isinstance(error, asyncio.TimeoutError):
+        print(f"LLM scoring timed out for {resume.get('filename', 'N/A')}. Using mock score.")
+        return {"score": random.randint(30, 60), "reason": "LLM analysis timed out.", "source": "llm_timeout_fallback"}
+    print(f"Error processing resume {resume.get('filename', 'N/A')}: {str(error)}. Using mock score.")
+    return {"score": random.randint(30, 60), "reason": f"Error during LLM analysis: {str(error)}", "source": "llm_error_fallback"}
+
+def keyword_score_results(job_query: str, resumes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Keyword match scores for a list of resumes, read from the inverted index.
+    Resumes missing from the index are scored directly.
+    """
+    keyword_scores = KEYWORD_INDEX.score(job_query)
+    return [
+        keyword_scores.get(resume["id"]) or calculate_keyword_match_score(job_query, resume)
+        for resume in resumes
+    ]
+
+async def ensure_bm25_indexed(resumes: List[Dict[str, Any]]):
+    """
+    Adds resumes that predate the BM25 index (or whose text was not extracted at
+    upload) to it, reading their text from the extracted-text cache.
+    """
+    for resume in resumes:
+        if resume["id"] in BM25_INDEX or not resume.get("file_path"):
+            continue
+        if Path(resume["file_path"]).suffix.lower() not in (".pdf", ".txt"):
+            continue
+        try:
+            await ensure_content_hashes([resume])
+            resume_text = await asyncio.to_thread(
+                get_or_extract_text, resume["file_path"], extract_resume_file_text, resume["content_hash"]
+            )
+            BM25_INDEX.add(resume["id"], resume_text)
+        except Exception as e:
+            print(f"Warning: Could not add {resume.get('filename', 'N/A')} to the BM25 index: {str(e)}")
+
+def bm25_score_results(job_query: str, resumes: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    BM25 full-text scores (0-100) for a list of resumes, in the same order.
+    """
+    ranked = BM25_INDEX.search(job_query, [resume["id"] for resume in resumes])
+    hits = {resume_id: (score, terms) for resume_id, score, terms in ranked}
+    score_results = []
+    for resume in resumes:
+        if resume["id"] in hits:
+            score, terms = hits[resume["id"]]
+            score_results.append({
+                "score": min(100, int(score * 100)),
+                "reason": f"Full-text match on {len(terms)} term(s): {', '.join(terms)}.",
+                "source": "bm25"
+            })
+        else:
+            score_results.append({"score": 0, "reason": "No query terms found in resume text.", "source": "bm25"})
+    return score_results
+
+def apply_search_filters(filters: Dict[str, Any], resumes: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+    """
+    Narrows resumes to those passing the search filters, resolved against the
+    filter index so scoring only runs on the rows that pass.
+    Returns None when no filters were given.
+    """
+    matched_ids = FILTER_INDEX.match(filters)
+    if matched_ids is None:
+        return None
+    return [resume for resume in resumes if resume["id"] in matched_ids]
+
+def select_keyword_top_k(
+    job_query: str,
+    resumes: List[Dict[str, Any]],
+    top_k: int,
+    filtered: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Picks the best top_k resumes for a keyword query. Uses the vectorized matrix
+    scorer when numpy/scipy are available, otherwise the inverted index.
+    With filtered, only the given resumes are ranked.
+    """
+    allowed_ids = {resume["id"] for resume in resumes} if filtered else None
+    if KEYWORD_MATRIX_AVAILABLE:
+        top_ids = [resume_id for resume_id, _ in KEYWORD_MATRIX.top_k(job_query, top_k, allowed_ids=allowed_ids)]
     else:
-        experience_score = 0
-    score += experience_score * 0.2
-
-    # 4. Education Level Match (Weight 0.1)
-    query_education_lower = job_query.lower()
-    resume_education_lower = str(resume.get("educationLevel", "")).lower()
-    education_score = 0
-
-    if "master" in query_education_lower and "master" in resume_education_lower:
-        education_score = 100
-    elif "bachelor" in query_education_lower and "bachelor" in resume_education_lower:
-        education_score = 100
-    elif "phd" in query_education_lower and "phd" in resume_education_lower:
-        education_score = 100
-    elif not "master" in query_education_lower and not "bachelor" in query_education_lower and not "phd" in query_education_lower:
-        # If no specific education level is requested, consider any education a partial match
-        if resume_education_lower:
-            education_score = 50
-    
-    if education_score > 0:
-        match_reasons.append(f"Education: {resume.get('educationLevel', 'N/A')} matches query.")
-    score += education_score * 0.1
+        top_ids = KEYWORD_INDEX.score(job_query).top(top_k, allowed=allowed_ids)
+    resumes_by_id = {resume["id"]: resume for resume in resumes}
+    return [resumes_by_id[resume_id] for resume_id in top_ids if resume_id in resumes_by_id]
 
-    final_score = min(100, max(0, int(score))) # Ensure score is between 0 and 100
-    
-    return {
-        "score": final_score,
-        "reason": "; ".join(match_reasons) if match_reasons else "No specific match reasons found for keyword search.",
-        "source": "keyword_matching"
-    }
+def select_hybrid_candidates(
+    search_query: SearchQuery,
+    resumes: List[Dict[str, Any]],
+    filtered: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Stage 1 of hybrid search: rank every resume with keyword matching and keep the
+    top-K candidates above the score threshold for the LLM to rerank.
+    With filtered, only the given resumes are ranked.
+    """
+    top_k = search_query.rerank_top_k if search_query.rerank_top_k is not None else HYBRID_RERANK_TOP_K
+    min_score = search_query.rerank_min_score if search_query.rerank_min_score is not None else HYBRID_MIN_KEYWORD_SCORE
+
+    resumes_by_id = {resume["id"]: resume for resume in resumes}
+    allowed_ids = resumes_by_id if filtered else None
+    top_ids = KEYWORD_INDEX.score(search_query.query).top(top_k, min_score, allowed=allowed_ids)
+    candidates = [resumes_by_id[resume_id] for resume_id in top_ids if resume_id in resumes_by_id]
+    print(f"Hybrid search: reranking {len(candidates)} of {len(resumes)} resumes with the LLM")
+    return candidates
+
+def build_search_result(resume: Dict[str, Any], score_result: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Combines a resume record with its score result for the search response.
+    """
+    result = resume.copy()
+    result["match_score"] = score_result["score"]
+    result["match_reason"] = score_result["reason"]
+    result["score_source"] = score_result["source"]
+    return result
 
 @app.post("/api/resumes/search")
 async def search_resume(search_query: SearchQuery):
     """
     Search for resumes based on query and filters
     """
+    try:
+        filters = normalize_filters(search_query.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     try:
         print(f"Received search query: {search_query.query}, search_type: {search_query.search_type}")
+        await sync_resumes()
         
         # If no results or no user resumes, return mock data
         mock_results_data = [
@@ -734,64 +1093,55 @@ async def search_resume(search_query: SearchQuery):
         
         if USER_RESUMES and len(USER_RESUMES) > 0:
             print(f"Searching through {len(USER_RESUMES)} user resumes")
+            # Snapshot the records, other requests may change USER_RESUMES while we await
+            resumes = list(USER_RESUMES.values())
+            cache_stats = {"hits": 0, "misses": 0}
+            deadline = search_deadline(search_query)
+
+            # Filters are resolved against the filter index before any scoring
+            filtered_resumes = apply_search_filters(filters, resumes)
+            filtered = filtered_resumes is not None
+            if filtered:
+                print(f"Filters {search_query.filters} matched {len(filtered_resumes)} of {len(resumes)} resumes")
+                if not filtered_resumes:
+                    return []
+                resumes = filtered_resumes
             
-            results = []
-            for resume in USER_RESUMES:
-                resume_content = ""
-                score_result = {"score": 0, "reason": "", "source": ""}
-
-                if search_query.search_type == "ai_analysis":
-                    # LLM-based analysis
-                    if resume.get("file_path"):
-                        try:
-                            file_extension = Path(resume["file_path"]).suffix.lower()
-                            if file_extension == ".pdf":
-                                resume_content = extract_text_from_pdf(resume["file_path"])
-                                if not resume_content or len(resume_content.strip()) < 100:
-                                    print(f"Warning: Primary PDF extraction failed for {resume.get('filename', 'N/A')}. Trying pdfplumber fallback.")
-                                    resume_content = extract_with_pdfplumber(resume["file_path"])
-                            elif file_extension == ".txt":
-                                with open(resume["file_path"], "r") as f:
-                                    resume_content = f.read()
-                            else:
-                                print(f"Warning: Unsupported file format for {resume.get('filename', 'N/A')}. Skipping LLM scoring.")
-                                score_result = {"score": 0, "reason": "Unsupported file format for LLM analysis.", "source": "unsupported_format_fallback"}
-
-                            if resume_content and len(resume_content.strip()) >= 50: # Minimum content length to attempt LLM scoring
-                                print(f"Getting LLM relevance score for {resume.get('filename', 'N/A')} with query: {search_query.query[:50]}...")
-                                score_result = await get_relevance_score_with_openrouter(
-                                    job_query=search_query.query,
-                                    resume_text=resume_content
-                                )
-                                score_result["source"] = score_result.get("source", "openrouter_llm")
-                            else:
-                                print(f"Warning: Not enough content extracted from {resume.get('filename', 'N/A')}. Using mock score.")
-                                score_result = {"score": random.randint(30, 60), "reason": "Insufficient resume content for LLM analysis.", "source": "mock_content_fallback"}
-
-                        except Exception as e:
-                            print(f"Error processing resume {resume.get('filename', 'N/A')}: {str(e)}. Using mock score.")
-                            score_result = {"score": random.randint(30, 60), "reason": f"Error during LLM analysis: {str(e)}", "source": "llm_error_fallback"}
-                    else:
-                        print(f"No file_path for {resume.get('filename', 'N/A')}. Using mock score.")
-                        score_result = {"score": random.randint(20, 50), "reason": "Resume file path missing.", "source": "no_file_path_fallback"}
-                
-                elif search_query.search_type == "resume_matching":
-                    # Non-LLM based resume matching
-                    score_result = calculate_keyword_match_score(search_query.query, resume)
-                    score_result["source"] = "keyword_matching"
-
-                result = resume.copy()
-                result["match_score"] = score_result["score"]
-                result["match_reason"] = score_result["reason"]
-                result["score_source"] = score_result["source"]
-                results.append(result)
+            if search_query.search_type in ("ai_analysis", "hybrid"):
+                if search_query.search_type == "hybrid":
+                    # Only the keyword-ranked shortlist goes to the LLM
+                    resumes = select_hybrid_candidates(search_query, resumes, filtered)
+                # LLM-based analysis, scored concurrently with a bounded in-flight limit
+                score_results = await score_resumes_with_llm(search_query.query, resumes, cache_stats, deadline)
+                print(f"Score cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)")
+            elif search_query.search_type == "bm25":
+                # Full-text BM25 ranking over the extracted resume text
+                await ensure_bm25_indexed(resumes)
+                score_results = bm25_score_results(search_query.query, resumes)
+                if search_query.top_k is not None:
+                    ranked = sorted(zip(resumes, score_results), key=lambda pair: pair[1]["score"], reverse=True)[:max(0, search_query.top_k)]
+                    resumes = [resume for resume, _ in ranked]
+                    score_results = [score_result for _, score_result in ranked]
+            else:
+                # Non-LLM based resume matching
+                if search_query.top_k is not None:
+                    resumes = select_keyword_top_k(search_query.query, resumes, search_query.top_k, filtered)
+                score_results = keyword_score_results(search_query.query, resumes)
+
+            results = [build_search_result(resume, score_result) for resume, score_result in zip(resumes, score_results)]
             
             # Sort by match score
             results.sort(key=lambda x: x.get("match_score", 0), reverse=True)
             
             if results:
                 print(f"Found {len(results)} matching resumes using {search_query.search_type} scoring")
-                return results
+                return JSONResponse(
+                    content=results,
+                    headers={
+                        "X-Score-Cache-Hits": str(cache_stats["hits"]),
+                        "X-Score-Cache-Misses": str(cache_stats["misses"])
+                    }
+                )
             else:
                 print(f"No matches found after {search_query.search_type} scoring attempts, returning mock data.")
                 return mock_results_data # Fallback if no relevant results
@@ -806,14 +1156,136 @@ async def search_resume(search_query: SearchQuery):
             content={"detail": f"Resume search failed: {str(e)}"}
         )
 
+@app.post("/api/resumes/search/stream")
+async def search_resume_stream(search_query: SearchQuery, request: Request):
+    """
+    Search for resumes and stream each scored resume as soon as it is ready,
+    followed by a final ranked summary. Sends NDJSON, or Server-Sent Events
+    when the client accepts text/event-stream.
+    """
+    print(f"Received streaming search query: {search_query.query}, search_type: {search_query.search_type}")
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    try:
+        filters = normalize_filters(search_query.filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await sync_resumes()
+    resumes = list(USER_RESUMES.values())
+    filtered_resumes = apply_search_filters(filters, resumes)
+    filtered = filtered_resumes is not None
+    if filtered:
+        resumes = filtered_resumes
+    cache_stats = {"hits": 0, "misses": 0}
+
+    def format_event(event: str, data: Dict[str, Any]) -> str:
+        if use_sse:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({"event": event, **data}) + "\n"
+
+    async def event_stream():
+        results = []
+        deadline = search_deadline(search_query)
+        score_cache = None
+        try:
+            if search_query.search_type in ("ai_analysis", "hybrid"):
+                candidates = resumes
+                if search_query.search_type == "hybrid":
+                    candidates = select_hybrid_candidates(search_query, resumes, filtered)
+                # Each unique document is scored once and streamed for every copy of it
+                await ensure_content_hashes(candidates)
+                groups = group_by_content(candidates)
+                unique_candidates = [candidates[group[0]] for group in groups]
+                score_cache = await prefetch_cached_scores(search_query.query, unique_candidates)
+                async for index, score_result in score_as_completed(
+                    unique_candidates,
+                    lambda resume: score_resume_with_llm(search_query.query, resume, cache_stats, score_cache),
+                    lambda resume, error: llm_score_fallback(search_query.query, resume, error),
+                    deadline=deadline
+                ):
+                    for position in groups[index]:
+                        result = build_search_result(candidates[position], score_result)
+                        results.append(result)
+                        yield format_event("result", {"result": result})
+            elif search_query.search_type == "bm25":
+                await ensure_bm25_indexed(resumes)
+                scored = sorted(
+                    zip(resumes, bm25_score_results(search_query.query, resumes)),
+                    key=lambda pair: pair[1]["score"], reverse=True
+                )
+                if search_query.top_k is not None:
+                    scored = scored[:max(0, search_query.top_k)]
+                for resume, score_result in scored:
+                    result = build_search_result(resume, score_result)
+                    results.append(result)
+                    yield format_event("result", {"result": result})
+            else:
+                candidates = resumes
+                if search_query.top_k is not None:
+                    candidates = select_keyword_top_k(search_query.query, resumes, search_query.top_k, filtered)
+                for resume, score_result in zip(candidates, keyword_score_results(search_query.query, candidates)):
+                    result = build_search_result(resume, score_result)
+                    results.append(result)
+                    yield format_event("result", {"result": result})
+
+            results.sort(key=lambda x: x.get("match_score", 0), reverse=True)
+            yield format_event("summary", {
+                "results": results,
+                "total": len(results),
+                "cache_hits": cache_stats["hits"],
+                "cache_misses": cache_stats["misses"]
+            })
+        except Exception as e:
+            print(f"Error in search_resume_stream: {str(e)}")
+            yield format_event("error", {"detail": f"Resume search failed: {str(e)}"})
+        finally:
+            # Also when the client disconnects mid-stream: scores already paid for are written.
+            # Shielded so the write survives cancellation of the response task.
+            if score_cache is not None:
+                await asyncio.shield(score_cache.flush())
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson"
+    )
+
+@app.get("/api/resumes/facets")
+async def get_resume_facets(
+    category: Optional[str] = None,
+    educationLevel: Optional[str] = None,
+    minExperience: Optional[int] = None,
+    skills: Optional[List[str]] = Query(None),
+    skill_limit: int = 20
+):
+    """
+    Skill, category, education and experience-bucket counts for the search sidebar,
+    over all resumes or the subset matching the given filters
+    """
+    try:
+        filters = normalize_filters({
+            "category": category,
+            "educationLevel": educationLevel,
+            "minExperience": minExperience,
+            "skills": skills
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await sync_resumes()
+    return FACET_INDEX.facets(filters, skill_limit)
+
 @app.get("/api/resumes")
-async def get_all_resumes():
+async def get_all_resumes(
+    request: Request,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None
+):
     """
     Get all resumes
     """
     try:
         # Return user resumes for now
-        return await get_user_resumes()
+        return await get_user_resumes(request, limit, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error in get_all_resumes: {str(e)}")
         return JSONResponse(
@@ -828,7 +1300,8 @@ async def download_resume(resume_id: str):
     """
     try:
         # Find the resume in our in-memory storage
-        resume = next((r for r in USER_RESUMES if r["id"] == resume_id), None)
+        await sync_resumes()
+        resume = USER_RESUMES.get(resume_id)
         
         if not resume:
             return JSONResponse(
@@ -836,13 +1309,10 @@ async def download_resume(resume_id: str):
                 content={"detail": f"Resume {resume_id} not found"}
             )
         
-        # Look for the file in the storage directory
-        storage_dir = Path("./storage/resumes")
-        
-        # Try to find the file with the resume ID prefix
-        resume_files = list(storage_dir.glob(f"{resume_id}_*"))
+        # The record holds the stored file's path, no directory scan needed
+        file_path = await resolve_resume_file(resume)
         
-        if not resume_files:
+        if file_path is None:
             # If no file found, return a mock PDF
             print(f"No file found for resume {resume_id}, returning mock PDF")
             mock_pdf_path = Path("./storage/mock_resume.pdf")
@@ -859,8 +1329,6 @@ async def download_resume(resume_id: str):
                 media_type="application/pdf"
             )
         
-        # Return the first matching file
-        file_path = resume_files[0]
         return FileResponse(
             path=str(file_path),
             filename=resume["filename"],
@@ -879,18 +1347,26 @@ async def delete_resume(resume_id: str):
     Delete a resume by ID
     """
     try:
-        global USER_RESUMES
         # Find the resume to delete
-        resume_to_delete = next((r for r in USER_RESUMES if r["id"] == resume_id), None)
+        await sync_resumes()
+        resume_to_delete = USER_RESUMES.get(resume_id)
         if resume_to_delete:
             # Delete the file if it exists
-            file_path = Path(resume_to_delete.get("file_path", ""))
-            if file_path.exists():
+            file_path = await resolve_resume_file(resume_to_delete)
+            content_hash = resume_to_delete.get("content_hash")
+            if file_path is not None:
+                content_hash = content_hash or await asyncio.to_thread(file_sha256, str(file_path))
                 file_path.unlink()
             
             # Remove from storage
-            USER_RESUMES = [r for r in USER_RESUMES if r["id"] != resume_id]
-            save_resumes(USER_RESUMES)
+            USER_RESUMES.pop(resume_id, None)
+            apply_resume_changes(await asyncio.to_thread(RESUME_STORE.delete, resume_id))
+            unindex_resume(resume_id)
+            await asyncio.to_thread(remove_resume_embedding, resume_id)
+            
+            # Drop the cached text unless another upload has the same content
+            if content_hash and not any(r.get("content_hash") == content_hash for r in USER_RESUMES.values()):
+                invalidate_cached_text(content_hash)
             
         return {"status": "success", "message": f"Resume {resume_id} deleted successfully"}
     except Exception as e:
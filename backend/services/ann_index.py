@@ -0,0 +1,407 @@
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .embedding_matrix import EMBEDDING_MATRIX_DIR, FILE_LOCKS_AVAILABLE, EmbeddingMatrix
+from .embedding_service import normalize_embeddings, top_k_indices
+from .quantization import QUANTIZERS, make_quantizer
+
+if FILE_LOCKS_AVAILABLE:
+    import fcntl
+
+# Approximate nearest-neighbour search over the embedding matrix (IVF-flat).
+# Spherical k-means splits the normalized rows into ANN_NLIST clusters; a
+# query is compared with the centroids and only the rows of the nprobe
+# closest clusters are scored exactly. Higher nprobe means better recall
+# and slower queries (see benchmark_ann_search.py).
+#
+# The inverted lists are a CSR layout (matrix rows sorted by cluster plus
+# offsets) over the rows assigned at the last rebuild. Rows appended since are
+# assigned to their nearest centroid on the next search and kept in a small
+# tail that is scanned linearly until the next rebuild. Deleted rows are
+# skipped through the matrix's alive mask. Centroids and assignments (by
+# resume id) are saved to storage/embedding_matrix/ivf.npz, so a restart or a
+# compaction of the matrix does not need to train again.
+#
+# With ANN_QUANTIZATION=int8 or pq, every row also gets a compressed code (see
+# quantization) kept in memory. Probed rows are then scored against the codes
+# (ADC) and only the best ANN_RERANK_FACTOR * k are re-ranked exactly against
+# the float32 matrix, so a search touches a few pages of the matrix file
+# instead of every probed row.
+ANN_INDEX_PATH = EMBEDDING_MATRIX_DIR / "ivf.npz"
+
+ANN_MIN_ROWS = int(os.getenv("ANN_MIN_ROWS", "20000"))  # exact search below this corpus size
+ANN_NLIST = int(os.getenv("ANN_NLIST", "0"))  # 0: about sqrt(rows)
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_TRAIN_ITERATIONS = int(os.getenv("ANN_TRAIN_ITERATIONS", "10"))
+ANN_TRAIN_SAMPLE_PER_LIST = 64
+ANN_RETRAIN_GROWTH = 4.0  # retrain once the corpus has grown this much since training
+ANN_TAIL_REBUILD = 10000  # rebuild the CSR lists once this many rows sit in the tail
+ANN_QUANTIZATION = os.getenv("ANN_QUANTIZATION", "none")  # none, int8 or pq
+ANN_RERANK_FACTOR = int(os.getenv("ANN_RERANK_FACTOR", "32"))
+ANN_QUANTIZER_TRAIN_SAMPLE = 16384
+
+def default_nlist(rows: int) -> int:
+    """Number of clusters for a corpus size"""
+    if ANN_NLIST > 0:
+        return ANN_NLIST
+    return max(1, min(rows // 39, int(np.sqrt(rows))))
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for each (normalized) row, in chunks to bound memory"""
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), chunk_size):
+        chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+        assignment[start:start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return assignment
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = ANN_TRAIN_ITERATIONS, seed: int = 0) -> np.ndarray:
+    """
+    Spherical k-means over normalized rows
+
+    Args:
+        vectors: (n, dim) normalized training rows
+        nlist: Number of clusters
+        iterations: Lloyd iterations
+        seed: Random seed for the initial centroids
+
+    Returns:
+        (nlist, dim) float32 matrix of normalized centroids
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    centroids = np.array(vectors[rng.choice(len(vectors), nlist, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        assignment = assign_to_centroids(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        non_empty = counts > 0
+        sums = np.zeros_like(centroids)
+        sums[non_empty] = np.add.reduceat(np.asarray(vectors, dtype=np.float32)[order], starts[non_empty], axis=0)
+        # Empty clusters restart from random rows
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        centroids = normalize_embeddings(sums)
+    return centroids
+
+class IVFIndex:
+    """Inverted-file index with exact scoring inside the probed lists"""
+
+    def __init__(self, matrix: EmbeddingMatrix, path: Path = ANN_INDEX_PATH, quantization: str = ANN_QUANTIZATION):
+        self.matrix = matrix
+        self.path = Path(path)
+        self.quantization = quantization if quantization in QUANTIZERS else "none"
+        self._lock = threading.RLock()
+        self._lock_file = open(self.path.with_suffix(".lock"), "a+")
+        self._training = False
+        self._reset()
+        self._load_file()
+
+    def _reset(self) -> None:
+        self.centroids: Optional[np.ndarray] = None
+        self.quantizer = None
+        self.trained_rows = 0
+        self._file_stat: Optional[Tuple[int, int]] = None
+        # Assignments read from the file (id -> position in the saved arrays), until mapped to rows
+        self._saved_positions: Dict[str, int] = {}
+        self._saved_lists = np.zeros(0, dtype=np.int32)
+        self._saved_codes: Optional[np.ndarray] = None
+        self._view = None  # matrix view of the last sync
+        self._generation: Optional[int] = None
+        self._row_ids: List[Optional[str]] = []
+        self._row_list = np.zeros(0, dtype=np.int32)  # matrix row -> list
+        self._codes: Optional[np.ndarray] = None  # matrix row -> quantized code
+        self._csr_rows = 0  # rows covered by the CSR lists; the rest is the tail
+        self._csr_order = np.zeros(0, dtype=np.int64)
+        self._csr_offsets = np.zeros(1, dtype=np.int64)
+
+    @property
+    def trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    @contextmanager
+    def _train_lock(self):
+        """Non-blocking inter-process lock so only one worker trains; yields False if held elsewhere"""
+        if not FILE_LOCKS_AVAILABLE:
+            yield True
+            return
+        try:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _stat_file(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load_file(self) -> None:
+        """Load centroids and saved assignments written by any worker"""
+        file_stat = self._stat_file()
+        if file_stat is None:
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                quantization = str(data["quantization"]) if "quantization" in data else "none"
+                if quantization != self.quantization:
+                    print(f"ANN index {self.path} uses {quantization} codes, not {self.quantization}; it will be retrained")
+                    return
+                centroids = data["centroids"].astype(np.float32)
+                ids = data["ids"].tolist()
+                lists = data["lists"]
+                trained_rows = int(data["trained_rows"])
+                quantizer, codes = None, None
+                if quantization != "none":
+                    state = {key[2:]: data[key] for key in data.files if key.startswith("q_")}
+                    quantizer = QUANTIZERS[quantization].from_state(state)
+                    codes = data["codes"]
+        except Exception as e:
+            print(f"Error loading ANN index {self.path}: {str(e)}")
+            return
+        with self._lock:
+            self._reset()
+            self.centroids = centroids
+            self.quantizer = quantizer
+            self.trained_rows = trained_rows
+            self._saved_positions = {resume_id: position for position, resume_id in enumerate(ids)}
+            self._saved_lists = lists
+            self._saved_codes = codes
+            self._file_stat = file_stat
+
+    def save(self) -> None:
+        """Write centroids and the current assignments (by resume id) to disk"""
+        with self._lock:
+            if self.centroids is None:
+                return
+            count = len(self._row_list)
+            ids = self._row_ids[:count]
+            alive = np.array([resume_id is not None for resume_id in ids], dtype=bool)
+            arrays = {
+                "centroids": self.centroids,
+                "ids": np.array([resume_id for resume_id in ids if resume_id is not None], dtype=str),
+                "lists": self._row_list[alive],
+                "trained_rows": self.trained_rows,
+                "quantization": self.quantization,
+            }
+            if self.quantizer is not None:
+                arrays["codes"] = self._codes[alive]
+                arrays.update({f"q_{key}": value for key, value in self.quantizer.state().items()})
+            tmp_path = self.path.with_name(f"{self.path.stem}.{os.getpid()}.tmp.npz")
+            np.savez(tmp_path, **arrays)
+            os.replace(tmp_path, self.path)
+            self._file_stat = self._stat_file()
+
+    def train(self, nlist: Optional[int] = None, iterations: int = ANN_TRAIN_ITERATIONS) -> bool:
+        """
+        Train centroids on a sample of the matrix, assign every row and save
+
+        Args:
+            nlist: Number of clusters (default from the corpus size)
+            iterations: k-means iterations
+
+        Returns:
+            False if the matrix is empty or another worker is training
+        """
+        with self._train_lock() as acquired:
+            if not acquired:
+                return False
+            self.matrix.refresh()
+            view = self.matrix.view()
+            rows = np.flatnonzero(view.alive)
+            if len(rows) == 0:
+                return False
+            nlist = nlist or default_nlist(len(rows))
+            rng = np.random.default_rng(len(rows))
+            sample_size = min(len(rows), nlist * ANN_TRAIN_SAMPLE_PER_LIST)
+            sample = np.sort(rng.choice(rows, sample_size, replace=False))
+            centroids = train_centroids(np.asarray(view.vectors[sample]), nlist, iterations)
+            row_list = assign_to_centroids(view.vectors, centroids)
+            quantizer, codes = make_quantizer(self.quantization), None
+            if quantizer is not None:
+                quantizer.train(np.asarray(view.vectors[sample[:ANN_QUANTIZER_TRAIN_SAMPLE]]))
+                codes = quantizer.encode(view.vectors)
+
+            with self._lock:
+                self._reset()
+                self.centroids = centroids
+                self.quantizer = quantizer
+                self.trained_rows = len(rows)
+                self._view = view
+                self._generation = view.generation
+                self._row_ids = view.row_ids
+                self._row_list = row_list
+                self._codes = codes
+                self._rebuild_lists()
+                self.save()
+            print(f"Trained ANN index: {nlist} lists over {len(rows)} embeddings" + (
+                f", {quantizer.kind} codes of {quantizer.code_size} bytes" if quantizer is not None else ""
+            ))
+            return True
+
+    def maybe_train_in_background(self) -> None:
+        """Start training in a thread when the corpus is big enough and the index is missing or stale"""
+        rows = len(self.matrix)
+        if rows < ANN_MIN_ROWS or self._training:
+            return
+        if self.centroids is not None and rows < self.trained_rows * ANN_RETRAIN_GROWTH:
+            return
+        self._training = True
+
+        def run():
+            try:
+                self.train()
+            except Exception as e:
+                print(f"Error training ANN index: {str(e)}")
+            finally:
+                self._training = False
+
+        threading.Thread(target=run, name="ann-train", daemon=True).start()
+
+    def _rebuild_lists(self) -> None:
+        """Rebuild the CSR lists from the row assignments"""
+        self._csr_order = np.argsort(self._row_list, kind="stable")
+        counts = np.bincount(self._row_list, minlength=self.nlist)
+        self._csr_offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._csr_rows = len(self._row_list)
+
+    def _sync(self) -> None:
+        """Follow the matrix: new training saved by another worker, compaction, appended rows"""
+        file_stat = self._stat_file()
+        if file_stat is not None and file_stat != self._file_stat:
+            self._load_file()
+        if self.centroids is None:
+            return
+        self.matrix.refresh()
+        if self.matrix.dim is not None and self.matrix.dim != self.centroids.shape[1]:
+            # Trained on another embedding model's vectors: drop it until it is retrained
+            print(f"ANN index {self.path} has dimension {self.centroids.shape[1]}, the matrix {self.matrix.dim}; it will be retrained")
+            self._reset()
+            self._file_stat = file_stat
+            return
+        view = self.matrix.view()
+        count = len(view.alive)
+
+        self._view = view
+        if view.generation != self._generation:
+            # Rows were renumbered (or this is the first sync after loading): map assignments by id
+            if self._saved_positions:
+                positions_by_id, lists, codes = self._saved_positions, self._saved_lists, self._saved_codes
+            else:
+                positions_by_id = {resume_id: row for row, resume_id in enumerate(self._row_ids[:len(self._row_list)]) if resume_id is not None}
+                lists, codes = self._row_list, self._codes
+            positions = np.fromiter((positions_by_id.get(resume_id, -1) for resume_id in view.row_ids[:count]), dtype=np.int64, count=count)
+            known = positions >= 0
+            row_list = np.zeros(count, dtype=np.int32)  # tombstoned rows stay in list 0, never returned
+            row_list[known] = lists[positions[known]]
+            if self.quantizer is not None:
+                row_codes = np.zeros((count, self.quantizer.code_size), dtype=codes.dtype)
+                row_codes[known] = codes[positions[known]]
+            unassigned = np.flatnonzero(~known & view.alive)
+            if len(unassigned):
+                row_list[unassigned] = assign_to_centroids(view.vectors[unassigned], self.centroids)
+                if self.quantizer is not None:
+                    row_codes[unassigned] = self.quantizer.encode(view.vectors[unassigned])
+            self._saved_positions, self._saved_lists, self._saved_codes = {}, np.zeros(0, dtype=np.int32), None
+            self._generation = view.generation
+            self._row_ids = view.row_ids
+            self._row_list = row_list
+            self._codes = row_codes if self.quantizer is not None else None
+            self._rebuild_lists()
+            return
+
+        self._row_ids = view.row_ids
+        if count > len(self._row_list):
+            new_vectors = view.vectors[len(self._row_list):count]
+            self._row_list = np.concatenate((self._row_list, assign_to_centroids(new_vectors, self.centroids)))
+            if self.quantizer is not None:
+                self._codes = np.concatenate((self._codes, self.quantizer.encode(new_vectors)))
+            if len(self._row_list) - self._csr_rows >= ANN_TAIL_REBUILD:
+                self._rebuild_lists()
+
+    def search(
+        self,
+        query_embedding: Any,
+        k: int,
+        nprobe: Optional[int] = None,
+        allowed_ids: Optional[Iterable[str]] = None
+    ) -> Optional[Tuple[List[str], np.ndarray]]:
+        """
+        Approximate top-k by cosine similarity
+
+        Args:
+            query_embedding: Query vector with the matrix's dimension
+            k: Number of results
+            nprobe: Number of lists to scan (default ANN_NPROBE)
+            allowed_ids: Optional ids to restrict the result to
+
+        Returns:
+            (resume ids, similarities) highest first, or None when the index is not trained
+            (or the matrix was compacted during the search)
+        """
+        with self._lock:
+            self._sync()
+            if self.centroids is None:
+                return None
+            view, quantizer, codes = self._view, self.quantizer, self._codes
+            query = normalize_embeddings(query_embedding)[0]
+            if len(query) != self.centroids.shape[1]:
+                raise ValueError(f"Query embedding has dimension {len(query)}, the index has {self.centroids.shape[1]}")
+
+            probe = top_k_indices(self.centroids @ query, nprobe or ANN_NPROBE)
+            wanted = np.zeros(self.nlist, dtype=bool)
+            wanted[probe] = True
+            parts = [self._csr_order[self._csr_offsets[p]:self._csr_offsets[p + 1]] for p in probe]
+            tail = self._row_list[self._csr_rows:]
+            parts.append(self._csr_rows + np.flatnonzero(wanted[tail]))
+            rows = np.concatenate(parts)
+
+        rows = rows[view.alive[rows]]
+        if allowed_ids is not None:
+            allowed_rows = self.matrix.rows_for(allowed_ids)
+            if self.matrix.view().generation != view.generation:
+                return None  # compacted meanwhile, the rows no longer line up
+            allowed = np.zeros(len(view.alive), dtype=bool)
+            allowed[allowed_rows[allowed_rows < len(allowed)]] = True
+            rows = rows[allowed[rows]]
+        if quantizer is not None:
+            # Approximate scores from the codes, exact re-rank of the best candidates
+            approximate = quantizer.scores(quantizer.lookup(query), codes[rows])
+            rows = rows[top_k_indices(approximate, max(k, k * ANN_RERANK_FACTOR))]
+        rows.sort()  # sequential reads over the mapped file
+        scores = view.vectors[rows] @ query
+        top = top_k_indices(scores, k)
+        return [view.row_ids[row] for row in rows[top]], scores[top]
+
+    def stats(self) -> Dict[str, Any]:
+        """List count and sizes, for tuning nprobe"""
+        with self._lock:
+            sizes = np.diff(self._csr_offsets) if self.centroids is not None else np.zeros(0)
+            return {
+                "trained": self.trained,
+                "nlist": self.nlist,
+                "trained_rows": self.trained_rows,
+                "rows": len(self._row_list),
+                "tail_rows": len(self._row_list) - self._csr_rows,
+                "largest_list": int(sizes.max()) if len(sizes) else 0,
+                "default_nprobe": ANN_NPROBE,
+                "quantization": self.quantization,
+                "code_bytes": self.quantizer.code_size if self.quantizer is not None else 0,
+                "codes_mb": round(self._codes.nbytes / 2**20, 1) if self._codes is not None else 0,
+            }
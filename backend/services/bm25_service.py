@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# BM25 full-text ranking over extracted resume text. Postings, document
+# lengths and IDF statistics live in memory; each document's term counts are
+# persisted in SQLite so the index survives restarts and is updated one
+# document at a time on upload and delete. The SQLite writes run on a
+# dedicated writer thread, in order, so callers on the event loop never
+# wait on a commit.
+BM25_DB_PATH = Path("./storage/bm25_index.db")
+BM25_DB_PATH.parent.mkdir(exist_ok=True)
+
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#.]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is", "it",
+    "of", "on", "or", "that", "the", "to", "with", "was", "were", "will", "i", "my", "we",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping technology names like c++, c# and node.js"""
+    return [token for token in TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """Incrementally maintained BM25 index persisted to SQLite"""
+
+    def __init__(self, db_path: Path = BM25_DB_PATH, k1: float = BM25_K1, b: float = BM25_B):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[str, int]] = {}  # term -> {resume id: term frequency}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}  # resume id -> {term: term frequency}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._pending_writes: List[Tuple[str, tuple]] = []
+        self._write_scheduled = False
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bm25-writer")
+
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._conn.execute('''
+        CREATE TABLE IF NOT EXISTS bm25_documents (
+            id TEXT PRIMARY KEY,
+            length INTEGER NOT NULL,
+            terms TEXT NOT NULL
+        )
+        ''')
+        self._conn.commit()
+        for resume_id, length, terms in self._conn.execute("SELECT id, length, terms FROM bm25_documents"):
+            self._index_counts(resume_id, json.loads(terms), length)
+
+    def __len__(self) -> int:
+        return len(self._doc_lengths)
+
+    def __contains__(self, resume_id: str) -> bool:
+        return resume_id in self._doc_lengths
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._doc_lengths)
+
+    def _index_counts(self, resume_id: str, counts: Dict[str, int], length: int) -> None:
+        self._doc_terms[resume_id] = counts
+        self._doc_lengths[resume_id] = length
+        self._total_length += length
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[resume_id] = tf
+
+    def _unindex(self, resume_id: str) -> bool:
+        counts = self._doc_terms.pop(resume_id, None)
+        if counts is None:
+            return False
+        self._total_length -= self._doc_lengths.pop(resume_id)
+        for term in counts:
+            docs = self._postings.get(term)
+            if docs is not None:
+                docs.pop(resume_id, None)
+                if not docs:
+                    del self._postings[term]
+        return True
+
+    def _queue_write(self, sql: str, params: tuple) -> None:
+        # Caller holds _lock. Writes queued before the writer runs share one commit.
+        self._pending_writes.append((sql, params))
+        if not self._write_scheduled:
+            self._write_scheduled = True
+            self._writer.submit(self._write_pending)
+
+    def _write_pending(self) -> None:
+        with self._lock:
+            writes, self._pending_writes = self._pending_writes, []
+            self._write_scheduled = False
+        try:
+            for sql, params in writes:
+                self._conn.execute(sql, params)
+            self._conn.commit()
+        except Exception as e:
+            print(f"Error writing BM25 index: {str(e)}")
+
+    def flush(self) -> None:
+        """Wait until every change made so far is written to SQLite"""
+        # The writer runs tasks in order, so a no-op finishes after all queued writes
+        self._writer.submit(lambda: None).result()
+
+    def add(self, resume_id: str, text: str) -> None:
+        """
+        Index (or re-index) a document
+
+        Args:
+            resume_id: ID of the resume
+            text: Extracted resume text
+        """
+        tokens = tokenize(text or "")
+        counts = dict(Counter(tokens))
+        with self._lock:
+            self._unindex(resume_id)
+            self._index_counts(resume_id, counts, len(tokens))
+            self._queue_write(
+                "INSERT OR REPLACE INTO bm25_documents (id, length, terms) VALUES (?, ?, ?)",
+                (resume_id, len(tokens), json.dumps(counts))
+            )
+
+    def remove(self, resume_id: str) -> None:
+        """Remove a document from the index"""
+        with self._lock:
+            if self._unindex(resume_id):
+                self._queue_write("DELETE FROM bm25_documents WHERE id = ?", (resume_id,))
+
+    def retain(self, resume_ids: Iterable[str]) -> None:
+        """Drop every indexed document whose id is not in resume_ids"""
+        keep = set(resume_ids)
+        for resume_id in [r for r in self.ids() if r not in keep]:
+            self.remove(resume_id)
+
+    def search(self, query: str, resume_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, float, List[str]]]:
+        """
+        Rank documents against a query with BM25
+
+        Args:
+            query: Query text
+            resume_ids: Optional subset of documents to rank
+
+        Returns:
+            (resume id, score, matched terms) for documents matching at least one term, best first.
+            Scores are normalized to 0-1 by the highest score the query terms can reach.
+        """
+        allowed = set(resume_ids) if resume_ids is not None else None
+        with self._lock:
+            n = len(self._doc_lengths)
+            if n == 0:
+                return []
+            avg_length = self._total_length / n or 1.0
+            scores: Dict[str, float] = {}
+            matched: Dict[str, List[str]] = {}
+            max_score = 0.0
+            for term in dict.fromkeys(tokenize(query)):
+                docs = self._postings.get(term)
+                if not docs:
+                    continue
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                max_score += idf * (self.k1 + 1)  # limit of the term's contribution as tf grows
+                for resume_id, tf in docs.items():
+                    if allowed is not None and resume_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[resume_id] / avg_length)
+                    scores[resume_id] = scores.get(resume_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched.setdefault(resume_id, []).append(term)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(resume_id, score / max_score, matched[resume_id]) for resume_id, score in ranked]
@@ -3,9 +3,20 @@ import json
 import uuid
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from contextlib import contextmanager
+from typing import Dict, List, Any, Optional, Tuple
 import sqlite3
-from .embedding_service import get_embedding, rank_documents_by_query
+import asyncio
+import numpy as np
+from .db_pool import ConnectionPool
+from .embedding_matrix import EMBEDDING_MATRIX_DIR, FILE_LOCKS_AVAILABLE, EmbeddingMatrix
+from .ann_index import ANN_MIN_ROWS, IVFIndex
+from .embedding_service import ACTIVE_EMBEDDING_MODEL, EmbeddingError, get_embedding, top_k_indices
+from .storage_service import LOCAL_STORAGE_DIR
+from .text_cache_service import file_sha256
+
+if FILE_LOCKS_AVAILABLE:
+    import fcntl
 
 # For Supabase integration (optional)
 try:
@@ -20,10 +31,83 @@ except ImportError:
 DB_PATH = Path("./storage/resumes.db")
 DB_PATH.parent.mkdir(exist_ok=True)
 
-def init_db():
+# Columns added to the resumes table after it was first created: the upload
+# flow's metadata (see resume_store), the stored embedding encoding and the
+# embedding model that produced it
+RESUME_METADATA_COLUMNS = (
+    ("filename", "TEXT"),
+    ("status", "TEXT"),
+    ("match_score", "INTEGER"),
+    ("experience_text", "TEXT"),
+    ("content_hash", "TEXT"),
+    ("embedding_dtype", "TEXT"),
+    ("embedding_model", "TEXT"),
+)
+
+# Embeddings are stored as packed little-endian float BLOBs (float32 by default,
+# float16 halves that again) and read back with np.frombuffer, without parsing.
+# embedding_dtype records the encoding per row so both can coexist.
+EMBEDDING_STORAGE_DTYPE = os.getenv("EMBEDDING_STORAGE_DTYPE", "float32")
+EMBEDDING_DTYPES = {"float32": np.dtype("<f4"), "float16": np.dtype("<f2")}
+if EMBEDDING_STORAGE_DTYPE not in EMBEDDING_DTYPES:
+    print(f"Warning: Unsupported EMBEDDING_STORAGE_DTYPE {EMBEDDING_STORAGE_DTYPE!r}, using float32")
+    EMBEDDING_STORAGE_DTYPE = "float32"
+
+def pack_embedding(embedding: Any, dtype: str = EMBEDDING_STORAGE_DTYPE) -> bytes:
+    """
+    Encode an embedding for the resumes.embedding column
+
+    Args:
+        embedding: Embedding vector (list or array)
+        dtype: Storage dtype, "float32" or "float16"
+
+    Returns:
+        Packed vector bytes
+    """
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPES[dtype]).tobytes()
+
+def unpack_embedding(value: Any, dtype: Optional[str] = None) -> np.ndarray:
+    """
+    Decode a resumes.embedding value
+
+    Args:
+        value: BLOB from the column, or JSON text written before BLOB storage
+        dtype: The row's embedding_dtype (float32 when missing)
+
+    Returns:
+        Read-only vector viewing the BLOB's memory (no copy)
+    """
+    if isinstance(value, str):
+        return np.asarray(json.loads(value), dtype=np.float32)
+    return np.frombuffer(value, dtype=EMBEDDING_DTYPES.get(dtype or "float32", EMBEDDING_DTYPES["float32"]))
+
+def migrate_json_embeddings(conn: sqlite3.Connection) -> int:
+    """
+    Rewrite embeddings stored as JSON text as packed BLOBs
+
+    Returns:
+        Number of rows converted
+    """
+    rows = conn.execute("SELECT id, embedding FROM resumes WHERE typeof(embedding) = 'text'").fetchall()
+    for resume_id, embedding in rows:
+        try:
+            vector = json.loads(embedding)
+        except ValueError:
+            print(f"Warning: Unreadable embedding for resume {resume_id}, dropping it")
+            vector = None
+        conn.execute(
+            "UPDATE resumes SET embedding = ?, embedding_dtype = ? WHERE id = ?",
+            (pack_embedding(vector) if vector else None, EMBEDDING_STORAGE_DTYPE if vector else None, resume_id)
+        )
+    return len(rows)
+
+def init_db(db_path: Path = DB_PATH):
     """Initialize the SQLite database with required tables"""
-    conn = sqlite3.connect(str(DB_PATH))
+    conn = sqlite3.connect(str(db_path))
     cursor = conn.cursor()
+
+    # WAL lets every worker process read while one of them writes
+    cursor.execute("PRAGMA journal_mode=WAL")
     
     # Create resumes table
     cursor.execute('''
@@ -41,6 +125,33 @@ def init_db():
     )
     ''')
 
+    # Add metadata columns missing from databases created before them
+    existing_columns = {row[1] for row in cursor.execute("PRAGMA table_info(resumes)")}
+    for column, column_type in RESUME_METADATA_COLUMNS:
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE resumes ADD COLUMN {column} {column_type}")
+
+    # Indexes for search filter pushdown and listing in upload order
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumes_category ON resumes(category)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumes_education_level ON resumes(education_level)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumes_experience ON resumes(experience)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_resumes_created_at ON resumes(created_at)")
+
+    # Embeddings written as JSON text by earlier versions
+    converted = migrate_json_embeddings(conn)
+    if converted:
+        print(f"Converted {converted} JSON embeddings to {EMBEDDING_STORAGE_DTYPE} BLOBs")
+
+    # Resume puts and deletes, replayed by every worker's resume store (see resume_store)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS resume_changes (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        op TEXT NOT NULL,
+        resume_id TEXT NOT NULL
+    )
+    ''')
+    cursor.execute("CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT)")
+
     # Create users table
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -70,6 +181,142 @@ def init_db():
 # Initialize database
 init_db()
 
+# Pooled connections for the request path; SQL runs on the pool's executor
+DB_POOL = ConnectionPool(DB_PATH)
+
+# Statements are module constants so each pooled connection's statement cache reuses them
+UPDATE_EMBEDDING_SQL = "UPDATE resumes SET embedding = ?, embedding_dtype = ?, embedding_model = ? WHERE id = ?"
+SELECT_RESUMES_SQL = "SELECT * FROM resumes ORDER BY created_at DESC"
+# Search reads metadata only; vectors come from the embedding matrix
+SEARCH_RESULT_COLUMNS = (
+    "id, file_path, download_url, summary, skills, experience, education_level, category, created_at, "
+    + ", ".join(column for column, _ in RESUME_METADATA_COLUMNS if not column.startswith("embedding_"))
+)
+
+def get_db_metrics() -> Dict[str, Any]:
+    """Connection pool metrics (executor wait, pool wait, query time) for the metrics endpoint"""
+    return DB_POOL.metrics()
+
+def _insert_resume(conn: sqlite3.Connection, record: Dict[str, Any], embedding: Optional[List[float]]) -> None:
+    # Imported here, resume_store imports this module
+    from .resume_store import write_resume
+    # The row, its change record and its embedding commit together, so every worker's resume store sees it
+    write_resume(conn, record)
+    if embedding is not None:
+        conn.execute(UPDATE_EMBEDDING_SQL, (pack_embedding(embedding), EMBEDDING_STORAGE_DTYPE, ACTIVE_EMBEDDING_MODEL, record["id"]))
+    conn.commit()
+    if embedding is not None:
+        EMBEDDING_MATRIX.add(record["id"], embedding)
+
+def _store_embedding(conn: sqlite3.Connection, resume_id: str, embedding: List[float]) -> bool:
+    cursor = conn.execute(UPDATE_EMBEDDING_SQL, (pack_embedding(embedding), EMBEDDING_STORAGE_DTYPE, ACTIVE_EMBEDDING_MODEL, resume_id))
+    conn.commit()
+    if cursor.rowcount == 0:
+        return False  # deleted meanwhile
+    EMBEDDING_MATRIX.add(resume_id, embedding)
+    return True
+
+def _fetch_resumes(conn: sqlite3.Connection, sql: str, params: List[Any]) -> List[sqlite3.Row]:
+    return conn.execute(sql, params).fetchall()
+
+# Every stored embedding of the active model, as one memory-mapped matrix shared by all workers
+EMBEDDING_MATRIX = EmbeddingMatrix(model=ACTIVE_EMBEDDING_MODEL)
+
+def sync_embedding_matrix(batch_size: int = 500) -> None:
+    """Append embeddings missing from the matrix and tombstone rows of deleted (or re-embedded) resumes"""
+    EMBEDDING_MATRIX.refresh()
+    with DB_POOL.connection() as conn:
+        stored = {row[0] for row in conn.execute(
+            "SELECT id FROM resumes WHERE embedding IS NOT NULL AND embedding_model = ?", (ACTIVE_EMBEDDING_MODEL,)
+        )}
+        indexed = set(EMBEDDING_MATRIX.ids())
+        EMBEDDING_MATRIX.remove_many(indexed - stored)
+        missing = sorted(stored - indexed)
+        added = 0
+        for start in range(0, len(missing), batch_size):
+            batch = missing[start:start + batch_size]
+            rows = conn.execute(
+                f"SELECT id, embedding, embedding_dtype FROM resumes WHERE id IN ({', '.join('?' for _ in batch)})",
+                batch
+            ).fetchall()
+            added += EMBEDDING_MATRIX.add_many(
+                (row["id"], unpack_embedding(row["embedding"], row["embedding_dtype"])) for row in rows
+            )
+    if added:
+        print(f"Added {added} embeddings to the embedding matrix")
+
+sync_embedding_matrix()
+
+def remove_resume_embedding(resume_id: str) -> None:
+    """Tombstone a deleted resume's row in the embedding matrix"""
+    EMBEDDING_MATRIX.remove(resume_id)
+
+async def embed_resume(resume_id: str, resume_text: str) -> bool:
+    """
+    Embed a stored resume's text with the active embedding model and add it
+    to its resumes row and the embedding matrix
+
+    Args:
+        resume_id: ID of the resume
+        resume_text: Extracted text of the resume
+
+    Returns:
+        False if the resume no longer exists
+
+    Raises:
+        EmbeddingError: If the embedding API request failed
+    """
+    embedding = await get_embedding(resume_text)
+    return await DB_POOL.run(_store_embedding, resume_id, embedding)
+
+async def stale_embedding_ids() -> List[str]:
+    """IDs of resumes without an embedding from the active model (never embedded, or by another model)"""
+    rows = await DB_POOL.run(
+        _fetch_resumes,
+        "SELECT id FROM resumes WHERE embedding_model IS NULL OR embedding_model != ? ORDER BY created_at",
+        [ACTIVE_EMBEDDING_MODEL]
+    )
+    return [row["id"] for row in rows]
+
+@contextmanager
+def embedding_backfill_lock():
+    """Non-blocking inter-process lock so only one worker re-embeds; yields False if held elsewhere"""
+    if not FILE_LOCKS_AVAILABLE:
+        yield True
+        return
+    with open(EMBEDDING_MATRIX_DIR / "backfill.lock", "a+") as lock_file:
+        try:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+# IVF index over the matrix, used once a search covers ANN_MIN_ROWS embeddings
+ANN_INDEX = IVFIndex(EMBEDDING_MATRIX)
+
+def _rank_with_matrix(
+    query_embedding: List[float],
+    allowed_ids: Optional[List[str]],
+    k: int,
+    nprobe: Optional[int] = None
+) -> List[Tuple[str, float]]:
+    """Top-k (id, similarity) among allowed_ids (all when None), with other workers' appends picked up first"""
+    EMBEDDING_MATRIX.refresh()
+    candidates = len(EMBEDDING_MATRIX) if allowed_ids is None else len(allowed_ids)
+    if candidates >= ANN_MIN_ROWS:
+        ANN_INDEX.maybe_train_in_background()
+        result = ANN_INDEX.search(query_embedding, k, nprobe, allowed_ids)
+        # Fall back to exact search when the probed lists held too few allowed rows
+        if result is not None and len(result[0]) >= min(k, candidates):
+            ids, scores = result
+            return [(resume_id, float(score)) for resume_id, score in zip(ids, scores)]
+    ids, scores = EMBEDDING_MATRIX.similarities(query_embedding, allowed_ids)
+    return [(ids[i], float(scores[i])) for i in top_k_indices(scores, k)]
+
 async def save_resume_to_db(
     resume_text: str,
     metadata: Dict[str, Any],
@@ -89,46 +336,36 @@ async def save_resume_to_db(
         ID of the saved resume
     """
     try:
-        # Generate embedding for the resume
-        embedding = await get_embedding(resume_text[:2000])  # Truncate to avoid token limits
+        # Generate embedding for the resume; without one it is stored and re-embedded later
+        try:
+            embedding = await get_embedding(resume_text[:2000])  # Truncate to avoid token limits
+        except EmbeddingError as e:
+            print(f"Warning: {str(e)}. Saving the resume without an embedding.")
+            embedding = None
         
         # Generate ID
         resume_id = str(uuid.uuid4())
         
-        # Process metadata
+        # Stored like the upload flow's records: a local path, filename and content hash
+        local_path = LOCAL_STORAGE_DIR / file_path
+        content_hash = await asyncio.to_thread(file_sha256, str(local_path)) if local_path.is_file() else None
         skills = metadata.get("skills", [])
-        if isinstance(skills, list):
-            skills_json = json.dumps(skills)
-        else:
-            skills_json = json.dumps([])
-        
-        # Connect to database
-        conn = sqlite3.connect(str(DB_PATH))
-        cursor = conn.cursor()
-        
-        # Insert resume
-        cursor.execute(
-            """
-            INSERT INTO resumes
-            (id, file_path, download_url, summary, skills, experience, education_level, category, created_at, embedding)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-            (
-                resume_id,
-                file_path,
-                download_url,
-                metadata.get("summary", ""),
-                skills_json,
-                metadata.get("experience", 0),
-                metadata.get("educationLevel", ""),
-                metadata.get("category", ""),
-                datetime.now().isoformat(),
-                json.dumps(embedding)
-            )
-        )
+        record = {
+            "id": resume_id,
+            "filename": metadata.get("filename") or Path(file_path).name,
+            "file_path": str(local_path),
+            "download_url": download_url,
+            "upload_date": datetime.now().isoformat(),
+            "status": "processed",
+            "summary": metadata.get("summary", ""),
+            "skills": skills if isinstance(skills, list) else [],
+            "experience": metadata.get("experience", 0),
+            "educationLevel": metadata.get("educationLevel", ""),
+            "category": metadata.get("category", ""),
+            "content_hash": content_hash
+        }
         
-        conn.commit()
-        conn.close()
+        await DB_POOL.run(_insert_resume, record, embedding)
         
         return resume_id
         
@@ -144,14 +381,8 @@ async def get_resumes() -> List[Dict[str, Any]]:
         List of resume data
     """
     try:
-        # Connect to database
-        conn = sqlite3.connect(str(DB_PATH))
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        cursor = conn.cursor()
-        
         # Get all resumes
-        cursor.execute("SELECT * FROM resumes ORDER BY created_at DESC")
-        rows = cursor.fetchall()
+        rows = await DB_POOL.run(_fetch_resumes, SELECT_RESUMES_SQL, [])
         
         # Process results
         resumes = []
@@ -162,12 +393,10 @@ async def get_resumes() -> List[Dict[str, Any]]:
             resume["skills"] = json.loads(resume["skills"]) if resume["skills"] else []
             
             # Remove embedding from response
-            if "embedding" in resume:
-                del resume["embedding"]
+            resume.pop("embedding", None)
+            resume.pop("embedding_dtype", None)
                 
             resumes.append(resume)
-            
-        conn.close()
         
         return resumes
         
@@ -175,9 +404,43 @@ async def get_resumes() -> List[Dict[str, Any]]:
         print(f"Error getting resumes: {str(e)}")
         return []
 
+def build_filter_clause(filters: Optional[Dict[str, Any]]) -> Tuple[str, List[Any]]:
+    """
+    Translate search filters into a SQL WHERE clause over the indexed columns
+
+    Args:
+        filters: Optional filters (minExperience, educationLevel, category, skills)
+
+    Returns:
+        (where clause or empty string, query parameters)
+    """
+    conditions = []
+    params: List[Any] = []
+    if filters:
+        if "minExperience" in filters:
+            conditions.append("experience >= ?")
+            params.append(filters["minExperience"])
+        if "educationLevel" in filters:
+            conditions.append("education_level = ?")
+            params.append(filters["educationLevel"])
+        if "category" in filters:
+            conditions.append("category = ?")
+            params.append(filters["category"])
+        if "skills" in filters and isinstance(filters["skills"], list) and filters["skills"]:
+            filter_skills = sorted(set(str(s).lower() for s in filters["skills"]))
+            placeholders = ", ".join("?" for _ in filter_skills)
+            conditions.append(
+                f"EXISTS (SELECT 1 FROM json_each(resumes.skills) WHERE lower(json_each.value) IN ({placeholders}))"
+            )
+            params.extend(filter_skills)
+    if not conditions:
+        return "", params
+    return " WHERE " + " AND ".join(conditions), params
+
 async def search_resumes(
     query_embedding: List[float],
-    filters: Optional[Dict[str, Any]] = None
+    filters: Optional[Dict[str, Any]] = None,
+    nprobe: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     Search resumes by embedding similarity and filters
@@ -185,74 +448,55 @@ async def search_resumes(
     Args:
         query_embedding: Embedding of the search query
         filters: Optional filters (experience, education, category)
+        nprobe: ANN lists to scan on large corpora (default ANN_NPROBE); higher is slower but more exact
         
     Returns:
         List of matching resumes
     """
     try:
-        # Connect to database
-        conn = sqlite3.connect(str(DB_PATH))
-        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-        cursor = conn.cursor()
+        loop = asyncio.get_running_loop()
+        where_clause, params = build_filter_clause(filters)
+        allowed_ids = None
+        if where_clause:
+            # Filters run in SQLite against the indexed columns, so only the
+            # matching ids with an embedding of the active model are loaded
+            rows = await DB_POOL.run(
+                _fetch_resumes, "SELECT id FROM resumes" + where_clause + " AND embedding_model = ?", params + [ACTIVE_EMBEDDING_MODEL]
+            )
+            allowed_ids = [row["id"] for row in rows]
+            if not allowed_ids:
+                return []
         
-        # Get all resumes
-        cursor.execute("SELECT * FROM resumes")
-        rows = cursor.fetchall()
+        # Rank with the embedding matrix (IVF index on large corpora)
+        ranked = await loop.run_in_executor(None, _rank_with_matrix, query_embedding, allowed_ids, 5, nprobe)
+        if not ranked:
+            return []
         
-        # Process results
-        resumes = []
-        for row in rows:
-            resume = dict(row)
-            
-            # Parse JSON fields
+        # Load metadata for the top results only
+        top_ids = [resume_id for resume_id, _ in ranked]
+        rows = await DB_POOL.run(
+            _fetch_resumes,
+            f"SELECT {SEARCH_RESULT_COLUMNS} FROM resumes WHERE id IN ({', '.join('?' for _ in top_ids)})",
+            top_ids
+        )
+        rows_by_id = {row["id"]: row for row in rows}
+        
+        # Process for response (format fields)
+        results = []
+        for resume_id, similarity in ranked:
+            if resume_id not in rows_by_id:
+                continue  # deleted since the matrix was synced
+            resume = dict(rows_by_id[resume_id])
             resume["skills"] = json.loads(resume["skills"]) if resume["skills"] else []
-            resume["embedding"] = json.loads(resume["embedding"]) if resume["embedding"] else []
             
-            # Apply filters if provided
-            if filters:
-                # Filter by minimum experience
-                if "minExperience" in filters and resume["experience"] < filters["minExperience"]:
-                    continue
-                    
-                # Filter by education level
-                if "educationLevel" in filters and resume["education_level"] != filters["educationLevel"]:
-                    continue
-                    
-                # Filter by category
-                if "category" in filters and resume["category"] != filters["category"]:
-                    continue
-                    
-                # Filter by skills
-                if "skills" in filters and isinstance(filters["skills"], list) and filters["skills"]:
-                    resume_skills = set(s.lower() for s in resume["skills"])
-                    filter_skills = set(s.lower() for s in filters["skills"])
-                    if not filter_skills.intersection(resume_skills):
-                        continue
+            # Calculate match score (0-100)
+            resume["match_score"] = int(similarity * 100)
             
-            resumes.append(resume)
-        
-        conn.close()
-        
-        # Rank by similarity
-        if resumes:
-            ranked_resumes = await rank_documents_by_query(query_embedding, resumes)
+            # Generate match reason
+            resume["match_reason"] = generate_match_reason(resume)
+            results.append(resume)
             
-            # Process for response (remove embedding, format fields)
-            for resume in ranked_resumes:
-                if "embedding" in resume:
-                    del resume["embedding"]
-                    
-                # Calculate match score (0-100)
-                if "similarity" in resume:
-                    resume["match_score"] = int(resume["similarity"] * 100)
-                    del resume["similarity"]
-                
-                # Generate match reason
-                resume["match_reason"] = generate_match_reason(resume)
-                
-            return ranked_resumes[:5]  # Return top 5
-        else:
-            return []
+        return results  # Top 5
         
     except Exception as e:
         print(f"Error searching resumes: {str(e)}")
@@ -0,0 +1,140 @@
+import os
+import time
+import queue
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator
+
+# Pooled SQLite access for async code. Connections are opened once (WAL mode,
+# per-connection prepared statement cache) and handed out from a queue. Work
+# runs on a dedicated thread executor so blocking SQL never runs on the event
+# loop, and the time spent waiting for an executor thread, waiting for a
+# connection and running the query is recorded for the metrics endpoint.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "4"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "128"))
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "200"))
+
+class _Timing:
+    """Count, total and max of one duration, in milliseconds"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+        }
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections to one database"""
+
+    def __init__(self, db_path: Path, size: int = DB_POOL_SIZE):
+        self.db_path = Path(db_path)
+        self.size = max(1, size)
+        self._connections: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(self.size):
+            self._connections.put(self._connect())
+        self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix=f"db-{self.db_path.stem}")
+        self._metrics_lock = threading.Lock()
+        self._executor_wait = _Timing()
+        self._pool_wait = _Timing()
+        self._query = _Timing()
+        self._slow_queries = 0
+        self._errors = 0
+        self._in_flight = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False,  # connections move between executor threads, one user at a time
+            cached_statements=DB_STATEMENT_CACHE_SIZE
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Borrow a connection (blocking until one is free); the wait is recorded"""
+        start = time.perf_counter()
+        conn = self._connections.get()
+        waited_ms = (time.perf_counter() - start) * 1000
+        with self._metrics_lock:
+            self._pool_wait.add(waited_ms)
+        try:
+            yield conn
+        finally:
+            self._connections.put(conn)
+
+    def _run(self, fn: Callable[..., Any], submitted: float, args: tuple) -> Any:
+        started = time.perf_counter()
+        with self._metrics_lock:
+            self._executor_wait.add((started - submitted) * 1000)
+            self._in_flight += 1
+        try:
+            with self.connection() as conn:
+                query_start = time.perf_counter()
+                try:
+                    return fn(conn, *args)
+                except Exception:
+                    conn.rollback()
+                    with self._metrics_lock:
+                        self._errors += 1
+                    raise
+                finally:
+                    query_ms = (time.perf_counter() - query_start) * 1000
+                    with self._metrics_lock:
+                        self._query.add(query_ms)
+                        if query_ms >= DB_SLOW_QUERY_MS:
+                            self._slow_queries += 1
+                    if query_ms >= DB_SLOW_QUERY_MS:
+                        print(f"Warning: Slow database call {getattr(fn, '__name__', fn)} took {query_ms:.1f} ms")
+        finally:
+            with self._metrics_lock:
+                self._in_flight -= 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(connection, *args) on the database executor
+
+        Args:
+            fn: Function doing the database work with a pooled connection
+            *args: Extra arguments for fn
+
+        Returns:
+            fn's return value
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._run, fn, time.perf_counter(), args)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pool size, in-flight calls and executor-wait / pool-wait / query timings"""
+        with self._metrics_lock:
+            return {
+                "database": str(self.db_path),
+                "pool_size": self.size,
+                "idle_connections": self._connections.qsize(),
+                "in_flight": self._in_flight,
+                "executor_wait": self._executor_wait.as_dict(),
+                "pool_wait": self._pool_wait.as_dict(),
+                "query": self._query.as_dict(),
+                "slow_queries": self._slow_queries,
+                "slow_query_threshold_ms": DB_SLOW_QUERY_MS,
+                "errors": self._errors,
+            }
@@ -0,0 +1,115 @@
+import os
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Embeddings are cached by (model, text) so re-embedding the same resume or
+# query costs no API call. Vectors are stored as float32 BLOBs in SQLite with
+# an in-process LRU in front, like the relevance score cache.
+EMBEDDING_CACHE_DB_PATH = Path("./storage/embedding_cache.db")
+EMBEDDING_CACHE_DB_PATH.parent.mkdir(exist_ok=True)
+
+EMBEDDING_CACHE_MEMORY_SIZE = int(os.getenv("EMBEDDING_CACHE_MEMORY_SIZE", "1024"))
+
+_memory_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(str(EMBEDDING_CACHE_DB_PATH), check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS embedding_cache (
+        key TEXT PRIMARY KEY,
+        model TEXT NOT NULL,
+        embedding BLOB NOT NULL,
+        created_at REAL NOT NULL
+    )
+    ''')
+    conn.commit()
+    return conn
+
+_conn = _connect()
+
+def make_embedding_key(text: str, model: str) -> str:
+    """
+    Build the cache key for an embedding
+
+    Args:
+        text: Text as sent to the embedding API
+        model: Embedding model name
+
+    Returns:
+        Hex digest identifying the (model, text) pair
+    """
+    return hashlib.sha256(f"{model}\x1f{text}".encode("utf-8")).hexdigest()
+
+def _remember(key: str, embedding: np.ndarray) -> None:
+    _memory_cache[key] = embedding
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > EMBEDDING_CACHE_MEMORY_SIZE:
+        _memory_cache.popitem(last=False)
+
+def get_cached_embeddings(keys: List[str]) -> Dict[str, np.ndarray]:
+    """
+    Look up cached embeddings, memory first and then SQLite
+
+    Args:
+        keys: Keys from make_embedding_key
+
+    Returns:
+        Dict of key -> float32 vector for the keys that were found
+    """
+    found: Dict[str, np.ndarray] = {}
+    with _lock:
+        missing = []
+        for key in keys:
+            embedding = _memory_cache.get(key)
+            if embedding is not None:
+                _memory_cache.move_to_end(key)
+                found[key] = embedding
+            else:
+                missing.append(key)
+
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            try:
+                rows = _conn.execute(
+                    f"SELECT key, embedding FROM embedding_cache WHERE key IN ({', '.join('?' for _ in batch)})",
+                    batch
+                ).fetchall()
+            except Exception as e:
+                print(f"Error reading embedding cache: {str(e)}")
+                break
+            for key, blob in rows:
+                embedding = np.frombuffer(blob, dtype=np.float32)
+                _remember(key, embedding)
+                found[key] = embedding
+    return found
+
+def get_cached_embedding(key: str) -> Optional[np.ndarray]:
+    """Look up one cached embedding; None on a miss"""
+    return get_cached_embeddings([key]).get(key)
+
+def put_cached_embeddings(embeddings: Dict[str, List[float]], model: str) -> None:
+    """Store embeddings (key -> vector) in both cache levels"""
+    now = time.time()
+    with _lock:
+        rows = []
+        for key, embedding in embeddings.items():
+            vector = np.asarray(embedding, dtype=np.float32)
+            _remember(key, vector)
+            rows.append((key, model, vector.tobytes(), now))
+        try:
+            _conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, embedding, created_at) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            _conn.commit()
+        except Exception as e:
+            print(f"Error writing embedding cache: {str(e)}")
@@ -0,0 +1,347 @@
+import os
+import json
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Collection, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+# fcntl file locks make the matrix safe to share between uvicorn workers (POSIX only)
+try:
+    import fcntl
+    FILE_LOCKS_AVAILABLE = True
+except ImportError:
+    FILE_LOCKS_AVAILABLE = False
+    print("Warning: fcntl is not available, the embedding matrix is only safe with a single worker")
+
+# All resume embeddings as one contiguous float32 matrix for similarity search.
+# Rows are L2-normalized on append, so cosine similarity against the whole
+# corpus is a single mat-vec. The matrix is a raw row-major file opened with
+# np.memmap, so every worker shares the same pages through the OS page cache.
+#
+# storage/embedding_matrix/
+#   meta.json   {"dim": ..., "generation": ..., "model": ...}, replaced atomically on compaction
+#   <gen>.f32   the rows
+#   <gen>.ids   one line per change: "+<id>" appends the next row for id,
+#               "-<id>" tombstones the id's row
+#
+# Writers append the row before its "+" line, so a reader never sees an id
+# without its vector. Compaction writes the live rows to the next generation's
+# files and switches meta.json. The matrix is derived from the resumes table
+# (see database_service.sync_embedding_matrix) and can be deleted at any time.
+# Vectors of different embedding models are not comparable: a matrix opened
+# for another model than the one in meta.json starts over, empty.
+EMBEDDING_MATRIX_DIR = Path("./storage/embedding_matrix")
+
+# Compact once there are more tombstoned rows than this and than live rows
+EMBEDDING_MATRIX_COMPACT_MIN = int(os.getenv("EMBEDDING_MATRIX_COMPACT_MIN", "1024"))
+
+class MatrixView(NamedTuple):
+    """A consistent snapshot of the matrix for indexes built on top of it (see ann_index)"""
+    generation: int
+    row_ids: List[Optional[str]]  # may grow past len(alive) after the snapshot; read only the first len(alive)
+    alive: np.ndarray
+    vectors: np.ndarray
+
+class EmbeddingMatrix:
+    """Append-only, memory-mapped matrix of normalized embeddings with a row -> resume id mapping"""
+
+    def __init__(self, directory: Path = EMBEDDING_MATRIX_DIR, model: Optional[str] = None):
+        self.directory = Path(directory)
+        self.model = model
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._meta_path = self.directory / "meta.json"
+        self._lock = threading.RLock()
+        self._lock_file = open(self.directory / ".lock", "a+")
+        self._reset()
+        with self._file_lock(shared=True):
+            self._load()
+        if self.model is not None and self._meta_stat is not None and self._meta_model != self.model:
+            self._start_over()
+
+    def _reset(self) -> None:
+        self.dim: Optional[int] = None
+        self._meta_model: Optional[str] = None
+        self._generation = 0
+        self._meta_stat: Optional[Tuple[int, int]] = None
+        self._ids_offset = 0  # bytes of the ids file applied
+        self._row_ids: List[Optional[str]] = []  # row -> resume id, None once tombstoned
+        self._rows: Dict[str, int] = {}  # resume id -> live row
+        self._alive = np.zeros(0, dtype=bool)
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+
+    @contextmanager
+    def _file_lock(self, shared: bool = False):
+        """Inter-process lock: shared while reading the files, exclusive while writing"""
+        if not FILE_LOCKS_AVAILABLE:
+            yield
+            return
+        fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _data_path(self, generation: int) -> Path:
+        return self.directory / f"{generation}.f32"
+
+    def _ids_path(self, generation: int) -> Path:
+        return self.directory / f"{generation}.ids"
+
+    def _stat_meta(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self._meta_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self) -> None:
+        """(Re)read meta.json and the current generation's files from scratch"""
+        self._reset()
+        self._meta_stat = self._stat_meta()
+        if self._meta_stat is None:
+            return
+        with open(self._meta_path, "r") as f:
+            meta = json.load(f)
+        self.dim = None if meta["dim"] is None else int(meta["dim"])
+        self._generation = int(meta["generation"])
+        self._meta_model = meta.get("model")
+        self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        self._read_ids()
+
+    def _read_ids(self) -> None:
+        """Apply id lines appended since the last read and remap the grown data file"""
+        ids_path = self._ids_path(self._generation)
+        if not ids_path.exists():
+            return
+        with open(ids_path, "rb") as f:
+            f.seek(self._ids_offset)
+            chunk = f.read()
+        end = chunk.rfind(b"\n") + 1  # ignore a torn last line
+        if end == 0:
+            return
+        self._ids_offset += end
+        for line in chunk[:end].decode("utf-8").splitlines():
+            op, resume_id = line[:1], line[1:]
+            if op == "+":
+                self._tombstone(resume_id)
+                self._rows[resume_id] = len(self._row_ids)
+                self._row_ids.append(resume_id)
+            elif op == "-":
+                self._tombstone(resume_id)
+        self._map_rows()
+
+    def _tombstone(self, resume_id: str) -> None:
+        row = self._rows.pop(resume_id, None)
+        if row is not None:
+            self._row_ids[row] = None
+
+    def _map_rows(self) -> None:
+        rows = len(self._row_ids)
+        alive = np.zeros(rows, dtype=bool)
+        alive[list(self._rows.values())] = True
+        self._alive = alive
+        if rows == 0:
+            self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+        elif len(self._vectors) != rows:
+            self._vectors = np.memmap(self._data_path(self._generation), dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def refresh(self) -> None:
+        """Pick up rows other workers appended or a compaction (only a stat when nothing changed)"""
+        with self._lock:
+            meta_stat = self._stat_meta()
+            if meta_stat != self._meta_stat:
+                with self._file_lock(shared=True):
+                    self._load()
+                return
+            if meta_stat is None:
+                return
+            try:
+                size = self._ids_path(self._generation).stat().st_size
+            except FileNotFoundError:
+                return
+            if size != self._ids_offset:
+                with self._file_lock(shared=True):
+                    self._read_ids()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, resume_id: str) -> bool:
+        return resume_id in self._rows
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def view(self) -> MatrixView:
+        """Snapshot of the current rows; the arrays are replaced, never modified, by later changes"""
+        with self._lock:
+            return MatrixView(self._generation, self._row_ids, self._alive, self._vectors)
+
+    def rows_for(self, resume_ids: Iterable[str]) -> np.ndarray:
+        """Sorted rows of the given resumes (ids not in the matrix are skipped)"""
+        with self._lock:
+            rows = np.fromiter((self._rows[i] for i in resume_ids if i in self._rows), dtype=np.int64)
+        rows.sort()
+        return rows
+
+    def _write_meta(self, dim: Optional[int], generation: int) -> None:
+        tmp_path = self._meta_path.with_name(f"meta.json.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"dim": dim, "generation": generation, "model": self.model}, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _remove_generation(self, generation: int) -> None:
+        # Workers still mapping the old file keep reading it until they refresh
+        for path in (self._data_path(generation), self._ids_path(generation)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _start_over(self) -> None:
+        """Drop every row of another model's matrix: switch to an empty generation"""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            if self._meta_stat is None or self._meta_model == self.model:
+                return  # another worker started over first
+            print(f"Embedding matrix holds {self._meta_model or 'untagged'} embeddings, not {self.model}; starting an empty one")
+            old_generation = self._generation
+            self._write_meta(None, old_generation + 1)
+            self._remove_generation(old_generation)
+            self._load()
+
+    def add_many(self, items: Iterable[Tuple[str, Any]]) -> int:
+        """
+        Append (or replace) embeddings; vectors with another dimension than the matrix are skipped
+
+        Args:
+            items: (resume id, embedding) pairs
+
+        Returns:
+            Number of rows appended
+        """
+        items = [(resume_id, np.asarray(embedding, dtype=np.float32).ravel()) for resume_id, embedding in items]
+        if not items:
+            return 0
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            if self.dim is None:
+                self.dim = len(items[0][1])
+                self._write_meta(self.dim, self._generation)
+                self._meta_stat = self._stat_meta()
+            vectors, ids = [], []
+            for resume_id, vector in items:
+                if len(vector) == self.dim:
+                    norm = np.linalg.norm(vector)
+                    vectors.append(vector / norm if norm > 0 else vector)
+                    ids.append(resume_id)
+            if len(ids) < len(items):
+                print(f"Warning: {len(items) - len(ids)} embeddings without dimension {self.dim} were not added to the embedding matrix")
+            if not ids:
+                return 0
+
+            row_bytes = self.dim * 4
+            data_path = self._data_path(self._generation)
+            with open(data_path, "r+b" if data_path.exists() else "w+b") as f:
+                f.seek(len(self._row_ids) * row_bytes)  # past the rows listed in the ids file
+                f.write(np.stack(vectors).astype(np.float32).tobytes())
+                f.truncate()
+            with open(self._ids_path(self._generation), "ab") as f:
+                f.write("".join(f"+{resume_id}\n" for resume_id in ids).encode("utf-8"))
+            self._read_ids()
+            return len(ids)
+
+    def add(self, resume_id: str, embedding: Any) -> bool:
+        """Append (or replace) one resume's embedding; returns False if it was skipped"""
+        return self.add_many([(resume_id, embedding)]) == 1
+
+    def remove_many(self, resume_ids: Iterable[str]) -> int:
+        """
+        Tombstone the rows of the given resumes
+
+        Returns:
+            Number of rows tombstoned
+        """
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            removed = [resume_id for resume_id in dict.fromkeys(resume_ids) if resume_id in self._rows]
+            if not removed:
+                return 0
+            with open(self._ids_path(self._generation), "ab") as f:
+                f.write("".join(f"-{resume_id}\n" for resume_id in removed).encode("utf-8"))
+            self._read_ids()
+            dead = len(self._row_ids) - len(self._rows)
+            if dead > EMBEDDING_MATRIX_COMPACT_MIN and dead > len(self._rows):
+                self._compact()
+            return len(removed)
+
+    def remove(self, resume_id: str) -> bool:
+        """Tombstone one resume's row; returns False if it was not in the matrix"""
+        return self.remove_many([resume_id]) == 1
+
+    def _refresh_locked(self) -> None:
+        """Catch up while holding the exclusive file lock"""
+        if self._stat_meta() != self._meta_stat:
+            self._load()
+        elif self._meta_stat is not None:
+            self._read_ids()
+
+    def compact(self) -> None:
+        """Rewrite the matrix without tombstoned rows"""
+        with self._lock, self._file_lock():
+            self._refresh_locked()
+            if self.dim is not None:
+                self._compact()
+
+    def _compact(self) -> None:
+        old_generation = self._generation
+        generation = old_generation + 1
+        live_ids = list(self._rows)
+        with open(self._data_path(generation), "wb") as f:
+            if live_ids:
+                f.write(np.ascontiguousarray(self._vectors[self._alive]).tobytes())
+        with open(self._ids_path(generation), "wb") as f:
+            f.write("".join(f"+{resume_id}\n" for resume_id in live_ids).encode("utf-8"))
+        self._write_meta(self.dim, generation)
+        self._remove_generation(old_generation)
+        print(f"Compacted embedding matrix to {len(live_ids)} rows")
+        self._load()
+
+    def similarities(self, query_embedding: Any, allowed_ids: Optional[Collection[str]] = None) -> Tuple[List[str], np.ndarray]:
+        """
+        Cosine similarity of the query to every live row (one mat-vec over the matrix)
+
+        Args:
+            query_embedding: Query vector with the matrix's dimension
+            allowed_ids: Optional ids to restrict the result to
+
+        Returns:
+            (resume ids, similarities) in row order
+
+        Raises:
+            ValueError: If the query dimension differs from the matrix's
+        """
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        with self._lock:
+            if self.dim is None or not self._rows:
+                return [], np.zeros(0, dtype=np.float32)
+            if len(query) != self.dim:
+                raise ValueError(f"Query embedding has dimension {len(query)}, the matrix has {self.dim}")
+            norm = np.linalg.norm(query)
+            if norm > 0:
+                query = query / norm
+            if allowed_ids is None:
+                rows = np.flatnonzero(self._alive)
+                scores = (self._vectors @ query)[rows]
+            else:
+                rows = self.rows_for(allowed_ids)  # sorted: sequential reads over the mapped file
+                scores = self._vectors[rows] @ query
+            return [self._row_ids[row] for row in rows], scores
+
+    def close(self) -> None:
+        with self._lock:
+            self._vectors = np.zeros((0, self.dim or 0), dtype=np.float32)
+            self._lock_file.close()
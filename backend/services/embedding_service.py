@@ -1,10 +1,12 @@
 import os
+import asyncio
 import numpy as np
 import requests
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 import httpx
-from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
+from .embedding_cache_service import make_embedding_key, get_cached_embeddings, put_cached_embeddings
+from .local_embedding_service import LOCAL_EMBEDDING_MODEL, embed_texts_locally
 
 # Load environment variables
 load_dotenv()
@@ -12,63 +14,224 @@ load_dotenv()
 # Get OpenRouter API token from environment
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 OPENROUTER_EMBEDDING_API_URL = "https://openrouter.ai/api/v1/embeddings"
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "mistralai/mistral-7b-instruct:free")  # Using free version of Mistral Instruct
+EMBEDDING_MAX_CHARS = 2000  # Truncate to avoid token limits
+
+# Texts embedded by concurrent callers within the window are sent as one request
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "10"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "30"))
+
+# "api" embeds with OpenRouter, "local" with the offline hashing embedder
+# (see local_embedding_service), "auto" uses the API when a key is set.
+# Vectors of the two are not comparable, so an API failure raises
+# EmbeddingError instead of falling back; stored vectors are tagged with
+# ACTIVE_EMBEDDING_MODEL and re-embedded when it changes.
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "auto").lower()
+if EMBEDDING_BACKEND not in ("auto", "api", "local"):
+    print(f"Warning: Unknown EMBEDDING_BACKEND {EMBEDDING_BACKEND!r}, using auto")
+    EMBEDDING_BACKEND = "auto"
+USE_LOCAL_EMBEDDINGS = EMBEDDING_BACKEND == "local" or not OPENROUTER_API_KEY
+if USE_LOCAL_EMBEDDINGS and EMBEDDING_BACKEND != "local":
+    print(f"WARNING: No OpenRouter API key found. Using local embeddings ({LOCAL_EMBEDDING_MODEL}).")
+ACTIVE_EMBEDDING_MODEL = LOCAL_EMBEDDING_MODEL if USE_LOCAL_EMBEDDINGS else EMBEDDING_MODEL
+
+class EmbeddingError(Exception):
+    """The embedding API request for a text failed"""
+
+class EmbeddingBatcher:
+    """Collects texts from concurrent callers and embeds them with one API request per batch"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._closer = None  # async generator that closes _client when its loop shuts down
+        self._pending: Dict[str, asyncio.Future] = {}  # text -> result, identical texts share a slot
+        self._in_flight: Dict[str, asyncio.Future] = {}  # texts of batches sent but not answered yet
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    def _bind(self) -> asyncio.AbstractEventLoop:
+        """Shared client and pending batch belong to the running event loop"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._release()
+            self._loop = loop
+            self._client = httpx.AsyncClient(timeout=EMBEDDING_TIMEOUT)
+            self._pending = {}
+            self._in_flight = {}
+            self._flush_handle = None
+            # The loop finalizes its async generators before it closes (asyncio.run
+            # does), which closes the client on the loop its connections belong to
+            self._closer = self._close_with_loop(self._client)
+            asyncio.ensure_future(self._closer.__anext__())
+        return loop
+
+    @staticmethod
+    async def _close_with_loop(client: httpx.AsyncClient):
+        try:
+            yield
+        finally:
+            await client.aclose()
+
+    def _release(self) -> None:
+        """Close the client of the previous loop, on that loop, if it is still running"""
+        closer, loop = self._closer, self._loop
+        self._closer = self._client = self._loop = None
+        if closer is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(closer.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """Close the HTTP client (call on the loop that uses it, e.g. at app shutdown)"""
+        if self._loop is asyncio.get_running_loop():
+            closer, client = self._closer, self._client
+            self._closer = self._client = self._loop = None
+            if closer is not None:
+                await closer.aclose()
+                await client.aclose()  # in case the closer had not started yet
+        else:
+            self._release()
+
+    async def embed(self, text: str) -> List[float]:
+        """
+        Embed one text as part of the next batch
+
+        Raises:
+            Exception: If the API request for the batch failed
+        """
+        loop = self._bind()
+        future = self._pending.get(text) or self._in_flight.get(text)
+        if future is None:
+            future = self._pending[text] = loop.create_future()
+            if len(self._pending) >= EMBEDDING_BATCH_SIZE:
+                self._flush()
+            elif self._flush_handle is None:
+                self._flush_handle = loop.call_later(EMBEDDING_BATCH_WINDOW_MS / 1000, self._flush)
+        # Shielded: a caller that gives up must not cancel the result other callers share
+        return await asyncio.shield(future)
+
+    def _flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            self._in_flight.update(batch)
+            self._loop.create_task(self._send(batch))
+
+    async def _send(self, batch: Dict[str, asyncio.Future]) -> None:
+        try:
+            await self._request(batch)
+        finally:
+            for text, future in batch.items():
+                if self._in_flight.get(text) is future:
+                    del self._in_flight[text]
+
+    async def _request(self, batch: Dict[str, asyncio.Future]) -> None:
+        texts = list(batch)
+        try:
+            response = await self._client.post(
+                OPENROUTER_EMBEDDING_API_URL,
+                headers={
+                    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+                    "HTTP-Referer": "https://github.com/theagentvikram/ResuMatch",  # Required by OpenRouter
+                    "X-Title": "ResuMatch"  # Optional but helpful for OpenRouter
+                },
+                json={"model": EMBEDDING_MODEL, "input": texts}
+            )
+            if response.status_code != 200:
+                raise RuntimeError(f"Error from OpenRouter API: {response.text}")
+            # One embedding per input, tagged with its position in the input list
+            data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+            if len(data) != len(texts):
+                raise RuntimeError(f"OpenRouter returned {len(data)} embeddings for {len(texts)} inputs")
+            embeddings = {text: item["embedding"] for text, item in zip(texts, data)}
+        except Exception as e:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # The SQLite write runs in a thread, not on the event loop
+        await asyncio.to_thread(
+            put_cached_embeddings,
+            {make_embedding_key(text, EMBEDDING_MODEL): embedding for text, embedding in embeddings.items()},
+            EMBEDDING_MODEL
+        )
+        for text, future in batch.items():
+            if not future.done():
+                future.set_result(embeddings[text])
+
+_BATCHER = EmbeddingBatcher()
+
+async def close_embedding_client() -> None:
+    """Close the embedding API client and its connection pool"""
+    await _BATCHER.aclose()
+
+async def get_embeddings(texts: Sequence[str]) -> List[List[float]]:
+    """
+    Get embedding vectors for several texts: cached ones from the embedding
+    cache, the rest in as few batched API requests as possible
+    
+    Args:
+        texts: The texts to embed
+        
+    Returns:
+        One embedding per text, in order (from ACTIVE_EMBEDDING_MODEL)
+        
+    Raises:
+        EmbeddingError: If the API request for any of the texts failed
+    """
+    texts = [text[:EMBEDDING_MAX_CHARS] for text in texts]
+    if USE_LOCAL_EMBEDDINGS:
+        return await get_local_embeddings(texts)
+
+    keys = [make_embedding_key(text, EMBEDDING_MODEL) for text in texts]
+    cached = await asyncio.to_thread(get_cached_embeddings, keys)
+
+    async def embed(text: str, key: str) -> List[float]:
+        if key in cached:
+            return cached[key].tolist()
+        try:
+            return await _BATCHER.embed(text)
+        except Exception as e:
+            raise EmbeddingError(f"Error generating embedding: {str(e)}") from e
+
+    return list(await asyncio.gather(*(embed(text, key) for text, key in zip(texts, keys))))
 
 async def get_embedding(text: str) -> List[float]:
     """
     Get embedding vector for a piece of text using OpenRouter API with Mistral Instruct model
     
+    Concurrent calls are batched into one request and results are cached on
+    disk, so repeated texts cost no API call.
+    
     Args:
         text: The text to embed
         
     Returns:
         List of floats representing the embedding vector
+        
+    Raises:
+        EmbeddingError: If the API request failed
     """
-    try:
-        if OPENROUTER_API_KEY:
-            # Use the API to get embeddings
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    OPENROUTER_EMBEDDING_API_URL,
-                    headers={
-                        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-                        "HTTP-Referer": "https://github.com/theagentvikram/ResuMatch",  # Required by OpenRouter
-                        "X-Title": "ResuMatch"  # Optional but helpful for OpenRouter
-                    },
-                    json={
-                        "model": "mistralai/mistral-7b-instruct:free",  # Using free version of Mistral Instruct
-                        "input": text[:2000]  # Truncate to avoid token limits
-                    }
-                )
-                
-                if response.status_code == 200:
-                    # API returns a list of embeddings, we just need the first one
-                    embedding = response.json()["data"][0]["embedding"]
-                    return embedding
-                else:
-                    print(f"Error from OpenRouter API: {response.text}")
-                    # Fall back to mock embeddings
-                    return generate_mock_embedding()
-        else:
-            print("WARNING: No OpenRouter API key found. Using mock embeddings.")
-            return generate_mock_embedding()
-    except Exception as e:
-        print(f"Error generating embedding: {str(e)}")
-        return generate_mock_embedding()
+    return (await get_embeddings([text]))[0]
 
-def generate_mock_embedding(dimension: int = 4096) -> List[float]:
+async def get_local_embeddings(texts: Sequence[str]) -> List[List[float]]:
     """
-    Generate a mock embedding for testing when API is not available
+    Embed texts offline with the deterministic hashing embedder
+    
+    Runs in a worker thread so large batches don't block the event loop.
     
     Args:
-        dimension: Embedding dimension (default 4096 for Mistral)
+        texts: The texts to embed
         
     Returns:
-        Mock embedding vector of specified dimension
+        One L2-normalized embedding per text, in order
     """
-    # Generate random vector and normalize it
-    vector = np.random.normal(0, 1, dimension)
-    normalized = vector / np.linalg.norm(vector)
-    return normalized.tolist()
+    if not texts:
+        return []
+    matrix = await asyncio.to_thread(embed_texts_locally, list(texts))
+    return matrix.tolist()
 
 def calculate_similarity(embedding1: List[float], embedding2: List[float]) -> float:
     """
@@ -81,17 +244,72 @@ def calculate_similarity(embedding1: List[float], embedding2: List[float]) -> fl
     Returns:
         Cosine similarity score (float between -1 and 1)
     """
-    # Convert to numpy arrays and reshape for cosine_similarity
-    v1 = np.array(embedding1).reshape(1, -1)
-    v2 = np.array(embedding2).reshape(1, -1)
+    v1 = np.asarray(embedding1, dtype=np.float32)
+    v2 = np.asarray(embedding2, dtype=np.float32)
+    norms = float(np.linalg.norm(v1) * np.linalg.norm(v2))
+    return float(v1 @ v2) / norms if norms > 0 else 0.0
+
+def normalize_embeddings(embeddings: Any) -> np.ndarray:
+    """
+    Stack embeddings into a float32 matrix with L2-normalized rows
     
-    # Calculate cosine similarity
-    similarity = cosine_similarity(v1, v2)[0][0]
-    return float(similarity)
+    Args:
+        embeddings: Sequence of vectors of one dimension, or a 2-D array
+        
+    Returns:
+        (n, dim) float32 matrix; all-zero rows stay zero
+    """
+    matrix = np.array(embeddings, dtype=np.float32, ndmin=2)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the k highest scores, highest first
+    
+    argpartition finds the top k in linear time; only those k are sorted.
+    """
+    k = min(max(0, k), len(scores))
+    if k == 0:
+        return np.zeros(0, dtype=np.int64)
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top], kind="stable")]
+
+def top_k_similar(
+    query_embedding: Any,
+    corpus: np.ndarray,
+    k: int,
+    normalized: bool = True
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the corpus rows most similar to the query with one matrix-vector product
+    
+    Args:
+        query_embedding: Query vector
+        corpus: (n, dim) embedding matrix, e.g. from normalize_embeddings
+        k: Number of rows to return
+        normalized: Whether corpus rows are already L2-normalized
+        
+    Returns:
+        (row indices, cosine similarities), highest similarity first
+    """
+    if not normalized:
+        corpus = normalize_embeddings(corpus)
+    query = normalize_embeddings(query_embedding)[0]
+    if len(corpus) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    scores = corpus @ query
+    top = top_k_indices(scores, k)
+    return top, scores[top]
 
 async def rank_documents_by_query(
     query_embedding: List[float],
-    documents: List[Dict[str, Any]]
+    documents: Sequence[Dict[str, Any]],
+    k: Optional[int] = None
 ) -> List[Dict[str, Any]]:
     """
     Rank documents by similarity to query
@@ -99,14 +317,19 @@ async def rank_documents_by_query(
     Args:
         query_embedding: Embedding of the search query
         documents: List of documents with 'embedding' field
+        k: Return only the k most similar documents (all when None)
         
     Returns:
         List of documents sorted by similarity to query
     """
-    # Calculate similarity for each document
-    for doc in documents:
-        doc['similarity'] = calculate_similarity(query_embedding, doc['embedding'])
+    if not documents:
+        return []
+    corpus = normalize_embeddings([doc['embedding'] for doc in documents])
+    top, similarities = top_k_similar(query_embedding, corpus, len(documents) if k is None else k)
     
-    # Sort by similarity (highest first)
-    sorted_docs = sorted(documents, key=lambda x: x['similarity'], reverse=True)
-    return sorted_docs 
\ No newline at end of file
+    ranked = []
+    for index, similarity in zip(top, similarities):
+        doc = documents[index]
+        doc['similarity'] = float(similarity)
+        ranked.append(doc)
+    return ranked
@@ -0,0 +1,249 @@
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .keyword_index import resume_experience_years
+
+# Facet counts (skills, category, education level, experience bucket) for the
+# search sidebar. Whole-corpus counts are plain counters updated on every
+# add/remove. Each resume is also a row in numpy columns (category, education,
+# experience codes plus flat (row, skill) pairs), so counts for a filtered
+# subset are one boolean mask and a few np.bincount calls. Removed rows are
+# tombstoned and the columns are compacted once most of them are dead.
+EXPERIENCE_BUCKETS = (("0-1", 0, 1), ("2-4", 2, 4), ("5-9", 5, 9), ("10+", 10, None))
+
+def experience_bucket(years: int) -> int:
+    """Index into EXPERIENCE_BUCKETS for a number of years of experience"""
+    for code, (_, low, high) in enumerate(EXPERIENCE_BUCKETS):
+        if years >= low and (high is None or years <= high):
+            return code
+    return 0
+
+class _Codes:
+    """Assigns dense integer codes to facet values, keeping a display label per code"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    def encode(self, key: str, label: str) -> int:
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.labels)
+            self.labels.append(label)
+        return code
+
+class FacetIndex:
+    """Incrementally maintained facet counters and columns"""
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._reset(capacity)
+
+    def _reset(self, capacity: int = 1024) -> None:
+        self._rows: Dict[str, int] = {}  # resume id -> row
+        self._size = 0  # rows in use, live or tombstoned
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._category = np.zeros(capacity, dtype=np.int32)
+        self._education = np.zeros(capacity, dtype=np.int32)
+        self._experience = np.zeros(capacity, dtype=np.int32)
+        self._skill_rows = np.zeros(capacity * 4, dtype=np.int32)
+        self._skill_codes = np.zeros(capacity * 4, dtype=np.int32)
+        self._skill_size = 0
+        self._row_skills: Dict[int, Tuple[int, ...]] = {}  # row -> skill codes, for counter updates
+
+        self._category_codes = _Codes()
+        self._education_codes = _Codes()
+        self._skill_codes_vocab = _Codes()
+        self._category_counts: Counter = Counter()
+        self._education_counts: Counter = Counter()
+        self._experience_counts: Counter = Counter()
+        self._skill_counts: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, resume_id: str) -> bool:
+        return resume_id in self._rows
+
+    def rebuild(self, resumes: Iterable[Dict[str, Any]]) -> None:
+        """Replace the index contents with the given resumes"""
+        with self._lock:
+            self._reset()
+            for resume in resumes:
+                self._add(resume)
+
+    def add(self, resume: Dict[str, Any]) -> None:
+        """Count (or re-count) a resume"""
+        with self._lock:
+            self._remove(resume["id"])
+            self._add(resume)
+
+    def remove(self, resume_id: str) -> None:
+        """Stop counting a resume"""
+        with self._lock:
+            self._remove(resume_id)
+            dead = self._size - len(self._rows)
+            if dead > 1024 and dead > len(self._rows):
+                self._compact()
+
+    def _add(self, resume: Dict[str, Any]) -> None:
+        if self._size == len(self._alive):
+            self._grow_rows()
+        row = self._size
+        self._size += 1
+        self._rows[resume["id"]] = row
+
+        category = str(resume.get("category") or "")
+        education = str(resume.get("educationLevel") or "")
+        self._alive[row] = True
+        self._category[row] = self._category_codes.encode(category, category)
+        self._education[row] = self._education_codes.encode(education, education)
+        self._experience[row] = resume_experience_years(resume)
+
+        skill_codes = {}
+        for skill in resume.get("skills") or []:
+            label = str(skill).strip()
+            if label:
+                skill_codes.setdefault(self._skill_codes_vocab.encode(label.lower(), label), None)
+        skill_codes = tuple(skill_codes)
+        while self._skill_size + len(skill_codes) > len(self._skill_rows):
+            self._grow_skills()
+        end = self._skill_size + len(skill_codes)
+        self._skill_rows[self._skill_size:end] = row
+        self._skill_codes[self._skill_size:end] = skill_codes
+        self._skill_size = end
+        self._row_skills[row] = skill_codes
+
+        self._category_counts[int(self._category[row])] += 1
+        self._education_counts[int(self._education[row])] += 1
+        self._experience_counts[experience_bucket(int(self._experience[row]))] += 1
+        self._skill_counts.update(skill_codes)
+
+    def _remove(self, resume_id: str) -> None:
+        row = self._rows.pop(resume_id, None)
+        if row is None:
+            return
+        self._alive[row] = False
+        self._category_counts[int(self._category[row])] -= 1
+        self._education_counts[int(self._education[row])] -= 1
+        self._experience_counts[experience_bucket(int(self._experience[row]))] -= 1
+        self._skill_counts.subtract(self._row_skills.pop(row))
+
+    def _grow_rows(self) -> None:
+        capacity = max(1024, len(self._alive) * 2)
+        for name in ("_alive", "_category", "_education", "_experience"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _grow_skills(self) -> None:
+        capacity = max(4096, len(self._skill_rows) * 2)
+        for name in ("_skill_rows", "_skill_codes"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _compact(self) -> None:
+        """Drop tombstoned rows and renumber the live ones"""
+        alive = self._alive[:self._size]
+        new_rows = np.cumsum(alive) - 1
+        for name in ("_alive", "_category", "_education", "_experience"):
+            column = getattr(self, name)
+            kept = column[:self._size][alive]
+            compacted = np.zeros(len(column), dtype=column.dtype)
+            compacted[:len(kept)] = kept
+            setattr(self, name, compacted)
+
+        skill_rows = self._skill_rows[:self._skill_size]
+        keep_entries = alive[skill_rows]
+        kept_rows = new_rows[skill_rows[keep_entries]].astype(np.int32)
+        kept_codes = self._skill_codes[:self._skill_size][keep_entries]
+        self._skill_size = len(kept_rows)
+        self._skill_rows[:self._skill_size] = kept_rows
+        self._skill_codes[:self._skill_size] = kept_codes
+
+        self._rows = {resume_id: int(new_rows[row]) for resume_id, row in self._rows.items()}
+        self._row_skills = {int(new_rows[row]): codes for row, codes in self._row_skills.items()}
+        self._size = len(self._rows)
+
+    def _filter_mask(self, filters: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask of live resumes passing the filters (see filter_index.normalize_filters)"""
+        mask = self._alive[:self._size].copy()
+        if "category" in filters:
+            code = self._category_codes.codes.get(filters["category"])
+            mask &= self._category[:self._size] == (-1 if code is None else code)
+        if "educationLevel" in filters:
+            code = self._education_codes.codes.get(filters["educationLevel"])
+            mask &= self._education[:self._size] == (-1 if code is None else code)
+        if "minExperience" in filters:
+            mask &= self._experience[:self._size] >= filters["minExperience"]
+        if "skills" in filters:
+            wanted = np.zeros(len(self._skill_codes_vocab), dtype=bool)
+            wanted[[self._skill_codes_vocab.codes[s] for s in filters["skills"] if s in self._skill_codes_vocab.codes]] = True
+            has_skill = np.zeros(self._size, dtype=bool)
+            if wanted.any():
+                # Code lookup table instead of np.isin: one gather over the (row, skill) pairs
+                entries = wanted[self._skill_codes[:self._skill_size]]
+                has_skill[self._skill_rows[:self._skill_size][entries]] = True
+            mask &= has_skill
+        return mask
+
+    def facets(self, filters: Optional[Dict[str, Any]] = None, skill_limit: int = 20) -> Dict[str, Any]:
+        """
+        Facet counts for all resumes, or for the subset passing the filters
+
+        Args:
+            filters: Optional filters as returned by filter_index.normalize_filters
+            skill_limit: Maximum number of skill values to return
+
+        Returns:
+            Dict with total and value/count lists for skills, category, educationLevel and experience
+        """
+        with self._lock:
+            if not filters:
+                total = len(self._rows)
+                category_counts = self._category_counts
+                education_counts = self._education_counts
+                experience_counts = self._experience_counts
+                skill_counts = self._skill_counts
+            else:
+                mask = self._filter_mask(filters)
+                total = int(mask.sum())
+                category_counts = _counts(np.bincount(self._category[:self._size][mask], minlength=len(self._category_codes)))
+                education_counts = _counts(np.bincount(self._education[:self._size][mask], minlength=len(self._education_codes)))
+                buckets = np.searchsorted(
+                    [low for _, low, _ in EXPERIENCE_BUCKETS[1:]], self._experience[:self._size][mask], side="right"
+                )
+                experience_counts = _counts(np.bincount(buckets, minlength=len(EXPERIENCE_BUCKETS)))
+                skill_rows = self._skill_rows[:self._skill_size]
+                skill_counts = _counts(np.bincount(
+                    self._skill_codes[:self._skill_size][mask[skill_rows]], minlength=len(self._skill_codes_vocab)
+                ))
+
+            return {
+                "total": total,
+                "skills": _ranked(skill_counts, self._skill_codes_vocab.labels)[:max(0, skill_limit)],
+                "category": _ranked(category_counts, self._category_codes.labels),
+                "educationLevel": _ranked(education_counts, self._education_codes.labels),
+                "experience": [
+                    {"value": label, "count": int(experience_counts.get(code, 0))}
+                    for code, (label, _, _) in enumerate(EXPERIENCE_BUCKETS)
+                ],
+            }
+
+def _counts(bincount: np.ndarray) -> Dict[int, int]:
+    return {int(code): int(bincount[code]) for code in np.flatnonzero(bincount)}
+
+def _ranked(counts: Dict[int, int], labels: List[str]) -> List[Dict[str, Any]]:
+    """Non-empty facet values with a positive count, most frequent first"""
+    ranked = [(count, labels[code]) for code, count in counts.items() if count > 0 and labels[code]]
+    ranked.sort(key=lambda item: (-item[0], item[1]))
+    return [{"value": label, "count": int(count)} for count, label in ranked]
@@ -0,0 +1,157 @@
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .keyword_index import resume_experience_years
+
+# In-memory filter indexes for resume search. Category, education level and
+# skills are kept as value -> id-set postings, experience as a sorted column,
+# so a filter resolves to the matching id set with set intersections and one
+# bisect instead of a scan over every resume record. Filter semantics follow
+# database_service.search_resumes:
+#   category / educationLevel: exact match
+#   minExperience: experience >= value
+#   skills: resume has at least one of the skills (case-insensitive)
+FILTER_KEYS = ("category", "educationLevel", "minExperience", "skills")
+
+def normalize_filters(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Keep the supported, non-empty filters and coerce their types
+
+    Args:
+        filters: SearchQuery.filters as sent by the client
+
+    Returns:
+        Dict with any of category, educationLevel, minExperience (int) and skills (lowercased set)
+
+    Raises:
+        ValueError: If minExperience is not a number or skills is not a list
+    """
+    normalized: Dict[str, Any] = {}
+    for key in FILTER_KEYS:
+        value = (filters or {}).get(key)
+        if value is None or value == "" or value == []:
+            continue
+        if key == "minExperience":
+            try:
+                normalized[key] = int(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"minExperience must be a number, got {value!r}")
+        elif key == "skills":
+            if not isinstance(value, list):
+                raise ValueError("skills filter must be a list")
+            normalized[key] = {str(skill).lower() for skill in value}
+        else:
+            normalized[key] = str(value)
+    return normalized
+
+class FilterIndex:
+    """Postings and sorted-column indexes over the filterable resume fields"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._ids: Set[str] = set()
+        self._category: Dict[str, Set[str]] = {}
+        self._education: Dict[str, Set[str]] = {}
+        self._skills: Dict[str, Set[str]] = {}
+        self._experience: List[Tuple[int, str]] = []  # sorted (years, id)
+        self._fields: Dict[str, Tuple[str, str, Set[str], int]] = {}  # id -> indexed values, for removal
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, resume_id: str) -> bool:
+        return resume_id in self._ids
+
+    def rebuild(self, resumes: Iterable[Dict[str, Any]]) -> None:
+        """Replace the index contents with the given resumes"""
+        with self._lock:
+            self._reset()
+            for resume in resumes:
+                self._add(resume)
+
+    def add(self, resume: Dict[str, Any]) -> None:
+        """Index (or re-index) a resume"""
+        with self._lock:
+            self._remove(resume["id"])
+            self._add(resume)
+
+    def remove(self, resume_id: str) -> None:
+        """Remove a resume from the index"""
+        with self._lock:
+            self._remove(resume_id)
+
+    def _add(self, resume: Dict[str, Any]) -> None:
+        resume_id = resume["id"]
+        category = str(resume.get("category") or "")
+        education = str(resume.get("educationLevel") or "")
+        skills = {str(skill).lower() for skill in resume.get("skills") or []}
+        experience = resume_experience_years(resume)
+
+        self._ids.add(resume_id)
+        self._category.setdefault(category, set()).add(resume_id)
+        self._education.setdefault(education, set()).add(resume_id)
+        for skill in skills:
+            self._skills.setdefault(skill, set()).add(resume_id)
+        bisect.insort(self._experience, (experience, resume_id))
+        self._fields[resume_id] = (category, education, skills, experience)
+
+    def _remove(self, resume_id: str) -> None:
+        fields = self._fields.pop(resume_id, None)
+        if fields is None:
+            return
+        category, education, skills, experience = fields
+        self._ids.discard(resume_id)
+        _discard(self._category, category, resume_id)
+        _discard(self._education, education, resume_id)
+        for skill in skills:
+            _discard(self._skills, skill, resume_id)
+        position = bisect.bisect_left(self._experience, (experience, resume_id))
+        if position < len(self._experience) and self._experience[position] == (experience, resume_id):
+            del self._experience[position]
+
+    def match(self, filters: Dict[str, Any]) -> Optional[Set[str]]:
+        """
+        Ids of the resumes passing every filter
+
+        Args:
+            filters: Filters as returned by normalize_filters
+
+        Returns:
+            Set of matching resume ids, or None when there is nothing to filter on
+        """
+        if not filters:
+            return None
+        with self._lock:
+            candidates: List[Set[str]] = []
+            if "category" in filters:
+                candidates.append(self._category.get(filters["category"], set()))
+            if "educationLevel" in filters:
+                candidates.append(self._education.get(filters["educationLevel"], set()))
+            if "skills" in filters:
+                candidates.append(set().union(*(self._skills.get(skill, set()) for skill in filters["skills"])))
+            min_experience = filters.get("minExperience")
+            if not candidates:
+                start = bisect.bisect_left(self._experience, (min_experience, ""))
+                return {resume_id for _, resume_id in self._experience[start:]}
+
+            # Intersect smallest first so the work is bounded by the most selective filter
+            candidates.sort(key=len)
+            matched = set(candidates[0])
+            for candidate in candidates[1:]:
+                matched &= candidate
+                if not matched:
+                    break
+            if min_experience is not None:
+                matched = {resume_id for resume_id in matched if self._fields[resume_id][3] >= min_experience}
+            return matched
+
+def _discard(postings: Dict[str, Set[str]], value: str, resume_id: str) -> None:
+    ids = postings.get(value)
+    if ids is not None:
+        ids.discard(resume_id)
+        if not ids:
+            del postings[value]
@@ -0,0 +1,377 @@
+import re
+from typing import Any, Container, Dict, Iterable, List, Optional, Set, Tuple
+
+# In-memory inverted index for keyword resume matching. It reproduces the
+# weighted summary/skills/experience/education score of
+# calculate_keyword_match_score, but a query only touches the postings of its
+# own terms instead of rescanning every resume's summary and skills.
+
+WORD_RE = re.compile(r'\w+')
+EXPERIENCE_RE = re.compile(r'(\d+)\s*\+?\s*year(?:s)?(?: experience)?', re.IGNORECASE)
+GRAM_SIZE = 3
+
+def resume_experience_years(resume: Dict[str, Any]) -> int:
+    """Parse the experience field of a resume record as whole years (0 if invalid)"""
+    resume_experience_str = str(resume.get("experience", "0")).replace("+", "").strip()
+    try:
+        return int(float(resume_experience_str))
+    except (ValueError, OverflowError):
+        return 0
+
+def required_experience_years(job_query: str) -> int:
+    """Extract required years of experience from a query (e.g. "2+ years")"""
+    experience_match = EXPERIENCE_RE.search(job_query)
+    return int(experience_match.group(1)) if experience_match else 0
+
+def experience_match_score(resume_experience: int, required_experience: int) -> Tuple[float, Optional[str]]:
+    """Experience component (0-100) and its match reason"""
+    if resume_experience >= required_experience:
+        return 100, f"Experience: Matches required {required_experience}+ years."
+    if resume_experience > 0 and required_experience > 0:
+        return (resume_experience / required_experience) * 100, f"Experience: {resume_experience} years, {required_experience} years required."
+    return 0, None
+
+def education_match_score(query_education_lower: str, resume_education_lower: str) -> int:
+    """Education component (0-100) for a lowercased query and education level"""
+    if "master" in query_education_lower and "master" in resume_education_lower:
+        return 100
+    if "bachelor" in query_education_lower and "bachelor" in resume_education_lower:
+        return 100
+    if "phd" in query_education_lower and "phd" in resume_education_lower:
+        return 100
+    if "master" not in query_education_lower and "bachelor" not in query_education_lower and "phd" not in query_education_lower:
+        # If no specific education level is requested, consider any education a partial match
+        if resume_education_lower:
+            return 50
+    return 0
+
+def calculate_keyword_match_score(job_query: str, resume: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Calculates a match score for a resume based on a job query using keyword matching,
+    with weighted scores for summary, skills, experience, and education.
+    """
+    score = 0
+    match_reasons = []
+
+    # 1. Summary Match (Weight 0.4)
+    summary_keywords = [word.lower() for word in re.findall(r'\b\w+\b', job_query) if len(word) > 2]
+    summary_hits = 0
+    if resume.get("summary"):
+        resume_summary_lower = resume["summary"].lower()
+        for keyword in summary_keywords:
+            if keyword in resume_summary_lower:
+                summary_hits += 1
+        summary_score = min(summary_hits * 10, 100) # Cap at 100 for summary
+        score += summary_score * 0.4
+        if summary_score > 0:
+            match_reasons.append(f"Summary relevance: {summary_hits} keyword(s) matched.")
+
+    # 2. Skills Match (Weight 0.3)
+    query_skills = [skill.strip().lower() for skill in job_query.split(" ") if skill.strip()]
+    matched_skills_list = []
+    if resume.get("skills"):
+        for r_skill in resume["skills"]:
+            if any(q_skill in r_skill.lower() for q_skill in query_skills):
+                matched_skills_list.append(r_skill)
+        
+        skill_match_count = len(matched_skills_list)
+        # Linear scaling for skills, each skill contributes 20 points up to a max of 100 
+        skill_score = min(skill_match_count * 20, 100) 
+        score += skill_score * 0.3
+        if skill_match_count > 0:
+            match_reasons.append(f"Skills match: {skill_match_count} relevant skill(s) found: {', '.join(matched_skills_list)}.")
+
+    # 3. Experience Match (Weight 0.2)
+    resume_experience = resume_experience_years(resume)
+
+    # Extract experience years from query using regex (e.g., "2+ years", "3 years experience")
+    required_experience = required_experience_years(job_query)
+
+    experience_score, experience_reason = experience_match_score(resume_experience, required_experience)
+    if experience_reason:
+        match_reasons.append(experience_reason)
+    score += experience_score * 0.2
+
+    # 4. Education Level Match (Weight 0.1)
+    resume_education_lower = str(resume.get("educationLevel", "")).lower()
+    education_score = education_match_score(job_query.lower(), resume_education_lower)
+    
+    if education_score > 0:
+        match_reasons.append(f"Education: {resume.get('educationLevel', 'N/A')} matches query.")
+    score += education_score * 0.1
+
+    final_score = min(100, max(0, int(score))) # Ensure score is between 0 and 100
+    
+    return {
+        "score": final_score,
+        "reason": "; ".join(match_reasons) if match_reasons else "No specific match reasons found for keyword search.",
+        "source": "keyword_matching"
+    }
+
+def _grams(text: str) -> Set[str]:
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+class _SubstringVocabulary:
+    """Vocabulary of strings with postings, searchable by substring through a trigram index"""
+
+    def __init__(self):
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {resume id: occurrences}
+        self._grams: Dict[str, Set[str]] = {}  # trigram -> terms containing it
+
+    def add(self, term: str, resume_id: str) -> None:
+        docs = self.postings.get(term)
+        if docs is None:
+            docs = self.postings[term] = {}
+            for gram in _grams(term):
+                self._grams.setdefault(gram, set()).add(term)
+        docs[resume_id] = docs.get(resume_id, 0) + 1
+
+    def remove(self, term: str, resume_id: str) -> None:
+        docs = self.postings.get(term)
+        if docs is None:
+            return
+        docs.pop(resume_id, None)
+        if not docs:
+            del self.postings[term]
+            for gram in _grams(term):
+                terms = self._grams.get(gram)
+                if terms is not None:
+                    terms.discard(term)
+                    if not terms:
+                        del self._grams[gram]
+
+    def terms_containing(self, fragment: str) -> Iterable[str]:
+        """Every vocabulary term that contains fragment as a substring"""
+        if len(fragment) < GRAM_SIZE:
+            # Too short for the gram index, scan the (small) vocabulary
+            return [term for term in self.postings if fragment in term]
+        candidates: Optional[Set[str]] = None
+        for gram in _grams(fragment):
+            terms = self._grams.get(gram)
+            if not terms:
+                return []
+            candidates = set(terms) if candidates is None else candidates & terms
+            if not candidates:
+                return []
+        return [term for term in candidates if fragment in term]
+
+class KeywordScores:
+    """
+    Keyword scores for one query. Resumes hit by a query term are scored
+    individually; every other resume shares the score of its
+    (experience, education) group, so no per-resume work is done for them.
+    """
+
+    def __init__(self, index: "KeywordIndex", hit_results: Dict[str, Dict[str, Any]], group_results: Dict[Tuple[int, str, Any], Dict[str, Any]]):
+        self._index = index
+        self._hit_results = hit_results
+        self._group_results = group_results
+
+    def get(self, resume_id: str) -> Optional[Dict[str, Any]]:
+        """Score result for a resume, or None if it is not indexed"""
+        result = self._hit_results.get(resume_id)
+        if result is None:
+            doc = self._index._docs.get(resume_id)
+            if doc is None:
+                return None
+            result = self._group_results[doc["group"]]
+        return dict(result)
+
+    def top(self, k: int, min_score: int = 0, allowed: Optional[Container[str]] = None) -> List[str]:
+        """
+        Ids of the k best-scoring resumes with score >= min_score, best first
+        (ties keep indexing order). With allowed, only those ids are ranked.
+        """
+        if k <= 0:
+            return []
+        docs = self._index._docs
+        ranked = [
+            (-result["score"], docs[resume_id]["seq"], resume_id)
+            for resume_id, result in self._hit_results.items()
+            if result["score"] >= min_score and (allowed is None or resume_id in allowed)
+        ]
+        for group, result in self._group_results.items():
+            if result["score"] < min_score:
+                continue
+            taken = 0
+            for resume_id in self._index._groups[group]:
+                if resume_id in self._hit_results or (allowed is not None and resume_id not in allowed):
+                    continue
+                ranked.append((-result["score"], docs[resume_id]["seq"], resume_id))
+                taken += 1
+                if taken >= k:
+                    break
+        ranked.sort()
+        return [resume_id for _, _, resume_id in ranked[:k]]
+
+class KeywordIndex:
+    """
+    Inverted index over resume summary tokens and normalized skills
+
+    A keyword occurring as a substring of a lowercased summary always lies
+    within a single word token, so summary matches are resolved against the
+    token vocabulary. Skills are matched against the distinct lowercased
+    skill strings. Experience and education are kept as precomputed columns.
+    """
+
+    def __init__(self):
+        self._summary_terms = _SubstringVocabulary()
+        self._skill_terms = _SubstringVocabulary()
+        self._docs: Dict[str, Dict[str, Any]] = {}
+        # (experience, lowercased education, education) -> resume ids, in indexing order
+        self._groups: Dict[Tuple[int, str, Any], Dict[str, None]] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, resume_id: str) -> bool:
+        return resume_id in self._docs
+
+    def rebuild(self, resumes: Iterable[Dict[str, Any]]) -> None:
+        """Rebuild the index from scratch"""
+        self._summary_terms = _SubstringVocabulary()
+        self._skill_terms = _SubstringVocabulary()
+        self._docs = {}
+        self._groups = {}
+        for resume in resumes:
+            self.add(resume)
+
+    def add(self, resume: Dict[str, Any]) -> None:
+        """Index a resume record (replacing any previous version with the same id)"""
+        resume_id = resume["id"]
+        if resume_id in self._docs:
+            self.remove(resume_id)
+
+        summary = resume.get("summary") or ""
+        summary_tokens = set(WORD_RE.findall(summary.lower())) if summary else set()
+        for token in summary_tokens:
+            self._summary_terms.add(token, resume_id)
+
+        skills = resume.get("skills") or []
+        skills_lower = [str(skill).lower() for skill in skills]
+        for skill in skills_lower:
+            self._skill_terms.add(skill, resume_id)
+
+        education = resume.get("educationLevel", "N/A")
+        group = (resume_experience_years(resume), str(resume.get("educationLevel", "")).lower(), str(education))
+        self._groups.setdefault(group, {})[resume_id] = None
+
+        self._seq += 1
+        self._docs[resume_id] = {
+            "seq": self._seq,
+            "group": group,
+            "education": education,
+            "skills": list(skills),
+            "skills_lower": skills_lower,
+            "summary_tokens": summary_tokens,
+            "has_summary": bool(summary),
+        }
+
+    def remove(self, resume_id: str) -> None:
+        """Remove a resume from the index"""
+        doc = self._docs.pop(resume_id, None)
+        if doc is None:
+            return
+        for token in doc["summary_tokens"]:
+            self._summary_terms.remove(token, resume_id)
+        for skill in set(doc["skills_lower"]):
+            self._skill_terms.remove(skill, resume_id)
+        members = self._groups.get(doc["group"])
+        if members is not None:
+            members.pop(resume_id, None)
+            if not members:
+                del self._groups[doc["group"]]
+
+    def score(self, job_query: str) -> KeywordScores:
+        """
+        Score the indexed resumes against a job query
+
+        Args:
+            job_query: The job query text
+
+        Returns:
+            KeywordScores whose per-resume results are identical to
+            calculate_keyword_match_score for the same record
+        """
+        # 1. Summary: hits per resume, counting repeated query keywords like the scan does
+        summary_keywords = [word.lower() for word in WORD_RE.findall(job_query) if len(word) > 2]
+        summary_hits: Dict[str, int] = {}
+        keyword_docs: Dict[str, Set[str]] = {}
+        for keyword in summary_keywords:
+            if keyword not in keyword_docs:
+                docs: Set[str] = set()
+                for token in self._summary_terms.terms_containing(keyword):
+                    docs.update(self._summary_terms.postings[token])
+                keyword_docs[keyword] = docs
+            for resume_id in keyword_docs[keyword]:
+                summary_hits[resume_id] = summary_hits.get(resume_id, 0) + 1
+
+        # 2. Skills: distinct skill strings containing any query term
+        query_skills = {skill.strip().lower() for skill in job_query.split(" ") if skill.strip()}
+        matched_skills: Set[str] = set()
+        for q_skill in query_skills:
+            matched_skills.update(self._skill_terms.terms_containing(q_skill))
+        skill_docs: Set[str] = set()
+        for skill in matched_skills:
+            skill_docs.update(self._skill_terms.postings[skill])
+
+        # 3/4. Experience and education depend only on the resume's group
+        required_experience = required_experience_years(job_query)
+        query_education_lower = job_query.lower()
+        group_parts = {}
+        for group in self._groups:
+            experience, education_lower, education = group
+            experience_score, experience_reason = experience_match_score(experience, required_experience)
+            education_score = education_match_score(query_education_lower, education_lower)
+            group_parts[group] = (experience_score, experience_reason, education_score, education)
+
+        group_results = {
+            group: self._assemble(0, [], *parts)
+            for group, parts in group_parts.items()
+        }
+
+        hit_results = {}
+        for resume_id in summary_hits.keys() | skill_docs:
+            doc = self._docs[resume_id]
+            score = 0
+            match_reasons = []
+
+            if doc["has_summary"]:
+                hits = summary_hits.get(resume_id, 0)
+                summary_score = min(hits * 10, 100)
+                score += summary_score * 0.4
+                if summary_score > 0:
+                    match_reasons.append(f"Summary relevance: {hits} keyword(s) matched.")
+
+            if doc["skills"]:
+                matched_skills_list = [
+                    skill for skill, skill_lower in zip(doc["skills"], doc["skills_lower"])
+                    if skill_lower in matched_skills
+                ]
+                skill_match_count = len(matched_skills_list)
+                skill_score = min(skill_match_count * 20, 100)
+                score += skill_score * 0.3
+                if skill_match_count > 0:
+                    match_reasons.append(f"Skills match: {skill_match_count} relevant skill(s) found: {', '.join(matched_skills_list)}.")
+
+            hit_results[resume_id] = self._assemble(score, match_reasons, *group_parts[doc["group"]])
+
+        return KeywordScores(self, hit_results, group_results)
+
+    @staticmethod
+    def _assemble(score: float, match_reasons: List[str], experience_score: float, experience_reason: Optional[str], education_score: int, education: Any) -> Dict[str, Any]:
+        # Same accumulation order as the per-resume scan, so float rounding matches
+        if experience_reason:
+            match_reasons.append(experience_reason)
+        score += experience_score * 0.2
+
+        if education_score > 0:
+            match_reasons.append(f"Education: {education} matches query.")
+        score += education_score * 0.1
+
+        return {
+            "score": min(100, max(0, int(score))),
+            "reason": "; ".join(match_reasons) if match_reasons else "No specific match reasons found for keyword search.",
+            "source": "keyword_matching"
+        }
@@ -0,0 +1,261 @@
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from .keyword_index import (
+    resume_experience_years, required_experience_years, education_match_score
+)
+
+# Vectorized batch scorer for keyword resume matching. Resumes are encoded once
+# into sparse summary-token and skill matrices plus dense experience/education
+# columns; a query is then scored against every resume with a few sparse
+# products and the best k are picked with argpartition. Scores are identical
+# to calculate_keyword_match_score. Uploads and deletes only encode or
+# tombstone their own row, so the matrix is never rebuilt on the request path.
+
+WORD_RE = re.compile(r'\w+')
+
+def _containing(vocabulary: np.ndarray, fragment: str) -> np.ndarray:
+    """Boolean mask of vocabulary entries containing fragment as a substring"""
+    if vocabulary.size == 0:
+        return np.zeros(0, dtype=bool)
+    return np.char.find(vocabulary, fragment) >= 0
+
+# Rows added since the last merge are scored as a separate delta block; it is
+# merged into the main matrices (and removed rows compacted away) once it
+# outgrows this many rows or an eighth of the corpus, so updates stay cheap
+DELTA_MERGE_MIN = 256
+
+class KeywordMatrix:
+    """Column-encoded resumes for batch keyword scoring, updated in place with add/remove"""
+
+    def __init__(self, resumes: Iterable[Dict[str, Any]] = ()):
+        self.ids: List[Optional[str]] = []  # row -> resume id, None once removed
+        self.rows: Dict[str, int] = {}
+        self._summary_vocab: Dict[str, int] = {}
+        self._skill_vocab: Dict[str, int] = {}
+        self._education_vocab: Dict[str, int] = {}
+        self.summary_vocab = np.zeros(0, dtype=str)
+        self.skill_vocab = np.zeros(0, dtype=str)
+        self.education_vocab: List[str] = []
+
+        # Main block: rows merged so far
+        self.summary_matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.skill_matrix = sparse.csr_matrix((0, 0), dtype=np.float64)
+        self.experience = np.zeros(0, dtype=np.int64)
+        self.education_codes = np.zeros(0, dtype=np.int64)
+        self.alive = np.zeros(0, dtype=bool)
+
+        # Delta block: encoded rows (summary columns, skill columns, experience, education code) not merged yet
+        self._delta: List[Tuple[List[int], List[int], int, int]] = []
+        self._delta_block = None
+        self._removed = 0
+
+        for resume in resumes:
+            self.add(resume)
+        self._merge()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def add(self, resume: Dict[str, Any]) -> None:
+        """Add a resume (replacing the row of one with the same id)"""
+        self.remove(resume["id"])
+        summary_cols = []
+        summary = resume.get("summary") or ""
+        if summary:
+            for token in set(WORD_RE.findall(summary.lower())):
+                summary_cols.append(self._summary_vocab.setdefault(token, len(self._summary_vocab)))
+
+        # Duplicate skills are summed by the sparse constructor, like the list scan counts them
+        skill_cols = [
+            self._skill_vocab.setdefault(str(skill).lower(), len(self._skill_vocab))
+            for skill in resume.get("skills") or []
+        ]
+        education_lower = str(resume.get("educationLevel", "")).lower()
+        education_code = self._education_vocab.setdefault(education_lower, len(self._education_vocab))
+
+        self.rows[resume["id"]] = len(self.ids)
+        self.ids.append(resume["id"])
+        self._delta.append((summary_cols, skill_cols, resume_experience_years(resume), education_code))
+        self._delta_block = None
+
+    def remove(self, resume_id: str) -> None:
+        """Tombstone a resume's row; its space is reclaimed on the next merge"""
+        row = self.rows.pop(resume_id, None)
+        if row is None:
+            return
+        self.ids[row] = None
+        if row < len(self.alive):
+            self.alive[row] = False
+        self._removed += 1
+
+    def _encode_delta(self) -> Tuple[sparse.csr_matrix, sparse.csr_matrix, np.ndarray, np.ndarray]:
+        if self._delta_block is None:
+            rows = len(self._delta)
+            summary_rows = [row for row, entry in enumerate(self._delta) for _ in entry[0]]
+            summary_cols = [col for entry in self._delta for col in entry[0]]
+            skill_rows = [row for row, entry in enumerate(self._delta) for _ in entry[1]]
+            skill_cols = [col for entry in self._delta for col in entry[1]]
+            self._delta_block = (
+                sparse.csr_matrix(
+                    (np.ones(len(summary_cols), dtype=np.float64), (summary_rows, summary_cols)),
+                    shape=(rows, len(self._summary_vocab))
+                ),
+                sparse.csr_matrix(
+                    (np.ones(len(skill_cols), dtype=np.float64), (skill_rows, skill_cols)),
+                    shape=(rows, len(self._skill_vocab))
+                ),
+                np.array([entry[2] for entry in self._delta], dtype=np.int64),
+                np.array([entry[3] for entry in self._delta], dtype=np.int64),
+            )
+        return self._delta_block
+
+    def _merge(self) -> None:
+        """Append the delta block to the main matrices and drop removed rows"""
+        summary_delta, skill_delta, experience_delta, education_delta = self._encode_delta()
+        alive_delta = np.array([resume_id is not None for resume_id in self.ids[len(self.alive):]], dtype=bool)
+        # New vocabulary only adds columns, so the main block just widens
+        self.summary_matrix.resize((self.summary_matrix.shape[0], len(self._summary_vocab)))
+        self.skill_matrix.resize((self.skill_matrix.shape[0], len(self._skill_vocab)))
+        self.summary_matrix = sparse.vstack([self.summary_matrix, summary_delta], format="csr")
+        self.skill_matrix = sparse.vstack([self.skill_matrix, skill_delta], format="csr")
+        self.experience = np.concatenate([self.experience, experience_delta])
+        self.education_codes = np.concatenate([self.education_codes, education_delta])
+        self.alive = np.concatenate([self.alive, alive_delta])
+
+        if self._removed:
+            keep = np.flatnonzero(self.alive)
+            self.summary_matrix = self.summary_matrix[keep]
+            self.skill_matrix = self.skill_matrix[keep]
+            self.experience = self.experience[keep]
+            self.education_codes = self.education_codes[keep]
+            self.alive = np.ones(len(keep), dtype=bool)
+            self.ids = [self.ids[row] for row in keep]
+            self.rows = {resume_id: row for row, resume_id in enumerate(self.ids)}
+            self._removed = 0
+
+        self._delta = []
+        self._delta_block = None
+
+    def _blocks(self) -> List[Tuple[sparse.csr_matrix, sparse.csr_matrix, np.ndarray, np.ndarray]]:
+        """Main and delta blocks to score, in row order (merging first once the delta or the tombstones grow large)"""
+        threshold = max(DELTA_MERGE_MIN, len(self.ids) // 8)
+        if len(self._delta) > threshold or self._removed > threshold:
+            self._merge()
+        if len(self.summary_vocab) != len(self._summary_vocab):
+            self.summary_vocab = np.array(list(self._summary_vocab), dtype=str)
+        if len(self.skill_vocab) != len(self._skill_vocab):
+            self.skill_vocab = np.array(list(self._skill_vocab), dtype=str)
+        if len(self.education_vocab) != len(self._education_vocab):
+            self.education_vocab = list(self._education_vocab)
+        blocks = [(self.summary_matrix, self.skill_matrix, self.experience, self.education_codes)]
+        if self._delta:
+            blocks.append(self._encode_delta())
+        return blocks
+
+    def scores(self, job_query: str) -> np.ndarray:
+        """
+        Score every row against a job query
+
+        Args:
+            job_query: The job query text
+
+        Returns:
+            int64 array of scores (0-100), aligned with self.ids (rows of removed resumes are scored too)
+        """
+        blocks = self._blocks()
+        n = len(self.ids)
+
+        # 1. Summary: one indicator column per distinct keyword, weighted by its repeat count
+        keyword_counts = Counter(word.lower() for word in WORD_RE.findall(job_query) if len(word) > 2)
+        summary_hits = np.zeros(n, dtype=np.float64)
+        if keyword_counts and self.summary_vocab.size:
+            columns = [_containing(self.summary_vocab, keyword) for keyword in keyword_counts]
+            keyword_matrix = sparse.csc_matrix(np.column_stack(columns).astype(np.float64))
+            weights = np.fromiter(keyword_counts.values(), dtype=np.float64)
+            block_hits = []
+            for summary_matrix, _, _, _ in blocks:
+                # A block only has columns for the vocabulary it was encoded with
+                hits = summary_matrix @ keyword_matrix[:summary_matrix.shape[1]]
+                hits.data[:] = 1.0  # a keyword counts once however many tokens contain it
+                block_hits.append(hits @ weights)
+            summary_hits = np.concatenate(block_hits)
+        summary_score = np.minimum(summary_hits * 10, 100)
+
+        # 2. Skills: count resume skills containing any query term
+        query_skills = {skill.strip().lower() for skill in job_query.split(" ") if skill.strip()}
+        matched_skills = np.zeros(self.skill_vocab.size, dtype=bool)
+        for q_skill in query_skills:
+            matched_skills |= _containing(self.skill_vocab, q_skill)
+        matched_skills = matched_skills.astype(np.float64)
+        skill_counts = np.concatenate([
+            skill_matrix @ matched_skills[:skill_matrix.shape[1]] for _, skill_matrix, _, _ in blocks
+        ])
+        skill_score = np.minimum(skill_counts * 20, 100)
+
+        # 3. Experience
+        required_experience = required_experience_years(job_query)
+        experience = np.concatenate([block[2] for block in blocks])
+        if required_experience > 0:
+            partial = np.where(experience > 0, (experience / required_experience) * 100, 0)
+        else:
+            partial = np.zeros(n, dtype=np.float64)
+        experience_score = np.where(experience >= required_experience, 100.0, partial)
+
+        # 4. Education, evaluated once per distinct education level
+        query_education_lower = job_query.lower()
+        education_table = np.array(
+            [education_match_score(query_education_lower, level) for level in self.education_vocab],
+            dtype=np.float64
+        )
+        education_codes = np.concatenate([block[3] for block in blocks])
+        education_score = education_table[education_codes] if n else np.zeros(0)
+
+        # Same accumulation order as the per-resume scan, so float truncation matches
+        score = summary_score * 0.4
+        score = score + skill_score * 0.3
+        score = score + experience_score * 0.2
+        score = score + education_score * 0.1
+        return np.clip(np.trunc(score), 0, 100).astype(np.int64)
+
+    def top_k(
+        self,
+        job_query: str,
+        k: int,
+        min_score: int = 0,
+        allowed_ids: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, int]]:
+        """
+        Best k resumes for a query
+
+        Args:
+            job_query: The job query text
+            k: Number of resumes to return
+            min_score: Minimum score to qualify
+            allowed_ids: Optional subset of resumes to rank (e.g. those passing search filters)
+
+        Returns:
+            (resume id, score) pairs, best first; ties keep corpus order
+        """
+        scores = self.scores(job_query)
+        qualifies = scores >= min_score
+        qualifies[:len(self.alive)] &= self.alive
+        for row in range(len(self.alive), len(self.ids)):
+            qualifies[row] &= self.ids[row] is not None
+        if allowed_ids is not None:
+            allowed_rows = np.zeros(len(self.ids), dtype=bool)
+            allowed_rows[[self.rows[i] for i in allowed_ids if i in self.rows]] = True
+            qualifies &= allowed_rows
+        eligible = np.flatnonzero(qualifies)
+        if k <= 0 or eligible.size == 0:
+            return []
+        if eligible.size > k:
+            # argpartition finds the k-th best score; keep every tie at it so corpus order decides
+            kth = scores[eligible[np.argpartition(-scores[eligible], k - 1)[k - 1]]]
+            eligible = eligible[scores[eligible] >= kth]
+        order = np.lexsort((eligible, -scores[eligible]))[:k]
+        return [(self.ids[i], int(scores[i])) for i in eligible[order]]
@@ -0,0 +1,104 @@
+import os
+import re
+import zlib
+from typing import Sequence
+
+import numpy as np
+
+from .bm25_service import tokenize
+
+# Deterministic offline embeddings: feature hashing of word unigrams/bigrams
+# and character 3-5-grams into a fixed number of dimensions. Each feature
+# gets a sublinear term frequency weight (1 + log tf) and a hash-derived
+# sign, so bucket collisions cancel out on average instead of adding up.
+# The word and character blocks are L2-normalized separately, mixed with
+# LOCAL_EMBEDDING_CHAR_WEIGHT and normalized again, so cosine similarity
+# reflects shared vocabulary (words) and shared spellings (c++, postgres /
+# postgresql). No corpus statistics are used, so a text always maps to the
+# same vector and stored embeddings never go stale.
+#
+# Hashing is vectorized with numpy: character n-grams are rolling polynomial
+# hashes over the UTF-8 bytes, words are CRC32s combined into bigrams.
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "4096"))
+LOCAL_EMBEDDING_CHAR_WEIGHT = float(os.getenv("LOCAL_EMBEDDING_CHAR_WEIGHT", "0.5"))
+LOCAL_EMBEDDING_MODEL = f"local-hashing-{LOCAL_EMBEDDING_DIM}"
+
+CHAR_NGRAM_SIZES = (3, 4, 5)
+_PRIME = np.uint64(1099511628211)
+_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_SALT_WORD, _SALT_BIGRAM, _SALT_CHAR = np.uint64(0x9E3779B97F4A7C15), np.uint64(0x632BE59BD9B4E019), np.uint64(0x85EBCA77C2B2AE63)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """Finalize 64-bit hashes so every bit depends on every input bit (murmur3 fmix64)"""
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * _MIX_1
+    hashes = hashes ^ (hashes >> np.uint64(33))
+    hashes = hashes * _MIX_2
+    return hashes ^ (hashes >> np.uint64(33))
+
+def _word_hashes(text: str) -> np.ndarray:
+    tokens = tokenize(text)
+    if not tokens:
+        return np.zeros(0, dtype=np.uint64)
+    words = np.fromiter((zlib.crc32(token.encode("utf-8")) for token in tokens), dtype=np.uint64, count=len(tokens))
+    bigrams = words[:-1] * _PRIME + words[1:] + _SALT_BIGRAM
+    return np.concatenate((words + _SALT_WORD, bigrams))
+
+def _char_hashes(text: str) -> np.ndarray:
+    # Lowercased, whitespace collapsed and padded so n-grams see word boundaries
+    data = np.frombuffer(f" {_WHITESPACE_RE.sub(' ', text.lower()).strip()} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    parts = []
+    for n in CHAR_NGRAM_SIZES:
+        if len(data) < n:
+            continue
+        hashes = np.full(len(data) - n + 1, np.uint64(n), dtype=np.uint64) + _SALT_CHAR
+        for offset in range(n):
+            hashes = hashes * _PRIME + data[offset:len(data) - n + 1 + offset]
+        parts.append(hashes)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint64)
+
+def _hashed_block(hashes: np.ndarray, dim: int) -> np.ndarray:
+    """Sublinear-TF, signed, L2-normalized bucket vector for a bag of feature hashes"""
+    vector = np.zeros(dim, dtype=np.float32)
+    if len(hashes) == 0:
+        return vector
+    features, counts = np.unique(_mix(hashes), return_counts=True)
+    weights = 1 + np.log(counts)
+    signs = np.where(features & np.uint64(1), 1.0, -1.0)
+    buckets = ((features >> np.uint64(1)) % np.uint64(dim)).astype(np.int64)
+    vector += np.bincount(buckets, weights=signs * weights, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def embed_text_locally(text: str, dim: int = LOCAL_EMBEDDING_DIM) -> np.ndarray:
+    """
+    Embed one text with the offline hashing embedder
+
+    Args:
+        text: The text to embed
+        dim: Embedding dimension
+
+    Returns:
+        L2-normalized float32 vector (all zeros for text without any features)
+    """
+    vector = _hashed_block(_word_hashes(text), dim) + LOCAL_EMBEDDING_CHAR_WEIGHT * _hashed_block(_char_hashes(text), dim)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+def embed_texts_locally(texts: Sequence[str], dim: int = LOCAL_EMBEDDING_DIM) -> np.ndarray:
+    """
+    Embed several texts with the offline hashing embedder
+
+    Args:
+        texts: The texts to embed
+        dim: Embedding dimension
+
+    Returns:
+        (len(texts), dim) float32 matrix with L2-normalized rows
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        matrix[row] = embed_text_locally(text, dim)
+    return matrix
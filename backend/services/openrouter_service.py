@@ -547,4 +547,4 @@ def generate_mock_score() -> Dict[str, Any]:
     """
     Generates a mock score and reason.
     """
-    return {"score": random.randint(50, 99), "reason": "Mock score: LLM API not available or failed."}
+    return {"score": random.randint(50, 99), "reason": "Mock score: LLM API not available or failed.", "source": "mock_score"}
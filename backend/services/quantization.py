@@ -0,0 +1,162 @@
+import os
+from typing import Dict, Optional
+
+import numpy as np
+
+# Compressed embedding codes for the ANN index (see ann_index). Vectors are
+# scored against the codes with asymmetric distance computation (ADC): the
+# query stays in float32 and only the database side is quantized, so scoring
+# needs no decoding of the codes. The best candidates are then re-ranked
+# exactly against the float32 matrix.
+#
+#   int8: one signed byte per dimension with a per-dimension scale (4x smaller
+#         than float32); the ADC is a mat-vec of the codes with the scaled query
+#   pq:   product quantization, the vector split into PQ_SUBVECTORS blocks,
+#         each encoded as the nearest of 256 centroids in one byte (4096 dims
+#         in 64 bytes); the ADC sums one lookup-table entry per block
+PQ_SUBVECTORS = int(os.getenv("PQ_SUBVECTORS", "64"))
+PQ_TRAIN_ITERATIONS = int(os.getenv("PQ_TRAIN_ITERATIONS", "8"))
+PQ_CENTROIDS = 256
+
+class ScalarQuantizer:
+    """int8 scalar quantization with a symmetric per-dimension scale"""
+
+    kind = "int8"
+
+    def __init__(self, scale: Optional[np.ndarray] = None):
+        self.scale = scale
+
+    @property
+    def code_size(self) -> int:
+        """Bytes per encoded vector"""
+        return 0 if self.scale is None else len(self.scale)
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit the per-dimension scale to the range of the training rows"""
+        self.scale = np.maximum(np.abs(np.asarray(vectors, dtype=np.float32)).max(axis=0), 1e-8) / 127
+
+    def encode(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        codes = np.empty((len(vectors), len(self.scale)), dtype=np.int8)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = np.asarray(vectors[start:start + chunk_size], dtype=np.float32)
+            codes[start:start + len(chunk)] = np.clip(np.rint(chunk / self.scale), -127, 127)
+        return codes
+
+    def lookup(self, query: np.ndarray) -> np.ndarray:
+        """Query-side table: the query folded with the scale, so scores are codes @ table"""
+        return (np.asarray(query, dtype=np.float32) * self.scale).astype(np.float32)
+
+    def scores(self, table: np.ndarray, codes: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        """Approximate inner products of the query with the encoded vectors"""
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), chunk_size):
+            scores[start:start + chunk_size] = codes[start:start + chunk_size].astype(np.float32) @ table
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"scale": self.scale}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ScalarQuantizer":
+        return cls(state["scale"].astype(np.float32))
+
+def _kmeans(vectors: np.ndarray, k: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means (Lloyd) for one PQ subspace"""
+    centroids = vectors[rng.choice(len(vectors), k, replace=len(vectors) < k)].copy()
+    for _ in range(iterations):
+        # ||x - c||^2 up to the constant ||x||^2
+        distances = (centroids ** 2).sum(axis=1) - 2 * vectors @ centroids.T
+        assignment = np.argmin(distances, axis=1)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty))]
+    return centroids
+
+class ProductQuantizer:
+    """Product quantization with 256 centroids (one byte) per subvector"""
+
+    kind = "pq"
+
+    def __init__(self, subvectors: int = PQ_SUBVECTORS, codebooks: Optional[np.ndarray] = None):
+        self.subvectors = subvectors
+        self.codebooks = codebooks  # (subvectors, 256, sub_dim)
+
+    @property
+    def code_size(self) -> int:
+        """Bytes per encoded vector"""
+        return self.subvectors
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        """(n, dim) -> (n, subvectors, sub_dim)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return vectors.reshape(len(vectors), self.subvectors, -1)
+
+    def train(self, vectors: np.ndarray, iterations: int = PQ_TRAIN_ITERATIONS, seed: int = 0) -> None:
+        """Fit one 256-centroid codebook per subvector block"""
+        dim = np.asarray(vectors).shape[1]
+        # Use the largest block count <= PQ_SUBVECTORS that divides the dimension
+        self.subvectors = max(s for s in range(1, min(self.subvectors, dim) + 1) if dim % s == 0)
+        rng = np.random.default_rng(seed)
+        blocks = self._split(vectors)
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(blocks[:, s]), PQ_CENTROIDS, iterations, rng)
+            for s in range(self.subvectors)
+        ])
+
+    def encode(self, vectors: np.ndarray, chunk_size: int = 4096) -> np.ndarray:
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        norms = (self.codebooks ** 2).sum(axis=2)  # (subvectors, 256)
+        for start in range(0, len(vectors), chunk_size):
+            blocks = self._split(vectors[start:start + chunk_size])
+            for s in range(self.subvectors):
+                distances = norms[s] - 2 * blocks[:, s] @ self.codebooks[s].T
+                codes[start:start + len(blocks), s] = np.argmin(distances, axis=1)
+        return codes
+
+    def lookup(self, query: np.ndarray) -> np.ndarray:
+        """(subvectors, 256) table of the query block's inner product with each centroid"""
+        blocks = np.asarray(query, dtype=np.float32).reshape(self.subvectors, -1)
+        return np.einsum("sd,scd->sc", blocks, self.codebooks).astype(np.float32)
+
+    def scores(self, table: np.ndarray, codes: np.ndarray, chunk_size: int = 16384) -> np.ndarray:
+        """Approximate inner products: one table lookup per subvector, summed"""
+        scores = np.empty(len(codes), dtype=np.float32)
+        # Flattened table so each (row, block) code is a single gather
+        flat = table.ravel()
+        offsets = np.arange(self.subvectors, dtype=np.int64) * PQ_CENTROIDS
+        for start in range(0, len(codes), chunk_size):
+            chunk = codes[start:start + chunk_size]
+            scores[start:start + len(chunk)] = flat[chunk + offsets].sum(axis=1)
+        return scores
+
+    def state(self) -> Dict[str, np.ndarray]:
+        return {"codebooks": self.codebooks}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, np.ndarray]) -> "ProductQuantizer":
+        codebooks = state["codebooks"].astype(np.float32)
+        return cls(len(codebooks), codebooks)
+
+QUANTIZERS = {"int8": ScalarQuantizer, "pq": ProductQuantizer}
+
+def make_quantizer(kind: str):
+    """
+    New untrained quantizer
+
+    Args:
+        kind: "int8" or "pq"
+
+    Returns:
+        ScalarQuantizer or ProductQuantizer, or None for "none"/unknown kinds
+    """
+    if kind in ("", "none"):
+        return None
+    if kind not in QUANTIZERS:
+        print(f"Warning: Unknown embedding quantization {kind!r}, storing full vectors")
+        return None
+    return QUANTIZERS[kind]()
@@ -0,0 +1,380 @@
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .database_service import DB_PATH
+from .storage_service import LOCAL_STORAGE_DIR
+from .keyword_index import resume_experience_years
+
+# Resume metadata lives in the SQLite resumes table (storage/resumes.db), the
+# single source of truth shared with database_service. The database runs in
+# WAL mode, so every uvicorn worker can read while one of them writes.
+#
+# Each put/delete also records a row in resume_changes in the same
+# transaction. A worker notices other workers' commits through
+# PRAGMA data_version (no query at all when nothing changed) and applies the
+# change rows after the last sequence number it has seen, so its in-memory
+# records and search indexes stay current without reloading. The sequence
+# number is the store's generation, equal in every worker that is caught up.
+#
+# On first start, the records of the old storage/resumes.json snapshot and
+# storage/resumes.log change log are migrated into the table. Rows written by
+# database_service before it went through the store hold storage_service
+# paths (relative to LOCAL_STORAGE_DIR) and no filename; those are resolved
+# to paths like the upload flow's.
+LEGACY_SNAPSHOT_PATH = Path("./storage/resumes.json")
+LEGACY_LOG_PATH = Path("./storage/resumes.log")
+
+RESUME_CHANGES_KEEP = int(os.getenv("RESUME_CHANGES_KEEP", "10000"))
+
+RESUME_COLUMNS = (
+    "id", "filename", "file_path", "download_url", "created_at", "status", "match_score",
+    "summary", "skills", "experience", "experience_text", "education_level", "category", "content_hash"
+)
+_SELECT_COLUMNS = ", ".join(RESUME_COLUMNS)
+_UPSERT_SQL = (
+    f"INSERT INTO resumes ({_SELECT_COLUMNS}) VALUES ({', '.join('?' for _ in RESUME_COLUMNS)}) "
+    "ON CONFLICT(id) DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in RESUME_COLUMNS[1:])
+)
+
+# A change applied to the store: ("put", id, record) or ("del", id, None)
+Change = Tuple[str, str, Optional[Dict[str, Any]]]
+
+def record_to_row(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    """Column values for a resume record"""
+    return (
+        record["id"],
+        record.get("filename"),
+        record.get("file_path") or "",
+        record.get("download_url") or "",
+        record.get("upload_date") or datetime.now().isoformat(),
+        record.get("status"),
+        record.get("match_score"),
+        record.get("summary", ""),
+        json.dumps(record.get("skills") or []),
+        resume_experience_years(record),  # whole years, for indexed filtering
+        str(record.get("experience", "")),  # as entered, e.g. "5+"
+        record.get("educationLevel", ""),
+        record.get("category", ""),
+        record.get("content_hash"),
+    )
+
+def row_to_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """Resume record (as returned by the API) for a resumes table row"""
+    record = {
+        "id": row["id"],
+        "filename": row["filename"] or Path(row["file_path"] or "").name,
+        "download_url": row["download_url"],
+        "upload_date": row["created_at"],
+        "status": row["status"] or "processed",
+        "match_score": row["match_score"] or 0,
+        "summary": row["summary"] or "",
+        "skills": json.loads(row["skills"]) if row["skills"] else [],
+        "experience": row["experience_text"] if row["experience_text"] is not None else str(row["experience"] or ""),
+        "educationLevel": row["education_level"] or "",
+        "category": row["category"] or "",
+    }
+    if row["file_path"]:
+        record["file_path"] = row["file_path"]
+    if row["content_hash"]:
+        record["content_hash"] = row["content_hash"]
+    return record
+
+def record_change(conn: sqlite3.Connection, op: str, resume_id: str) -> int:
+    """
+    Record a put or delete of a resume in resume_changes, inside the caller's
+    transaction, so every worker's store picks it up
+
+    Returns:
+        Sequence number of the change
+    """
+    seq = conn.execute("INSERT INTO resume_changes (op, resume_id) VALUES (?, ?)", (op, resume_id)).lastrowid
+    if seq % 1000 == 0:
+        conn.execute("DELETE FROM resume_changes WHERE seq <= ?", (seq - RESUME_CHANGES_KEEP,))
+    return seq
+
+def write_resume(conn: sqlite3.Connection, record: Dict[str, Any]) -> int:
+    """
+    Add or replace a resume row and record the change, inside the caller's transaction
+    (for writers that don't go through a ResumeStore, like database_service)
+
+    Returns:
+        Sequence number of the change
+    """
+    conn.execute(_UPSERT_SQL, record_to_row(record))
+    return record_change(conn, "put", record["id"])
+
+def read_legacy_records() -> List[Dict[str, Any]]:
+    """Records of the old JSON snapshot with its change logs replayed on top"""
+    records: Dict[str, Dict[str, Any]] = {}
+    if LEGACY_SNAPSHOT_PATH.exists():
+        try:
+            with open(LEGACY_SNAPSHOT_PATH, "r") as f:
+                for record in json.load(f):
+                    records[record["id"]] = record
+        except Exception as e:
+            print(f"Error reading {LEGACY_SNAPSHOT_PATH}: {str(e)}")
+    for log_path in (LEGACY_LOG_PATH.with_name(LEGACY_LOG_PATH.name + ".old"), LEGACY_LOG_PATH):
+        if not log_path.exists():
+            continue
+        with open(log_path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # torn or corrupt entry
+                if entry.get("op") == "put":
+                    records[entry["record"]["id"]] = entry["record"]
+                elif entry.get("op") == "del":
+                    records.pop(entry["id"], None)
+    return list(records.values())
+
+class ResumeStore:
+    """
+    Resume metadata records in the SQLite resumes table, cached in memory
+
+    refresh, put and delete run SQL (and may wait up to busy_timeout for
+    another worker's write lock), so async code calls them in a thread. The
+    in-memory reads (page, records, get) never wait for SQLite.
+    """
+
+    def __init__(self, db_path: Path = DB_PATH):
+        self._io_lock = threading.RLock()  # the connection, held across SQL calls
+        self._lock = threading.RLock()  # the in-memory records, only held briefly
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # WAL commits are fsynced at checkpoints
+        self._conn.execute("PRAGMA busy_timeout=5000")
+
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0  # last resume_changes row applied
+        self._data_version = None
+        self._view: Optional[List[Dict[str, Any]]] = None  # cached list view, rebuilt after changes
+        self._positions: Dict[str, int] = {}
+
+        self._migrate_legacy_files()
+        self._migrate_storage_paths()
+        self.load()
+
+    def _migrate_legacy_files(self) -> None:
+        """Copy the records of storage/resumes.json and its log into the table, once"""
+        with self._io_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM store_meta WHERE key = 'legacy_json_migrated'").fetchone():
+                    self._conn.execute("COMMIT")
+                    return
+                records = read_legacy_records()
+                for record in records:
+                    self._conn.execute(
+                        f"INSERT OR IGNORE INTO resumes ({_SELECT_COLUMNS}) VALUES ({', '.join('?' for _ in RESUME_COLUMNS)})",
+                        record_to_row(record)
+                    )
+                self._conn.execute(
+                    "INSERT INTO store_meta (key, value) VALUES ('legacy_json_migrated', ?)",
+                    (datetime.now().isoformat(),)
+                )
+                self._conn.execute("COMMIT")
+                if records:
+                    print(f"Migrated {len(records)} resumes from {LEGACY_SNAPSHOT_PATH} into the resumes table")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _migrate_storage_paths(self) -> None:
+        """Give rows without a filename (storage_service-relative file_path) a local path and filename"""
+        with self._io_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute("SELECT id, file_path FROM resumes WHERE filename IS NULL").fetchall()
+                for row in rows:
+                    file_path = row["file_path"] or ""
+                    self._conn.execute(
+                        "UPDATE resumes SET file_path = ?, filename = ? WHERE id = ?",
+                        (str(LOCAL_STORAGE_DIR / file_path) if file_path else "", Path(file_path).name, row["id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            if rows:
+                print(f"Resolved storage paths of {len(rows)} resumes against {LOCAL_STORAGE_DIR}")
+
+    @property
+    def generation(self) -> str:
+        """Last applied change number; equal across caught-up workers"""
+        return str(self._seq)
+
+    def load(self) -> List[Dict[str, Any]]:
+        """
+        (Re)load every record from the resumes table
+
+        Returns:
+            The records, in upload order
+        """
+        with self._io_lock:
+            self._conn.execute("BEGIN")
+            try:
+                records = self._load_rows()
+            finally:
+                self._conn.execute("COMMIT")
+            self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            return list(records.values())
+
+    def _load_rows(self) -> Dict[str, Dict[str, Any]]:
+        """Replace the records with the table's rows, inside the caller's transaction"""
+        rows = self._conn.execute(f"SELECT {_SELECT_COLUMNS} FROM resumes ORDER BY created_at, rowid").fetchall()
+        self._seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) FROM resume_changes").fetchone()[0]
+        records = {row["id"]: row_to_record(row) for row in rows}
+        with self._lock:
+            self._records = records
+            self._view = None
+        return records
+
+    def _catch_up(self) -> List[Change]:
+        """Apply change rows committed by other workers since our last seen seq, inside the caller's transaction"""
+        oldest = self._conn.execute("SELECT MIN(seq) FROM resume_changes").fetchone()[0]
+        if oldest is not None and oldest > self._seq + 1:
+            # The change rows we would need were pruned: reload and diff
+            previous = self._records
+            self._load_rows()
+            changes: List[Change] = [("put", resume_id, record) for resume_id, record in self._records.items()]
+            changes += [("del", resume_id, None) for resume_id in previous if resume_id not in self._records]
+            return changes
+
+        # Read everything first, the records are only locked while applying
+        pending: List[Change] = []
+        for seq, op, resume_id in self._conn.execute(
+            "SELECT seq, op, resume_id FROM resume_changes WHERE seq > ? ORDER BY seq", (self._seq,)
+        ).fetchall():
+            self._seq = seq
+            if op == "put":
+                row = self._conn.execute(f"SELECT {_SELECT_COLUMNS} FROM resumes WHERE id = ?", (resume_id,)).fetchone()
+                if row is None:
+                    continue  # deleted again by a later change
+                pending.append(("put", resume_id, row_to_record(row)))
+            else:
+                pending.append(("del", resume_id, None))
+
+        changes = []
+        with self._lock:
+            for op, resume_id, record in pending:
+                if op == "put":
+                    self._records[resume_id] = record
+                    changes.append((op, resume_id, record))
+                elif self._records.pop(resume_id, None) is not None:
+                    changes.append((op, resume_id, None))
+            if changes:
+                self._view = None
+        return changes
+
+    def refresh(self) -> List[Change]:
+        """
+        Pick up changes other workers committed since the last call
+        (a single PRAGMA when there are none)
+
+        Returns:
+            The changes applied, in commit order
+        """
+        with self._io_lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return []
+            self._data_version = data_version
+            self._conn.execute("BEGIN")
+            try:
+                return self._catch_up()
+            finally:
+                self._conn.execute("COMMIT")
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        A page of records in upload order, served from the cached view
+
+        Args:
+            limit: Maximum number of records (all remaining when None)
+            cursor: Id of the last record of the previous page
+
+        Returns:
+            (records, cursor for the next page or None on the last page)
+
+        Raises:
+            KeyError: If the cursor record no longer exists
+        """
+        with self._lock:
+            if self._view is None:
+                self._view = list(self._records.values())
+                self._positions = {record["id"]: position for position, record in enumerate(self._view)}
+            start = 0
+            if cursor is not None:
+                if cursor not in self._positions:
+                    raise KeyError(cursor)
+                start = self._positions[cursor] + 1
+            if limit is None:
+                return self._view[start:], None
+            records = self._view[start:start + max(0, limit)]
+            has_more = records and start + len(records) < len(self._view)
+            return records, records[-1]["id"] if has_more else None
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Current records, in upload order"""
+        with self._lock:
+            return list(self._records.values())
+
+    def get(self, resume_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._records.get(resume_id)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def _write(self, op: str, resume_id: str, statement: str, params: Tuple[Any, ...]) -> List[Change]:
+        """Run one resume write and its change row in a transaction, after applying pending changes"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            changes = self._catch_up()
+            self._conn.execute(statement, params)
+            seq = record_change(self._conn, op, resume_id)
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._seq = seq
+        return changes
+
+    def put(self, record: Dict[str, Any]) -> List[Change]:
+        """
+        Add or replace a record
+
+        Returns:
+            Changes from other workers that were applied before this one
+        """
+        with self._io_lock:
+            changes = self._write("put", record["id"], _UPSERT_SQL, record_to_row(record))
+            with self._lock:
+                self._records[record["id"]] = record
+                self._view = None
+            return changes
+
+    def delete(self, resume_id: str) -> List[Change]:
+        """
+        Remove a record
+
+        Returns:
+            Changes from other workers that were applied before this one
+        """
+        with self._io_lock:
+            changes = self._write("del", resume_id, "DELETE FROM resumes WHERE id = ?", (resume_id,))
+            with self._lock:
+                self._records.pop(resume_id, None)
+                self._view = None
+            return changes
+
+    def close(self) -> None:
+        with self._io_lock:
+            self._conn.close()
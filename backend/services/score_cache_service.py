@@ -0,0 +1,180 @@
+import os
+import re
+import asyncio
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# LLM relevance scores are cached by (normalized query, resume content hash, model)
+# so repeated searches cost no tokens. An in-process LRU sits in front of SQLite.
+SCORE_CACHE_DB_PATH = Path("./storage/score_cache.db")
+SCORE_CACHE_DB_PATH.parent.mkdir(exist_ok=True)
+
+SCORE_CACHE_TTL = float(os.getenv("SCORE_CACHE_TTL", str(7 * 24 * 3600)))  # seconds
+SCORE_CACHE_MEMORY_SIZE = int(os.getenv("SCORE_CACHE_MEMORY_SIZE", "4096"))
+
+_memory_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+
+def _connect() -> sqlite3.Connection:
+    conn = sqlite3.connect(str(SCORE_CACHE_DB_PATH), check_same_thread=False)
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS score_cache (
+        key TEXT PRIMARY KEY,
+        score INTEGER NOT NULL,
+        reason TEXT,
+        model TEXT,
+        created_at REAL NOT NULL
+    )
+    ''')
+    conn.commit()
+    return conn
+
+_conn = _connect()
+
+def normalize_query(query: str) -> str:
+    """Lowercase the query and collapse punctuation and whitespace"""
+    return " ".join(re.findall(r"\w+", query.lower()))
+
+def make_score_key(query: str, content_hash: str, model: str) -> str:
+    """
+    Build the cache key for a relevance score
+
+    Args:
+        query: Job query as entered by the user
+        content_hash: SHA-256 of the resume file
+        model: LLM model name used for scoring
+
+    Returns:
+        Hex digest identifying the (query, resume, model) triple
+    """
+    raw = "\x1f".join([normalize_query(query), content_hash, model])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _remember(key: str, created_at: float, result: Dict[str, Any]) -> None:
+    _memory_cache[key] = (created_at, result)
+    _memory_cache.move_to_end(key)
+    while len(_memory_cache) > SCORE_CACHE_MEMORY_SIZE:
+        _memory_cache.popitem(last=False)
+
+def get_cached_scores(keys: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Look up cached scores, memory first and then SQLite
+
+    Blocking; async callers run it in a thread (see ScoreCacheBatch).
+
+    Args:
+        keys: Keys from make_score_key
+
+    Returns:
+        Dict of key -> dict with 'score' and 'reason', for the keys found and not expired
+    """
+    now = time.time()
+    found: Dict[str, Dict[str, Any]] = {}
+    with _lock:
+        missing = []
+        for key in dict.fromkeys(keys):
+            entry = _memory_cache.get(key)
+            if entry:
+                created_at, result = entry
+                if now - created_at <= SCORE_CACHE_TTL:
+                    _memory_cache.move_to_end(key)
+                    found[key] = dict(result)
+                    continue
+                del _memory_cache[key]
+            missing.append(key)
+
+        for start in range(0, len(missing), 500):
+            batch = missing[start:start + 500]
+            try:
+                rows = _conn.execute(
+                    f"SELECT key, score, reason, created_at FROM score_cache WHERE key IN ({', '.join('?' for _ in batch)})",
+                    batch
+                ).fetchall()
+            except Exception as e:
+                print(f"Error reading score cache: {str(e)}")
+                break
+            for key, score, reason, created_at in rows:
+                if now - created_at > SCORE_CACHE_TTL:
+                    continue
+                result = {"score": score, "reason": reason}
+                _remember(key, created_at, result)
+                found[key] = dict(result)
+    return found
+
+def get_cached_score(key: str) -> Optional[Dict[str, Any]]:
+    """
+    Look up a cached score, memory first and then SQLite
+
+    Args:
+        key: Key from make_score_key
+
+    Returns:
+        Dict with 'score' and 'reason', or None on a miss or expired entry
+    """
+    return get_cached_scores([key]).get(key)
+
+def _cache_entry(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {"score": result["score"], "reason": result.get("reason", "")}
+
+def put_cached_scores(results: Dict[str, Dict[str, Any]], model: str) -> None:
+    """Store many score results in both cache levels with one SQLite commit"""
+    if not results:
+        return
+    now = time.time()
+    cached = {key: _cache_entry(result) for key, result in results.items()}
+    with _lock:
+        for key, entry in cached.items():
+            _remember(key, now, entry)
+        try:
+            _conn.executemany(
+                "INSERT OR REPLACE INTO score_cache (key, score, reason, model, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, entry["score"], entry["reason"], model, now) for key, entry in cached.items()]
+            )
+            _conn.commit()
+        except Exception as e:
+            print(f"Error writing score cache: {str(e)}")
+
+def put_cached_score(key: str, result: Dict[str, Any], model: str) -> None:
+    """Store a score result in both cache levels"""
+    put_cached_scores({key: result}, model)
+
+class ScoreCacheBatch:
+    """
+    Score cache access for one search: every lookup is read with one query up
+    front (prefetch) and new scores are written with one commit at the end
+    (flush), both in a worker thread, so the scoring fan-out never touches
+    SQLite on the event loop. New scores go to the in-memory LRU right away.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._cached: Dict[str, Dict[str, Any]] = {}
+        self._new: Dict[str, Dict[str, Any]] = {}
+
+    async def prefetch(self, keys: Iterable[str]) -> None:
+        """Load the cached scores of keys"""
+        keys = [key for key in keys if key not in self._cached]
+        if keys:
+            self._cached.update(await asyncio.to_thread(get_cached_scores, keys))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """A prefetched (or already put) score, or None"""
+        result = self._cached.get(key)
+        return dict(result) if result is not None else None
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Remember a score in memory (for every search) and queue it for the next flush"""
+        entry = self._cached[key] = self._new[key] = _cache_entry(result)
+        with _lock:
+            _remember(key, time.time(), entry)
+
+    async def flush(self) -> None:
+        """Write the queued scores"""
+        new, self._new = self._new, {}
+        if new:
+            await asyncio.to_thread(put_cached_scores, new, self.model)
@@ -0,0 +1,113 @@
+import os
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Concurrency settings for LLM relevance scoring
+SEARCH_MAX_CONCURRENCY = int(os.getenv("SEARCH_MAX_CONCURRENCY", "8"))
+SEARCH_SCORE_TIMEOUT = float(os.getenv("SEARCH_SCORE_TIMEOUT", "45"))
+
+ScoreFn = Callable[[Any], Awaitable[Dict[str, Any]]]
+FallbackFn = Callable[[Any, Exception], Dict[str, Any]]
+
+class ScoringDeadlineExceeded(Exception):
+    """Passed to the fallback for items not scored before the search deadline"""
+
+def _bounded_scorer(
+    score_fn: ScoreFn,
+    fallback_fn: FallbackFn,
+    max_concurrency: Optional[int],
+    timeout: Optional[float],
+    deadline: Optional[float] = None
+) -> Callable[[Any], Awaitable[Dict[str, Any]]]:
+    """
+    Wrap score_fn with a shared concurrency limit, a per-call timeout and the fallback.
+    With a deadline (event loop time), no call is started after it and calls still
+    running at the deadline are cancelled.
+    """
+    limit = max(1, max_concurrency or SEARCH_MAX_CONCURRENCY)
+    per_call_timeout = timeout if timeout is not None else SEARCH_SCORE_TIMEOUT
+    semaphore = asyncio.Semaphore(limit)
+    loop = asyncio.get_running_loop()
+
+    async def run_one(item: Any) -> Dict[str, Any]:
+        async with semaphore:
+            call_timeout = per_call_timeout
+            if deadline is not None:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return fallback_fn(item, ScoringDeadlineExceeded())
+                call_timeout = min(call_timeout, remaining)
+            try:
+                return await asyncio.wait_for(score_fn(item), timeout=call_timeout)
+            except asyncio.TimeoutError as e:
+                if deadline is not None and loop.time() >= deadline:
+                    return fallback_fn(item, ScoringDeadlineExceeded())
+                return fallback_fn(item, e)
+            except Exception as e:
+                return fallback_fn(item, e)
+
+    return run_one
+
+async def score_concurrently(
+    items: Sequence[Any],
+    score_fn: ScoreFn,
+    fallback_fn: FallbackFn,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None
+) -> List[Dict[str, Any]]:
+    """
+    Score items concurrently with a bounded number of calls in flight
+
+    Args:
+        items: Items to score (e.g. resume records)
+        score_fn: Coroutine function returning a score result for one item
+        fallback_fn: Called with (item, exception) when scoring fails or times out
+        max_concurrency: Maximum number of calls in flight (default SEARCH_MAX_CONCURRENCY)
+        timeout: Per-call timeout in seconds (default SEARCH_SCORE_TIMEOUT)
+        deadline: Optional event loop time after which remaining items get the fallback
+
+    Returns:
+        List of score results in the same order as items
+    """
+    run_one = _bounded_scorer(score_fn, fallback_fn, max_concurrency, timeout, deadline)
+
+    # gather preserves input order regardless of completion order
+    return await asyncio.gather(*(run_one(item) for item in items))
+
+async def score_as_completed(
+    items: Sequence[Any],
+    score_fn: ScoreFn,
+    fallback_fn: FallbackFn,
+    max_concurrency: Optional[int] = None,
+    timeout: Optional[float] = None,
+    deadline: Optional[float] = None
+) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Score items concurrently and yield each result as soon as it is ready
+
+    Args:
+        items: Items to score (e.g. resume records)
+        score_fn: Coroutine function returning a score result for one item
+        fallback_fn: Called with (item, exception) when scoring fails or times out
+        max_concurrency: Maximum number of calls in flight (default SEARCH_MAX_CONCURRENCY)
+        timeout: Per-call timeout in seconds (default SEARCH_SCORE_TIMEOUT)
+        deadline: Optional event loop time after which remaining items get the fallback
+
+    Yields:
+        (index into items, score result) in completion order
+    """
+    run_one = _bounded_scorer(score_fn, fallback_fn, max_concurrency, timeout, deadline)
+
+    async def run_indexed(index: int, item: Any) -> Tuple[int, Dict[str, Any]]:
+        return index, await run_one(item)
+
+    tasks = [asyncio.ensure_future(run_indexed(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # The consumer may stop early (e.g. client disconnected), don't leave calls running
+        for task in tasks:
+            if not task.done():
+                task.cancel()
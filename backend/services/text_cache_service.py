@@ -0,0 +1,118 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+# Extracted resume text is cached on disk by file content hash, so a stored
+# resume is parsed once and never again on search.
+TEXT_CACHE_DIR = Path("./storage/text_cache")
+TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+# Bump when extraction or cleaning changes so stale entries are ignored
+EXTRACTOR_VERSION = "1"
+
+TEXT_CACHE_MEMORY_SIZE = int(os.getenv("TEXT_CACHE_MEMORY_SIZE", "256"))
+
+_memory_cache: "OrderedDict[str, str]" = OrderedDict()
+_lock = threading.Lock()  # extraction runs in worker threads
+
+def sha256_bytes(data: bytes) -> str:
+    """Return the hex SHA-256 of raw file contents"""
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hash a file on disk in chunks
+
+    Args:
+        file_path: Path to the file
+
+    Returns:
+        Hex SHA-256 digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _cache_path(content_hash: str) -> Path:
+    return TEXT_CACHE_DIR / f"{content_hash}.v{EXTRACTOR_VERSION}.txt"
+
+def _remember(content_hash: str, text: str) -> None:
+    with _lock:
+        _memory_cache[content_hash] = text
+        _memory_cache.move_to_end(content_hash)
+        while len(_memory_cache) > TEXT_CACHE_MEMORY_SIZE:
+            _memory_cache.popitem(last=False)
+
+def get_cached_text(content_hash: str) -> Optional[str]:
+    """
+    Look up extracted text, memory first and then disk
+
+    Args:
+        content_hash: SHA-256 of the resume file
+
+    Returns:
+        Cached text, or None on a miss
+    """
+    with _lock:
+        if content_hash in _memory_cache:
+            _memory_cache.move_to_end(content_hash)
+            return _memory_cache[content_hash]
+
+    path = _cache_path(content_hash)
+    if not path.exists():
+        return None
+    try:
+        text = path.read_text(encoding="utf-8")
+    except Exception as e:
+        print(f"Error reading text cache entry {path.name}: {str(e)}")
+        return None
+    _remember(content_hash, text)
+    return text
+
+def put_cached_text(content_hash: str, text: str) -> None:
+    """Store extracted text in memory and on disk"""
+    _remember(content_hash, text)
+    path = _cache_path(content_hash)
+    tmp_path = path.with_suffix(".tmp")
+    try:
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)  # readers never see a partial file
+    except Exception as e:
+        print(f"Error writing text cache entry {path.name}: {str(e)}")
+
+def invalidate_cached_text(content_hash: str) -> None:
+    """Drop a cache entry from memory and disk"""
+    with _lock:
+        _memory_cache.pop(content_hash, None)
+    try:
+        _cache_path(content_hash).unlink(missing_ok=True)
+    except Exception as e:
+        print(f"Error removing text cache entry for {content_hash}: {str(e)}")
+
+def get_or_extract_text(
+    file_path: str,
+    extract_fn: Callable[[str], str],
+    content_hash: Optional[str] = None
+) -> str:
+    """
+    Return cached text for a file, extracting and caching it on a miss
+
+    Args:
+        file_path: Path to the resume file
+        extract_fn: Function that extracts text from file_path
+        content_hash: Known SHA-256 of the file (computed if missing)
+
+    Returns:
+        Extracted resume text
+    """
+    content_hash = content_hash or file_sha256(file_path)
+    text = get_cached_text(content_hash)
+    if text is None:
+        text = extract_fn(file_path)
+        put_cached_text(content_hash, text or "")
+    return text
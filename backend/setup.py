@@ -17,6 +17,7 @@ setup(
         "httpx==0.23.3",
         "supabase==1.0.3",
         "numpy==1.24.3",
+        "scipy==1.10.1",
         "scikit-learn==1.2.2",
         "transformers==4.29.2",
         "sentence-transformers==2.2.2",
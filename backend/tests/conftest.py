@@ -0,0 +1,39 @@
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+import pytest
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# The services keep their databases under ./storage and open them on import,
+# so the whole session runs in a scratch directory. It starts with a copy of
+# the tracked resumes.db and the files of its rows, like a checkout that has
+# not started the app since the resumes table got the upload flow's columns.
+WORKSPACE = Path(tempfile.mkdtemp(prefix="resumatch-tests-"))
+(WORKSPACE / "storage" / "resumes").mkdir(parents=True)
+shutil.copy2(BACKEND_DIR / "storage" / "resumes.db", WORKSPACE / "storage" / "resumes.db")
+with sqlite3.connect(str(WORKSPACE / "storage" / "resumes.db")) as _conn:
+    LEGACY_ROWS = {row[0]: row[1] for row in _conn.execute("SELECT id, file_path FROM resumes")}
+for _file_path in LEGACY_ROWS.values():
+    shutil.copy2(BACKEND_DIR / "storage" / _file_path, WORKSPACE / "storage" / _file_path)
+os.chdir(WORKSPACE)
+
+# No network: the OpenRouter modules need a key at import, embeddings are computed locally
+os.environ.setdefault("OPENROUTER_API_KEY", "sk-test-key-0000000000")
+os.environ["EMBEDDING_BACKEND"] = "local"
+
+@pytest.fixture(scope="session")
+def app_module():
+    """The FastAPI app module, imported once inside the workspace"""
+    import main
+    return main
+
+@pytest.fixture
+def client(app_module):
+    from fastapi.testclient import TestClient
+    return TestClient(app_module.app)
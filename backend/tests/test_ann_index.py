@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from services import ann_index
+from services.ann_index import IVFIndex
+from services.embedding_matrix import EmbeddingMatrix
+from services.embedding_service import top_k_indices
+
+K = 10
+
+@pytest.fixture(scope="module")
+def gaussian_corpus(tmp_path_factory):
+    """Isotropic Gaussian vectors: no cluster structure, the hard case for IVF lists"""
+    rng = np.random.default_rng(0)
+    matrix = EmbeddingMatrix(tmp_path_factory.mktemp("matrix"))
+    matrix.add_many((f"r{i}", vector) for i, vector in enumerate(rng.normal(size=(4000, 256)).astype(np.float32)))
+    queries = rng.normal(size=(40, 256)).astype(np.float32)
+    yield matrix, queries
+    matrix.close()
+
+def exact_top_k(matrix, query, allowed_ids=None):
+    ids, scores = matrix.similarities(query, allowed_ids)
+    return {ids[i] for i in top_k_indices(scores, K)}
+
+def recall(index, matrix, queries, nprobe, allowed_ids=None):
+    found = [index.search(query, K, nprobe, allowed_ids)[0] for query in queries]
+    expected = [exact_top_k(matrix, query, allowed_ids) for query in queries]
+    return np.mean([len(e & set(f)) / len(e) for e, f in zip(expected, found)])
+
+@pytest.mark.parametrize("quantization, full_probe_recall", [("none", 1.0), ("int8", 0.99), ("pq", 0.9)])
+def test_recall_at_k_against_exact_search(gaussian_corpus, tmp_path, monkeypatch, quantization, full_probe_recall):
+    # Few re-ranked candidates, so the quantized codes decide what reaches the exact re-rank
+    monkeypatch.setattr(ann_index, "ANN_RERANK_FACTOR", 4)
+    matrix, queries = gaussian_corpus
+    index = IVFIndex(matrix, tmp_path / "ivf.npz", quantization=quantization)
+    assert index.train()
+
+    recalls = [recall(index, matrix, queries, nprobe) for nprobe in (1, 4, 16, index.nlist)]
+    assert recalls == sorted(recalls)  # more lists probed, never worse
+    assert recalls[2] >= 0.4  # a quarter of the lists
+    assert recalls[3] >= full_probe_recall
+
+    allowed = [f"r{i}" for i in range(0, 4000, 3)]
+    assert recall(index, matrix, queries[:10], index.nlist, allowed) >= full_probe_recall
+
+def test_scores_are_exact_cosine_similarities(gaussian_corpus, tmp_path):
+    matrix, queries = gaussian_corpus
+    index = IVFIndex(matrix, tmp_path / "ivf.npz", quantization="pq")
+    assert index.train()
+    ids, scores = index.search(queries[0], K, index.nlist)
+    all_ids, all_scores = matrix.similarities(queries[0])
+    exact = dict(zip(all_ids, all_scores))
+    assert np.allclose(scores, [exact[resume_id] for resume_id in ids], atol=1e-5)
+    assert list(scores) == sorted(scores, reverse=True)
@@ -0,0 +1,35 @@
+import time
+import sqlite3
+
+from services.bm25_service import BM25Index
+
+def test_changes_survive_a_reload_once_flushed(tmp_path):
+    index = BM25Index(tmp_path / "bm25.db")
+    index.add("a", "Python developer building Django services")
+    index.add("b", "Java engineer with Spring Boot")
+    index.add("a", "Rust developer writing embedded firmware")  # re-index
+    index.add("c", "Go developer")
+    index.remove("c")
+    index.flush()
+
+    reloaded = BM25Index(tmp_path / "bm25.db")
+    assert sorted(reloaded.ids()) == ["a", "b"]
+    assert reloaded.search("rust firmware") == index.search("rust firmware")
+    assert reloaded.search("django") == []
+
+def test_add_does_not_wait_for_the_database_write_lock(tmp_path):
+    index = BM25Index(tmp_path / "bm25.db")
+    blocker = sqlite3.connect(str(tmp_path / "bm25.db"), isolation_level=None)
+    try:
+        blocker.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+        start = time.perf_counter()
+        index.add("a", "Kotlin Android developer")
+        index.remove("a")
+        index.add("b", "Swift iOS developer")
+        assert time.perf_counter() - start < 0.1
+        assert [resume_id for resume_id, _, _ in index.search("swift")] == ["b"]
+        blocker.execute("COMMIT")
+    finally:
+        blocker.close()
+    index.flush()
+    assert BM25Index(tmp_path / "bm25.db").ids() == ["b"]
@@ -0,0 +1,46 @@
+import json
+import sqlite3
+
+import numpy as np
+
+from conftest import LEGACY_ROWS, WORKSPACE
+from services.database_service import init_db, migrate_json_embeddings, pack_embedding, unpack_embedding
+
+def test_packed_embeddings_round_trip():
+    vector = np.random.default_rng(0).normal(size=384).astype(np.float32)
+    blob = pack_embedding(vector, "float32")
+    assert len(blob) == 384 * 4
+    assert np.array_equal(unpack_embedding(blob, "float32"), vector)
+    assert np.array_equal(unpack_embedding(blob, None), vector)  # rows without embedding_dtype are float32
+
+    half = pack_embedding(vector, "float16")
+    assert len(half) == 384 * 2
+    assert np.allclose(unpack_embedding(half, "float16"), vector, atol=1e-2)
+
+    # JSON text written before BLOB storage still reads
+    assert np.allclose(unpack_embedding(json.dumps(vector.tolist())), vector)
+
+def test_json_embeddings_are_rewritten_as_blobs(tmp_path):
+    init_db(tmp_path / "resumes.db")
+    with sqlite3.connect(str(tmp_path / "resumes.db")) as conn:
+        conn.executemany(
+            "INSERT INTO resumes (id, file_path, download_url, embedding) VALUES (?, '', '', ?)",
+            [("json", json.dumps([0.5, -1.0, 2.0])), ("corrupt", "[0.5, -1"), ("none", None)]
+        )
+        assert migrate_json_embeddings(conn) == 2
+        rows = {row[0]: row[1:] for row in conn.execute("SELECT id, typeof(embedding), embedding, embedding_dtype FROM resumes")}
+    assert rows["json"][0] == "blob" and rows["json"][2] == "float32"
+    assert unpack_embedding(rows["json"][1], rows["json"][2]).tolist() == [0.5, -1.0, 2.0]
+    assert rows["corrupt"] == ("null", None, None)
+    assert rows["none"] == ("null", None, None)
+
+    # Nothing left to convert on the next start
+    with sqlite3.connect(str(tmp_path / "resumes.db")) as conn:
+        assert migrate_json_embeddings(conn) == 0
+
+def test_tracked_database_embeddings_were_converted_at_startup(app_module):
+    with sqlite3.connect(str(WORKSPACE / "storage" / "resumes.db")) as conn:
+        rows = conn.execute(
+            f"SELECT typeof(embedding) FROM resumes WHERE id IN ({', '.join('?' for _ in LEGACY_ROWS)})", list(LEGACY_ROWS)
+        ).fetchall()
+    assert rows == [("blob",)] * len(LEGACY_ROWS)  # JSON text in the checked-in database
@@ -0,0 +1,64 @@
+import numpy as np
+
+from services import embedding_matrix
+from services.embedding_matrix import EmbeddingMatrix
+
+def unit_vectors(rng, count, dim):
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def test_matrix_of_another_model_starts_over_empty(tmp_path):
+    rng = np.random.default_rng(0)
+    old = EmbeddingMatrix(tmp_path, model="api-model")
+    old.add_many(zip(["a", "b"], unit_vectors(rng, 2, 384)))
+    old.close()
+
+    matrix = EmbeddingMatrix(tmp_path, model="local-hashing-64")
+    assert len(matrix) == 0 and matrix.dim is None
+    query = unit_vectors(rng, 1, 64)[0]
+    assert matrix.add("c", query)
+    ids, scores = matrix.similarities(query)
+    assert ids == ["c"] and np.isclose(scores[0], 1.0)
+
+    # The same model keeps its rows
+    assert EmbeddingMatrix(tmp_path, model="local-hashing-64").ids() == ["c"]
+
+def test_two_instances_share_adds_removes_and_compactions(tmp_path, monkeypatch):
+    rng = np.random.default_rng(1)
+    vectors = unit_vectors(rng, 12, 32)
+    first, second = EmbeddingMatrix(tmp_path, model="m"), EmbeddingMatrix(tmp_path, model="m")  # like two workers
+
+    def scores(matrix):
+        ids, similarities = matrix.similarities(vectors[0])
+        return dict(zip(ids, np.round(similarities, 5)))
+
+    assert first.add_many((f"r{i}", vectors[i]) for i in range(6)) == 6
+    second.refresh()
+    assert second.ids() == [f"r{i}" for i in range(6)]
+    assert scores(second) == scores(first)
+
+    # Appends and tombstones from the other instance, including a re-embedded resume
+    assert second.add("r6", vectors[6]) and second.add("r0", vectors[7])
+    assert second.remove("r1") and not second.remove("missing")
+    first.refresh()
+    assert sorted(first.ids()) == ["r0", "r2", "r3", "r4", "r5", "r6"]
+    assert np.isclose(scores(first)["r0"], vectors[0] @ vectors[7], atol=1e-5)
+    assert scores(first) == scores(second)
+
+    # Enough tombstones compact into a new generation; the other instance follows
+    monkeypatch.setattr(embedding_matrix, "EMBEDDING_MATRIX_COMPACT_MIN", 2)
+    generation = first.view().generation
+    assert first.remove_many(["r2", "r3", "r4", "r5"]) == 4
+    assert first.view().generation == generation + 1
+    assert len(first.view().row_ids) == 2  # only live rows were rewritten
+    second.refresh()
+    assert second.view().generation == generation + 1
+    assert sorted(second.ids()) == ["r0", "r6"]
+    assert scores(second) == scores(first)
+
+    # Writes keep working on the compacted generation from both sides
+    assert second.add("r8", vectors[8])
+    first.refresh()
+    assert sorted(first.ids()) == ["r0", "r6", "r8"]
+    first.close()
+    second.close()
@@ -0,0 +1,131 @@
+import json
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from services import database_service, embedding_service
+from services.database_service import EMBEDDING_MATRIX, embed_resume, save_resume_to_db, stale_embedding_ids
+from services.embedding_service import EmbeddingError, get_embeddings
+
+def test_api_failure_raises_instead_of_returning_another_models_vector(monkeypatch):
+    async def failing_embed(text):
+        raise RuntimeError("503 from OpenRouter")
+
+    monkeypatch.setattr(embedding_service, "USE_LOCAL_EMBEDDINGS", False)
+    monkeypatch.setattr(embedding_service._BATCHER, "embed", failing_embed)
+    with pytest.raises(EmbeddingError):
+        asyncio.run(get_embeddings(["a text nobody embedded before"]))
+
+def test_resume_saved_while_the_api_fails_is_embedded_later(monkeypatch):
+    async def failing_get_embedding(text):
+        raise EmbeddingError("503 from OpenRouter")
+
+    monkeypatch.setattr(database_service, "get_embedding", failing_get_embedding)
+    text = "Site reliability engineer running Kubernetes and Terraform"
+    resume_id = asyncio.run(save_resume_to_db(text, {"summary": "SRE"}, "resumes/sre.pdf", "/download/resumes/sre.pdf"))
+    assert resume_id in asyncio.run(stale_embedding_ids())
+    assert resume_id not in EMBEDDING_MATRIX
+
+    monkeypatch.undo()
+    assert asyncio.run(embed_resume(resume_id, text))
+    assert resume_id in EMBEDDING_MATRIX
+    assert resume_id not in asyncio.run(stale_embedding_ids())
+
+RealAsyncClient = httpx.AsyncClient
+
+@pytest.fixture
+def embedding_api(monkeypatch):
+    """Route the batcher's requests to a fake OpenRouter; yields the list of request bodies"""
+    requests = []
+    failures = []
+
+    def handler(request):
+        body = json.loads(request.content)
+        requests.append(body)
+        if failures:
+            return httpx.Response(failures.pop(), text="upstream error")
+        # Out of order on purpose, results are matched by index
+        data = [{"index": i, "embedding": [float(len(text)), float(i)]} for i, text in enumerate(body["input"])]
+        return httpx.Response(200, json={"data": data[::-1]})
+
+    monkeypatch.setattr(embedding_service, "USE_LOCAL_EMBEDDINGS", False)
+    monkeypatch.setattr(
+        embedding_service.httpx, "AsyncClient",
+        lambda **kwargs: RealAsyncClient(transport=httpx.MockTransport(handler), **kwargs)
+    )
+    yield requests, failures
+
+def test_concurrent_callers_share_one_request_per_distinct_text(embedding_api):
+    requests, _ = embedding_api
+    texts = ["batched text one", "batched text two", "batched text one", "batched text three", "batched text two"]
+
+    async def embed_concurrently():
+        return await asyncio.gather(*(embedding_service.get_embedding(text) for text in texts))
+
+    results = asyncio.run(embed_concurrently())
+    assert len(requests) == 1
+    assert sorted(requests[0]["input"]) == sorted(set(texts))
+    for text, embedding in zip(texts, results):
+        assert embedding == [float(len(text)), float(requests[0]["input"].index(text))]
+
+    # Served from the embedding cache afterwards
+    assert asyncio.run(get_embeddings(texts[:2])) == results[:2]
+    assert len(requests) == 1
+
+def test_failed_batch_fails_every_caller_and_is_retried(embedding_api):
+    requests, failures = embedding_api
+    failures.append(503)
+
+    async def embed_concurrently():
+        return await asyncio.gather(
+            embedding_service.get_embedding("retried text one"),
+            embedding_service.get_embedding("retried text two"),
+            return_exceptions=True
+        )
+
+    results = asyncio.run(embed_concurrently())
+    assert len(requests) == 1
+    assert all(isinstance(result, EmbeddingError) for result in results)
+
+    # Nothing was cached or left in flight, the next call asks the API again
+    assert asyncio.run(embedding_service.get_embedding("retried text one")) == [16.0, 0.0]
+    assert len(requests) == 2
+
+def test_embedding_cache_is_read_and_written_off_the_event_loop(embedding_api, monkeypatch):
+    threads = []
+
+    def recording(function):
+        def wrapper(*args):
+            threads.append(threading.current_thread())
+            return function(*args)
+        return wrapper
+
+    monkeypatch.setattr(embedding_service, "get_cached_embeddings", recording(embedding_service.get_cached_embeddings))
+    monkeypatch.setattr(embedding_service, "put_cached_embeddings", recording(embedding_service.put_cached_embeddings))
+
+    async def embed():
+        await embedding_service.get_embedding("text read and cached in threads")
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(embed())
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+def test_client_is_closed_with_its_event_loop_and_at_shutdown(embedding_api):
+    async def embed(text):
+        await embedding_service.get_embedding(text)
+        return embedding_service._BATCHER._client
+
+    first = asyncio.run(embed("client of the first loop"))
+    assert first.is_closed  # asyncio.run finalized it before closing the loop
+
+    async def embed_and_shut_down():
+        client = await embed("client of the second loop")
+        assert not client.is_closed
+        await embedding_service.close_embedding_client()
+        return client
+
+    second = asyncio.run(embed_and_shut_down())
+    assert second is not first and second.is_closed
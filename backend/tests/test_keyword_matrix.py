@@ -0,0 +1,53 @@
+import random
+
+import pytest
+
+from benchmark_keyword_scoring import QUERIES, synthetic_resume
+from services import keyword_matrix
+from services.keyword_index import calculate_keyword_match_score
+from services.keyword_matrix import KeywordMatrix
+
+@pytest.mark.parametrize("merge_min", [4, 10_000])
+def test_adds_removes_and_updates_match_a_fresh_build(monkeypatch, merge_min):
+    # merge_min 4 merges and compacts many times along the way, 10_000 keeps everything in the delta block
+    monkeypatch.setattr(keyword_matrix, "DELTA_MERGE_MIN", merge_min)
+    rng = random.Random(7)
+    resumes = {resume["id"]: resume for resume in (synthetic_resume(rng) for _ in range(50))}
+    matrix = KeywordMatrix(resumes.values())
+
+    for step in range(200):
+        action = rng.random()
+        if action < 0.3 and resumes:
+            resume_id = rng.choice(list(resumes))
+            del resumes[resume_id]
+            matrix.remove(resume_id)
+        else:
+            resume = synthetic_resume(rng)
+            if action < 0.5 and resumes:
+                resume["id"] = rng.choice(list(resumes))  # re-upload: replaced, moves to the end
+                del resumes[resume["id"]]
+            # Words and skills the matrix has not seen yet
+            resume["summary"] += f" python{step}"
+            resume["skills"].append(f"Python{step}")
+            resumes[resume["id"]] = resume
+            matrix.add(resume)
+
+        if step % 20 == 0:
+            assert len(matrix) == len(resumes)
+            fresh = KeywordMatrix(resumes.values())
+            for query in QUERIES + [f"python{step} developer"]:
+                expected = [calculate_keyword_match_score(query, resume)["score"] for resume in resumes.values()]
+                assert [score for _, score in matrix.top_k(query, len(resumes) + 5)] == sorted(expected, reverse=True)
+                assert matrix.top_k(query, 10) == fresh.top_k(query, 10)
+                allowed = rng.sample(list(resumes), 5)
+                assert matrix.top_k(query, 3, allowed_ids=allowed) == fresh.top_k(query, 3, allowed_ids=allowed)
+
+def test_removed_resume_is_never_returned():
+    rng = random.Random(3)
+    resumes = [synthetic_resume(rng) for _ in range(5)]
+    matrix = KeywordMatrix(resumes)
+    matrix.remove(resumes[0]["id"])
+    matrix.remove("not-indexed")
+    returned = [resume_id for resume_id, _ in matrix.top_k(QUERIES[0], 10)]
+    assert sorted(returned) == sorted(resume["id"] for resume in resumes[1:])
+    assert matrix.top_k(QUERIES[0], 10, allowed_ids=[resumes[0]["id"]]) == []
@@ -0,0 +1,180 @@
+import json
+import time
+import asyncio
+import sqlite3
+import threading
+from pathlib import Path
+
+from conftest import BACKEND_DIR, LEGACY_ROWS
+from services import resume_store
+from services.database_service import init_db, save_resume_to_db
+from services.resume_store import ResumeStore
+
+def make_legacy_db(db_path: Path) -> str:
+    """A resumes table with one row as database_service wrote it: storage_service path, no filename"""
+    init_db(db_path)
+    with sqlite3.connect(str(db_path)) as conn:
+        conn.execute(
+            "INSERT INTO resumes (id, file_path, download_url, summary, skills, experience, education_level, category, created_at) "
+            "VALUES ('legacy-1', 'resumes/legacy-1.pdf', '/download/resumes/legacy-1.pdf', 'Data engineer', '[\"Spark\"]', 4, "
+            "'Master''s', 'Data Engineer', '2025-05-01T00:00:00')"
+        )
+    return "legacy-1"
+
+def test_legacy_row_gets_local_storage_path_and_filename(tmp_path):
+    resume_id = make_legacy_db(tmp_path / "resumes.db")
+    store = ResumeStore(tmp_path / "resumes.db")
+    try:
+        record = store.get(resume_id)
+        assert record["file_path"] == str(Path("storage") / "resumes" / "legacy-1.pdf")
+        assert record["filename"] == "legacy-1.pdf"
+        assert record["skills"] == ["Spark"]
+    finally:
+        store.close()
+
+    # The migration is written back, so it runs once
+    with sqlite3.connect(str(tmp_path / "resumes.db")) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM resumes WHERE filename IS NULL").fetchone()[0] == 0
+    store = ResumeStore(tmp_path / "resumes.db")
+    try:
+        assert store.get(resume_id)["file_path"] == str(Path("storage") / "resumes" / "legacy-1.pdf")
+    finally:
+        store.close()
+
+def test_tracked_database_rows_download_their_files(client):
+    for resume_id, file_path in LEGACY_ROWS.items():
+        response = client.get(f"/api/resumes/download/{resume_id}")
+        assert response.status_code == 200
+        assert response.content == (BACKEND_DIR / "storage" / file_path).read_bytes()
+
+def test_save_resume_to_db_is_picked_up_by_store_refresh():
+    store = ResumeStore()
+    try:
+        store.refresh()
+        metadata = {"summary": "Go developer", "skills": ["Go", "gRPC"], "experience": 3, "category": "Backend"}
+        resume_id = asyncio.run(save_resume_to_db("Go developer building gRPC services", metadata, "resumes/go.pdf", "/download/resumes/go.pdf"))
+        changes = store.refresh()
+        assert [(op, changed_id) for op, changed_id, _ in changes] == [("put", resume_id)]
+        record = store.get(resume_id)
+        assert record["filename"] == "go.pdf"
+        assert record["file_path"] == str(Path("storage") / "resumes" / "go.pdf")
+        assert record["skills"] == ["Go", "gRPC"]
+    finally:
+        store.close()
+
+def test_reads_are_served_while_a_write_waits_for_the_write_lock(tmp_path):
+    init_db(tmp_path / "resumes.db")
+    store = ResumeStore(tmp_path / "resumes.db")
+    blocker = sqlite3.connect(str(tmp_path / "resumes.db"), isolation_level=None)
+    try:
+        blocker.execute("BEGIN IMMEDIATE")  # another worker holding the write lock
+        writer = threading.Thread(target=store.put, args=({"id": "r1", "filename": "a.pdf", "skills": []},))
+        writer.start()
+        time.sleep(0.2)  # the put is now waiting on busy_timeout
+
+        start = time.perf_counter()
+        assert store.page() == ([], None)
+        assert store.get("r1") is None
+        assert time.perf_counter() - start < 0.1
+
+        blocker.execute("COMMIT")
+        writer.join(timeout=5)
+        assert store.get("r1")["filename"] == "a.pdf"
+    finally:
+        blocker.close()
+        store.close()
+
+def test_legacy_snapshot_and_logs_are_replayed_into_the_table_once(tmp_path, monkeypatch):
+    snapshot, log = tmp_path / "resumes.json", tmp_path / "resumes.log"
+    monkeypatch.setattr(resume_store, "LEGACY_SNAPSHOT_PATH", snapshot)
+    monkeypatch.setattr(resume_store, "LEGACY_LOG_PATH", log)
+
+    def record(resume_id, summary):
+        return {"id": resume_id, "filename": f"{resume_id}.pdf", "summary": summary, "skills": ["SQL"], "experience": "5+"}
+
+    snapshot.write_text(json.dumps([record("a", "snapshot"), record("b", "snapshot")]))
+    # The log rotated by a compaction that did not finish, then the current log with a torn last entry
+    (tmp_path / "resumes.log.old").write_text(
+        json.dumps({"op": "put", "record": record("a", "old log")}) + "\n"
+        + json.dumps({"op": "put", "record": record("c", "old log")}) + "\n"
+    )
+    log.write_text(
+        json.dumps({"op": "del", "id": "b"}) + "\n"
+        + json.dumps({"op": "put", "record": record("c", "log")}) + "\n"
+        + '{"op": "put", "record": {"id": "d"'
+    )
+
+    init_db(tmp_path / "resumes.db")
+    store = ResumeStore(tmp_path / "resumes.db")
+    try:
+        assert {r["id"]: r["summary"] for r in store.records()} == {"a": "old log", "c": "log"}
+        assert store.get("c")["experience"] == "5+"
+        store.delete("a")
+    finally:
+        store.close()
+
+    # Migrated once: a restart does not bring back the deleted resume
+    store = ResumeStore(tmp_path / "resumes.db")
+    try:
+        assert [r["id"] for r in store.records()] == ["c"]
+    finally:
+        store.close()
+
+def test_two_stores_on_one_database_see_each_others_writes(tmp_path):
+    init_db(tmp_path / "resumes.db")
+    first, second = ResumeStore(tmp_path / "resumes.db"), ResumeStore(tmp_path / "resumes.db")  # like two workers
+    try:
+        assert first.refresh() == [] and second.refresh() == []
+
+        first.put({"id": "a", "filename": "a.pdf", "summary": "Data analyst", "skills": ["SQL"]})
+        first.put({"id": "b", "filename": "b.pdf", "skills": []})
+        changes = second.refresh()
+        assert [(op, resume_id) for op, resume_id, _ in changes] == [("put", "a"), ("put", "b")]
+        assert second.get("a")["skills"] == ["SQL"]
+        assert second.refresh() == []  # nothing new
+
+        # A write first applies the other worker's pending changes, then its own
+        second.put({"id": "a", "filename": "a.pdf", "summary": "Senior data analyst", "skills": ["SQL", "dbt"]})
+        second.delete("b")
+        changes = first.refresh()
+        assert [(op, resume_id) for op, resume_id, _ in changes] == [("put", "a"), ("del", "b")]
+        assert first.get("a")["summary"] == "Senior data analyst"
+        assert first.get("b") is None
+        assert first.generation == second.generation
+        assert [record["id"] for record in first.page()[0]] == [record["id"] for record in second.page()[0]] == ["a"]
+
+        # A worker that fell behind the pruned change rows reloads and diffs
+        second.put({"id": "c", "filename": "c.pdf", "skills": []})
+        second.delete("a")
+        with sqlite3.connect(str(tmp_path / "resumes.db")) as conn:
+            conn.execute("DELETE FROM resume_changes WHERE seq < (SELECT MAX(seq) FROM resume_changes)")
+        changes = first.refresh()
+        assert ("del", "a", None) in changes and ("put", "c") in [(op, resume_id) for op, resume_id, _ in changes]
+        assert [record["id"] for record in first.records()] == ["c"]
+        assert first.generation == second.generation
+    finally:
+        first.close()
+        second.close()
+
+def test_lagging_store_can_write_after_its_change_rows_were_pruned(tmp_path):
+    init_db(tmp_path / "resumes.db")
+    lagging, other = ResumeStore(tmp_path / "resumes.db"), ResumeStore(tmp_path / "resumes.db")
+    try:
+        other.put({"id": "a", "filename": "a.pdf", "skills": []})
+        other.put({"id": "b", "filename": "b.pdf", "skills": []})
+        other.delete("a")
+        with sqlite3.connect(str(tmp_path / "resumes.db")) as conn:
+            conn.execute("DELETE FROM resume_changes WHERE seq < (SELECT MAX(seq) FROM resume_changes)")
+
+        # The write reloads inside its own transaction, then applies itself
+        changes = lagging.put({"id": "c", "filename": "c.pdf", "skills": []})
+        assert [(op, resume_id) for op, resume_id, _ in changes] == [("put", "b")]
+        assert sorted(record["id"] for record in lagging.records()) == ["b", "c"]
+        assert lagging.delete("b") == []
+
+        other.refresh()
+        assert [record["id"] for record in other.records()] == ["c"]
+        assert lagging.generation == other.generation
+    finally:
+        lagging.close()
+        other.close()
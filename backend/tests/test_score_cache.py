@@ -0,0 +1,111 @@
+import json
+import asyncio
+import sqlite3
+import threading
+
+from services import score_cache_service
+from services.score_cache_service import (
+    SCORE_CACHE_DB_PATH, ScoreCacheBatch, get_cached_scores, make_score_key, put_cached_scores
+)
+
+def test_scores_written_in_one_batch_are_read_back_from_sqlite(monkeypatch):
+    keys = [make_score_key("go developer", f"hash-{i}", "model-a") for i in range(1200)]
+    put_cached_scores({key: {"score": i % 100, "reason": f"r{i}"} for i, key in enumerate(keys)}, "model-a")
+    score_cache_service._memory_cache.clear()
+
+    found = get_cached_scores(keys + ["unknown"])
+    assert len(found) == len(keys)
+    assert found[keys[1100]] == {"score": 0, "reason": "r1100"}
+
+    monkeypatch.setattr(score_cache_service, "SCORE_CACHE_TTL", -1)
+    score_cache_service._memory_cache.clear()
+    assert get_cached_scores(keys[:3]) == {}
+
+def test_batch_touches_sqlite_only_in_prefetch_and_flush(monkeypatch):
+    cached_key = make_score_key("rust developer", "cached", "model-a")
+    put_cached_scores({cached_key: {"score": 80, "reason": "cached"}}, "model-a")
+    threads = []
+    real_connection = score_cache_service._conn
+
+    class RecordingConnection:
+        def __getattr__(self, name):
+            threads.append(threading.current_thread())
+            return getattr(real_connection, name)
+
+    monkeypatch.setattr(score_cache_service, "_conn", RecordingConnection())
+    new_key = make_score_key("rust developer", "new", "model-a")
+
+    async def search():
+        batch = ScoreCacheBatch("model-a")
+        await batch.prefetch([cached_key, new_key])
+        reads = len(threads)
+        assert batch.get(cached_key) == {"score": 80, "reason": "cached"}
+        assert batch.get(new_key) is None
+        batch.put(new_key, {"score": 55, "reason": "scored", "source": "openrouter_llm"})
+        assert batch.get(new_key) == {"score": 55, "reason": "scored"}
+        assert len(threads) == reads  # lookups and puts in the fan-out stay in memory
+        await batch.flush()
+        await batch.flush()  # nothing queued, no write
+        return threading.current_thread()
+
+    loop_thread = asyncio.run(search())
+    assert threads and loop_thread not in threads
+    with sqlite3.connect(str(SCORE_CACHE_DB_PATH)) as conn:
+        assert conn.execute("SELECT score FROM score_cache WHERE key = ?", (new_key,)).fetchone() == (55,)
+
+def test_search_scoring_reuses_cached_scores(app_module, monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_llm_score(job_query, resume_text):
+        calls.append(resume_text)
+        return {"score": 70, "reason": "matches", "source": "openrouter_llm"}
+
+    monkeypatch.setattr(app_module, "get_relevance_score_with_openrouter", fake_llm_score)
+    resumes = []
+    for i in range(3):
+        path = tmp_path / f"resume-{i}.txt"
+        path.write_text(f"Backend engineer number {i} with Python, PostgreSQL and Kubernetes experience")
+        resumes.append({"id": f"score-{i}", "filename": path.name, "file_path": str(path)})
+    resumes.append(dict(resumes[0], id="score-copy"))  # same file, scored once
+
+    for expected_hits in (0, 3):
+        cache_stats = {"hits": 0, "misses": 0}
+        results = asyncio.run(app_module.score_resumes_with_llm("python kubernetes engineer", resumes, cache_stats))
+        assert [result["score"] for result in results] == [70] * 4
+        assert cache_stats == {"hits": expected_hits, "misses": 3 - expected_hits}
+    assert len(calls) == 3
+
+def test_scores_streamed_before_a_disconnect_are_written(app_module, monkeypatch, tmp_path):
+    from starlette.requests import Request
+
+    async def fake_llm_score(job_query, resume_text):
+        if "slow" in resume_text:
+            await asyncio.sleep(30)  # still scoring when the client goes away
+        return {"score": 64, "reason": "matches", "source": "openrouter_llm"}
+
+    async def no_sync():
+        pass
+
+    resumes = {}
+    for name in ("fast", "slow"):
+        path = tmp_path / f"{name}.txt"
+        path.write_text(f"{name} data engineer with Spark, Airflow and dbt pipelines in production")
+        resumes[f"stream-{name}"] = {"id": f"stream-{name}", "filename": path.name, "file_path": str(path)}
+    monkeypatch.setattr(app_module, "get_relevance_score_with_openrouter", fake_llm_score)
+    monkeypatch.setattr(app_module, "sync_resumes", no_sync)
+    monkeypatch.setattr(app_module, "USER_RESUMES", resumes)
+    query = "spark airflow streaming disconnect"
+
+    async def disconnect_after_first_result():
+        request = Request({"type": "http", "method": "POST", "headers": []})
+        response = await app_module.search_resume_stream(app_module.SearchQuery(query=query), request)
+        first = await response.body_iterator.__anext__()
+        await response.body_iterator.aclose()
+        return json.loads(first)
+
+    first = asyncio.run(disconnect_after_first_result())
+    assert first["event"] == "result"
+    content_hash = app_module.file_sha256(resumes["stream-fast"]["file_path"])
+    key = make_score_key(query, content_hash, app_module.OPENROUTER_MODEL_NAME)
+    with sqlite3.connect(str(SCORE_CACHE_DB_PATH)) as conn:
+        assert conn.execute("SELECT score FROM score_cache WHERE key = ?", (key,)).fetchone() == (64,)
@@ -0,0 +1,33 @@
+import json
+import asyncio
+
+from services.database_service import search_resumes, EMBEDDING_MATRIX
+from services.embedding_service import get_embedding
+
+RESUME_TEXT = (
+    "Marine biologist with six years of coral reef field research, underwater survey design, "
+    "scuba diving instruction and R for population statistics"
+)
+
+def search(query: str):
+    async def run():
+        return await search_resumes(await get_embedding(query))
+    return asyncio.run(run())
+
+def test_uploaded_resume_is_found_by_semantic_search_until_deleted(client):
+    response = client.post(
+        "/api/resumes/upload",
+        files={"file": ("reef.txt", RESUME_TEXT.encode(), "text/plain")},
+        data={"metadata": json.dumps({"summary": "Marine biologist", "skills": ["R", "Scuba"], "category": "Research"})}
+    )
+    assert response.status_code == 200
+    resume_id = response.json()["id"]
+    assert resume_id in EMBEDDING_MATRIX.ids()
+
+    results = search("coral reef marine biologist scuba diving")
+    assert results[0]["id"] == resume_id
+    assert results[0]["skills"] == ["R", "Scuba"]
+
+    assert client.delete(f"/api/resumes/{resume_id}").status_code == 200
+    assert resume_id not in EMBEDDING_MATRIX.ids()
+    assert resume_id not in [result["id"] for result in search("coral reef marine biologist scuba diving")]